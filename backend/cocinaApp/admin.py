@@ -11,16 +11,17 @@ class DetallePedidoInline(admin.TabularInline):
 
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
-    list_display = ['id', 'mesa', 'estado', 'total', 'fecha_creacion', 'cliente']
+    list_display = ['id', 'mesa', 'estado', 'total_formateado', 'num_items', 'fecha_creacion', 'cliente']
     list_filter = ['estado', 'fecha_creacion', 'mesa']
     search_fields = ['id', 'mesa__numero', 'cliente__username']
     ordering = ['-fecha_creacion']
     inlines = [DetallePedidoInline]
-    readonly_fields = ['fecha_creacion', 'fecha_actualizacion', 'total']
+    readonly_fields = ['fecha_creacion', 'fecha_actualizacion', 'total', 'num_items']
 
-    def total(self, obj):
+    def total_formateado(self, obj):
         return f"${obj.total}"
-    total.short_description = 'Total'
+    total_formateado.short_description = 'Total'
+    total_formateado.admin_order_field = 'total'
 
 
 @admin.register(DetallePedido)
@@ -2,14 +2,56 @@
 WebSocket consumers para notificaciones de pedidos en tiempo real
 """
 import json
+import re
+from collections import deque
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.contrib.auth.models import AnonymousUser
 
+from . import event_stream
+
+GRUPOS_FIJOS = {'cola_cocina', 'pedidos_listos', 'pedidos_urgentes'}
+PATRON_GRUPO_MESA = re.compile(r'^mesa_\d+$')
+MAX_GRUPOS_POR_SOCKET = 50
+
+
+def grupo_valido(grupo):
+    """Grupos a los que un cliente puede suscribirse"""
+    return isinstance(grupo, str) and (grupo in GRUPOS_FIJOS or bool(PATRON_GRUPO_MESA.match(grupo)))
+
+
+def _conjunto_o_none(valores, tipo):
+    """Normaliza un filtro a set (None = sin filtro)"""
+    if not valores:
+        return None
+    try:
+        return {tipo(valor) for valor in valores}
+    except (TypeError, ValueError):
+        return None
+
 
 class PedidoConsumer(AsyncWebsocketConsumer):
     """
     Consumer para notificaciones de pedidos.
     Soporta grupos: cola_cocina, pedidos_listos, pedidos_urgentes, mesa_{id}
+
+    Rutas:
+    - /ws/cocina/cola/, /listos/, /urgentes/, /mesa/<id>/: un grupo fijo por socket
+    - /ws/cocina/: socket multiplexado. Suscripción con mensajes
+      {"type": "subscribe", "grupos": [...], "filtros": {"mesas": [...], "estados": [...]}}
+      y {"type": "unsubscribe", "grupos": [...]}. También ?grupos=a,b en la URL.
+      Los filtros se evalúan en el servidor por grupo.
+
+    Protocolos:
+    - v1 (default): cada evento trae el pedido completo
+    - v2 (?protocolo=2): eventos delta con secuencia por grupo y reanudación
+      con ?resume_from=<seq> o el mensaje {"type": "resume", "resume_from": <seq>}
+
+    Las transiciones masivas llegan como un solo mensaje por grupo:
+    {"event": "lote", "eventos": [...]} en v1 y
+    {"type": "lote", "grupo", "seq", "eventos": [...]} en v2.
     """
 
     async def connect(self):
@@ -18,6 +60,11 @@ class PedidoConsumer(AsyncWebsocketConsumer):
         print(f"[WS Consumer] Conexión recibida - Usuario: {user}, Tipo: {type(user)}")
         print(f"[WS Consumer] Query string: {self.scope.get('query_string', b'').decode()}")
 
+        # {grupo: {'mesas': set | None, 'estados': set | None}}
+        self.suscripciones = {}
+        # Eventos ya entregados (un mismo evento puede llegar por varios grupos)
+        self.eventos_recientes = deque(maxlen=64)
+
         if not user or isinstance(user, AnonymousUser):
             print(f"[WS Consumer] Rechazando conexión - Usuario no autenticado")
             await self.close(code=4001)
@@ -25,31 +72,46 @@ class PedidoConsumer(AsyncWebsocketConsumer):
 
         print(f"[WS Consumer] Usuario autenticado: {user.username}")
 
+        query_params = parse_qs(self.scope.get('query_string', b'').decode())
+        self.protocolo = 2 if query_params.get('protocolo', ['1'])[0] == '2' else 1
+
         # Determinar grupos según URL
-        self.room_groups = []
+        grupos = []
         path = self.scope['path']
 
         if '/cola/' in path:
-            self.room_groups.append('cola_cocina')
+            grupos.append('cola_cocina')
         elif '/listos/' in path:
-            self.room_groups.append('pedidos_listos')
+            grupos.append('pedidos_listos')
         elif '/urgentes/' in path:
-            self.room_groups.append('pedidos_urgentes')
+            grupos.append('pedidos_urgentes')
         elif '/mesa/' in path:
             mesa_id = self.scope['url_route']['kwargs'].get('mesa_id')
             if mesa_id:
-                self.room_groups.append(f'mesa_{mesa_id}')
-
-        # Unirse a grupos
-        for group_name in self.room_groups:
-            await self.channel_layer.group_add(group_name, self.channel_name)
+                grupos.append(f'mesa_{mesa_id}')
+        elif query_params.get('grupos'):
+            grupos.extend(query_params['grupos'][0].split(','))
 
         await self.accept()
-        await self.send(text_data=json.dumps({
+        await self.suscribir(grupos)
+
+        bienvenida = {
             'type': 'connection_established',
             'groups': self.room_groups,
+            'protocolo': self.protocolo,
             'message': 'Conectado a notificaciones en tiempo real'
-        }))
+        }
+        if self.protocolo == 2:
+            bienvenida['seq'] = await self.secuencias(self.room_groups)
+        await self.send(text_data=json.dumps(bienvenida))
+
+        resume_from = query_params.get('resume_from', [None])[0]
+        if self.protocolo == 2 and resume_from is not None:
+            await self.reanudar(resume_from)
+
+    @property
+    def room_groups(self):
+        return list(self.suscripciones)
 
     async def disconnect(self, close_code):
         for group_name in self.room_groups:
@@ -59,17 +121,170 @@ class PedidoConsumer(AsyncWebsocketConsumer):
         # Opcional: ping/pong para keep-alive
         try:
             data = json.loads(text_data)
-            if data.get('type') == 'ping':
-                await self.send(text_data=json.dumps({'type': 'pong'}))
         except json.JSONDecodeError:
-            pass
+            return
+        if not isinstance(data, dict):
+            return
+
+        tipo = data.get('type')
+        if tipo == 'ping':
+            await self.send(text_data=json.dumps({'type': 'pong'}))
+        elif tipo == 'resume' and self.protocolo == 2:
+            await self.reanudar(data.get('resume_from'))
+        elif tipo == 'subscribe':
+            agregados = await self.suscribir(data.get('grupos') or [], data.get('filtros'))
+            respuesta = {'type': 'subscribed', 'grupos': agregados, 'groups': self.room_groups}
+            if self.protocolo == 2:
+                respuesta['seq'] = await self.secuencias(agregados)
+            await self.send(text_data=json.dumps(respuesta))
+            if self.protocolo == 2 and data.get('resume_from') is not None:
+                await self.reanudar(data['resume_from'])
+        elif tipo == 'unsubscribe':
+            quitados = await self.desuscribir(data.get('grupos') or [])
+            await self.send(text_data=json.dumps({
+                'type': 'unsubscribed', 'grupos': quitados, 'groups': self.room_groups
+            }))
+
+    async def suscribir(self, grupos, filtros=None):
+        """
+        Une el socket a los grupos válidos y guarda sus filtros.
+        Re-suscribirse a un grupo existente solo reemplaza sus filtros.
+        """
+        filtros = filtros if isinstance(filtros, dict) else {}
+        filtro = {
+            'mesas': _conjunto_o_none(filtros.get('mesas'), int),
+            'estados': _conjunto_o_none(filtros.get('estados'), str),
+        }
+
+        agregados = []
+        for grupo in grupos if isinstance(grupos, list) else []:
+            if not grupo_valido(grupo):
+                continue
+            if grupo not in self.suscripciones:
+                if len(self.suscripciones) >= MAX_GRUPOS_POR_SOCKET:
+                    break
+                await self.channel_layer.group_add(grupo, self.channel_name)
+            self.suscripciones[grupo] = filtro
+            agregados.append(grupo)
+        return agregados
+
+    async def desuscribir(self, grupos):
+        quitados = []
+        for grupo in grupos if isinstance(grupos, list) else []:
+            if grupo in self.suscripciones:
+                del self.suscripciones[grupo]
+                await self.channel_layer.group_discard(grupo, self.channel_name)
+                quitados.append(grupo)
+        return quitados
+
+    async def secuencias(self, grupos):
+        return {
+            grupo: await sync_to_async(event_stream.secuencia_actual)(grupo)
+            for grupo in grupos
+        }
+
+    def pasa_filtros(self, grupo, mesa_id, estado):
+        filtro = self.suscripciones.get(grupo)
+        if filtro is None:
+            return False
+        if filtro['mesas'] is not None and mesa_id not in filtro['mesas']:
+            return False
+        if filtro['estados'] is not None and estado not in filtro['estados']:
+            return False
+        return True
+
+    async def reanudar(self, resume_from):
+        """
+        Reenvía los eventos perdidos desde resume_from.
+        Acepta una secuencia (para todos los grupos) o un dict {grupo: seq}.
+        """
+        if isinstance(resume_from, dict):
+            desde = resume_from
+        else:
+            desde = {grupo: resume_from for grupo in self.room_groups}
+
+        for grupo, seq in desde.items():
+            if grupo not in self.suscripciones:
+                continue
+            try:
+                seq = int(seq)
+            except (TypeError, ValueError):
+                continue
+
+            eventos, completo = await sync_to_async(event_stream.eventos_desde)(grupo, seq)
+            if not completo:
+                # El buffer ya no cubre el rango pedido: el cliente debe recargar
+                await self.send(text_data=json.dumps({
+                    'type': 'resync_requerido',
+                    'grupo': grupo,
+                    'seq': await sync_to_async(event_stream.secuencia_actual)(grupo),
+                }))
+                continue
+
+            for evento in eventos:
+                if self.pasa_filtros(grupo, evento['mesa'], evento['estado']):
+                    await self.send(text_data=json.dumps(evento))
+                else:
+                    await self.send(text_data=json.dumps({'type': 'seq', 'grupo': grupo, 'seq': evento['seq']}))
+
+    def debe_entregar(self, delta):
+        """Aplica filtros y descarta duplicados recibidos por otro grupo"""
+        clave = (delta['id'], delta['event'], delta['timestamp'])
+        if clave in self.eventos_recientes:
+            return False
+        if not self.pasa_filtros(delta['grupo'], delta['mesa'], delta['estado']):
+            return False
+        self.eventos_recientes.append(clave)
+        return True
+
+    async def enviar_evento(self, event):
+        """
+        Envía el payload según el protocolo negociado por el cliente,
+        aplicando filtros y descartando duplicados recibidos por otro grupo.
+        """
+        delta = event['delta']
+        grupo = delta['grupo']
+
+        if not self.debe_entregar(delta):
+            # En v2 el cliente necesita la secuencia igual para poder reanudar
+            if self.protocolo == 2 and grupo in self.suscripciones:
+                await self.send(text_data=json.dumps({'type': 'seq', 'grupo': grupo, 'seq': delta['seq']}))
+            return
+
+        if self.protocolo == 2:
+            await self.send(text_data=json.dumps(delta))
+        else:
+            await self.send(text_data=json.dumps(event['data']))
 
     # Handlers para eventos
     async def pedido_creado(self, event):
-        await self.send(text_data=json.dumps(event['data']))
+        await self.enviar_evento(event)
 
     async def pedido_actualizado(self, event):
-        await self.send(text_data=json.dumps(event['data']))
+        await self.enviar_evento(event)
 
     async def pedido_cancelado(self, event):
-        await self.send(text_data=json.dumps(event['data']))
+        await self.enviar_evento(event)
+
+    async def pedido_lote(self, event):
+        """Varios eventos de un grupo en un solo mensaje (transiciones masivas)"""
+        lote = event['delta']
+        grupo = lote['grupo']
+        if grupo not in self.suscripciones:
+            return
+
+        entregar = [
+            (data, delta)
+            for data, delta in zip(event['data']['eventos'], lote['eventos'])
+            if self.debe_entregar(delta)
+        ]
+
+        if self.protocolo == 2:
+            # 'seq' cubre también los eventos filtrados
+            await self.send(text_data=json.dumps({
+                **lote, 'eventos': [delta for _, delta in entregar]
+            }))
+        elif entregar:
+            await self.send(text_data=json.dumps({
+                'event': 'lote', 'eventos': [data for data, _ in entregar]
+            }))
@@ -0,0 +1,130 @@
+"""
+Estimación de hora de salida (ETA) de los pedidos activos de cocina.
+
+Simula la cola como un planificador con prioridad sobre N estaciones de
+cocina (settings.COCINA_ESTACIONES):
+
+- Los pedidos EN_PREPARACION ya ocupan una estación desde que empezaron.
+- Luego URGENTE antes que CREADO y, dentro de cada prioridad, por
+  fecha_creacion: cada pedido toma la estación que se libere primero.
+- La duración de un pedido es el mayor Plato.tiempo_preparacion de sus
+  detalles (los platos de un pedido se preparan en paralelo).
+
+PlanificadorETA guarda el estado de las estaciones tras cada posición
+de la cola, de modo que un cambio solo recalcula los pedidos que quedan
+detrás de él.
+"""
+import bisect
+import heapq
+from datetime import timedelta
+
+from .models import EstadoPedido
+
+TIEMPO_PREPARACION_DEFAULT = 15
+
+_PRIORIDAD = {
+    EstadoPedido.EN_PREPARACION: 0,
+    EstadoPedido.URGENTE: 1,
+    EstadoPedido.CREADO: 2,
+}
+
+
+def duracion_pedido(tiempos_preparacion):
+    """Minutos de preparación de un pedido a partir de los tiempos de sus platos"""
+    tiempos = [t for t in tiempos_preparacion if t]
+    return max(tiempos) if tiempos else TIEMPO_PREPARACION_DEFAULT
+
+
+class PlanificadorETA:
+    """Planificador incremental de la cola de cocina"""
+
+    def __init__(self, estaciones):
+        self.estaciones = max(1, int(estaciones))
+        self._orden = []        # claves (prioridad, fecha_creacion, id) ordenadas
+        self._pedidos = {}      # id -> (clave, duracion_min, inicio)
+        self._estaciones_tras = []  # estado de las estaciones tras cada posición
+        self.etas = {}          # id -> datetime
+        self._sucio_desde = 0
+        self.base = None       # 'ahora' con el que se calculó el plan
+
+    def actualizar(self, pedido_id, estado, fecha_creacion, duracion, inicio=None):
+        """
+        Inserta o reposiciona un pedido activo.
+
+        Args:
+            inicio: Cuándo empezó a prepararse (solo EN_PREPARACION); si el
+                pedido ya estaba en preparación se conserva el inicio original
+        """
+        anterior = self._pedidos.get(pedido_id)
+        if (
+            anterior is not None
+            and anterior[0][0] == _PRIORIDAD[EstadoPedido.EN_PREPARACION]
+            and estado == EstadoPedido.EN_PREPARACION
+        ):
+            inicio = anterior[2]
+        if estado != EstadoPedido.EN_PREPARACION:
+            inicio = None
+
+        clave = (_PRIORIDAD[estado], fecha_creacion, pedido_id)
+        if anterior is not None and anterior == (clave, duracion, inicio):
+            return
+        self.quitar(pedido_id)
+        indice = bisect.bisect_left(self._orden, clave)
+        self._orden.insert(indice, clave)
+        self._pedidos[pedido_id] = (clave, duracion, inicio)
+        self._marcar(indice)
+
+    def quitar(self, pedido_id):
+        anterior = self._pedidos.pop(pedido_id, None)
+        if anterior is None:
+            return
+        indice = bisect.bisect_left(self._orden, anterior[0])
+        del self._orden[indice]
+        self.etas.pop(pedido_id, None)
+        self._marcar(indice)
+
+    def _marcar(self, indice):
+        self._sucio_desde = min(self._sucio_desde, indice)
+        del self._estaciones_tras[indice:]
+
+    def recalcular(self, ahora, completo=False):
+        """
+        Recalcula las ETA desde la primera posición modificada.
+
+        Args:
+            completo: Recalcular toda la cola con 'ahora' como nueva referencia
+                (las estaciones libres se toman desde 'ahora')
+
+        Returns:
+            dict {id: datetime} con las ETA que cambiaron
+        """
+        if completo or self.base is None:
+            self.base = ahora
+            self._sucio_desde = 0
+            self._estaciones_tras = []
+
+        desde = min(self._sucio_desde, len(self._orden))
+        if desde == 0:
+            estaciones = [self.base] * self.estaciones
+        else:
+            estaciones = list(self._estaciones_tras[desde - 1])
+        del self._estaciones_tras[desde:]
+
+        cambios = {}
+        for clave in self._orden[desde:]:
+            pedido_id = clave[2]
+            _, duracion, inicio = self._pedidos[pedido_id]
+            libre = heapq.heappop(estaciones)
+            # Un pedido en preparación corre desde su inicio salvo que no hubiera
+            # estación libre (más pedidos en preparación que estaciones)
+            comienzo = inicio if inicio is not None and libre <= self.base else libre
+            # Un pedido en preparación que ya debió terminar sale "ahora"
+            fin = max(comienzo + timedelta(minutes=duracion), self.base)
+            heapq.heappush(estaciones, fin)
+            self._estaciones_tras.append(tuple(estaciones))
+            if self.etas.get(pedido_id) != fin:
+                self.etas[pedido_id] = fin
+                cambios[pedido_id] = fin
+
+        self._sucio_desde = len(self._orden)
+        return cambios
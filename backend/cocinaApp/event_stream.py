@@ -0,0 +1,142 @@
+"""
+Stream versionado de eventos de pedidos por grupo WebSocket.
+
+Cada grupo tiene una secuencia monótona y un buffer acotado con los
+últimos eventos (protocolo v2, payload delta). Un cliente que se reconecta
+envía resume_from=<seq> y recibe solo lo que se perdió; si el buffer ya no
+cubre ese rango se le pide recargar.
+
+Backend:
+- Con REDIS_URL: secuencia y buffer compartidos entre procesos (INCR + lista,
+  en un script Lua atómico)
+- Sin REDIS_URL: en memoria del proceso (desarrollo/tests)
+"""
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+
+PROTOCOLO_VERSION = 2
+
+
+class _MemoriaBackend:
+    """Secuencias y buffers en memoria del proceso"""
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        self._secuencias = {}
+        self._buffers = {}
+
+    def registrar(self, grupo, evento):
+        with self._lock:
+            seq = self._secuencias.get(grupo, 0) + 1
+            self._secuencias[grupo] = seq
+            evento = {**evento, 'seq': seq}
+            buffer = self._buffers.get(grupo)
+            if buffer is None:
+                buffer = self._buffers[grupo] = deque(maxlen=self.capacidad)
+            buffer.append(evento)
+        return evento
+
+    def secuencia_actual(self, grupo):
+        with self._lock:
+            return self._secuencias.get(grupo, 0)
+
+    def eventos_desde(self, grupo, seq):
+        with self._lock:
+            return list(self._buffers.get(grupo, ())), self._secuencias.get(grupo, 0)
+
+
+class _RedisBackend:
+    """Secuencias y buffers compartidos en Redis"""
+
+    PREFIJO = 'cocina:eventos'
+
+    # Asigna la secuencia y agrega el evento al buffer en un solo paso atómico:
+    # el buffer queda en orden de secuencia y no hay secuencias sin evento.
+    # ARGV[1] es el JSON del evento sin la llave de apertura.
+    SCRIPT_REGISTRAR = """
+        local seq = redis.call('INCR', KEYS[1])
+        redis.call('RPUSH', KEYS[2], '{"seq": ' .. seq .. ARGV[1])
+        redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+        return seq
+    """
+
+    def __init__(self, url, capacidad):
+        import redis
+        self.capacidad = capacidad
+        self._redis = redis.Redis.from_url(url)
+        self._registrar = self._redis.register_script(self.SCRIPT_REGISTRAR)
+
+    def _claves(self, grupo):
+        return f'{self.PREFIJO}:{grupo}:seq', f'{self.PREFIJO}:{grupo}:buffer'
+
+    def registrar(self, grupo, evento):
+        evento = {clave: valor for clave, valor in evento.items() if clave != 'seq'}
+        resto = json.dumps(evento)[1:]
+        if evento:
+            resto = ', ' + resto
+        seq = self._registrar(keys=self._claves(grupo), args=[resto, self.capacidad])
+        return {**evento, 'seq': seq}
+
+    def secuencia_actual(self, grupo):
+        clave_seq, _ = self._claves(grupo)
+        return int(self._redis.get(clave_seq) or 0)
+
+    def eventos_desde(self, grupo, seq):
+        clave_seq, clave_buffer = self._claves(grupo)
+        pipe = self._redis.pipeline()
+        pipe.lrange(clave_buffer, 0, -1)
+        pipe.get(clave_seq)
+        crudos, actual = pipe.execute()
+        return [json.loads(crudo) for crudo in crudos], int(actual or 0)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                capacidad = getattr(settings, 'WEBSOCKET_REPLAY_BUFFER', 200)
+                redis_url = getattr(settings, 'REDIS_URL', None)
+                if redis_url:
+                    _backend = _RedisBackend(redis_url, capacidad)
+                else:
+                    _backend = _MemoriaBackend(capacidad)
+    return _backend
+
+
+def registrar_evento(grupo, evento):
+    """Asigna la siguiente secuencia del grupo al evento y lo guarda en el buffer"""
+    return _get_backend().registrar(grupo, evento)
+
+
+def secuencia_actual(grupo):
+    """Última secuencia emitida en el grupo (0 si no hay eventos)"""
+    return _get_backend().secuencia_actual(grupo)
+
+
+def eventos_desde(grupo, seq):
+    """
+    Eventos del grupo con secuencia mayor a seq.
+
+    Returns:
+        (eventos, completo): completo es False si el buffer ya descartó
+        eventos posteriores a seq, o si seq es mayor que la secuencia actual
+        (la secuencia se reinició: reinicio del backend en memoria o clave
+        perdida en Redis); en ambos casos el cliente debe recargar
+    """
+    eventos, actual = _get_backend().eventos_desde(grupo, seq)
+    if seq > actual:
+        return [], False
+    if seq == actual:
+        return [], True
+    pendientes = [evento for evento in eventos if evento['seq'] > seq]
+    completo = bool(pendientes) and pendientes[0]['seq'] == seq + 1
+    return pendientes, completo
@@ -0,0 +1,77 @@
+"""
+Archiva los pedidos ENTREGADOS y CANCELADOS más antiguos que el período de
+retención: los copia a PedidoArchivado (con detalles y cancelación) y los
+borra de las tablas activas, en lotes de transacciones cortas.
+
+El historial completo sigue disponible en /api/cocina/pedidos/historial/.
+
+Uso:
+    python manage.py archivar_pedidos
+    python manage.py archivar_pedidos --dias 180 --lote 1000
+    python manage.py archivar_pedidos --dry-run
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cocinaApp.models import Pedido, EstadoPedido
+from cocinaApp.services import PedidoService
+
+
+class Command(BaseCommand):
+    help = 'Mueve los pedidos finalizados antiguos a la tabla de archivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=None,
+            help='Antigüedad mínima en días (default: settings.PEDIDOS_DIAS_RETENCION)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help='Pedidos por transacción (default: 500)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo contar los pedidos que se archivarían'
+        )
+
+    def handle(self, *args, **options):
+        dias = options['dias'] or getattr(settings, 'PEDIDOS_DIAS_RETENCION', 90)
+        lote = max(1, options['lote'])
+        limite = timezone.now() - timedelta(days=dias)
+
+        candidatos = Pedido.objects.filter(
+            estado__in=[EstadoPedido.ENTREGADO, EstadoPedido.CANCELADO],
+            fecha_creacion__lt=limite
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'\n🔍 {candidatos.count()} pedidos creados antes de {limite:%Y-%m-%d} se archivarían\n'
+            ))
+            return
+
+        self.stdout.write(self.style.WARNING(
+            f'\n📦 Archivando pedidos creados antes de {limite:%Y-%m-%d} (lotes de {lote})...'
+        ))
+
+        total = 0
+        ultimo_id = 0
+        while True:
+            ids = list(
+                candidatos.filter(pk__gt=ultimo_id).order_by('pk').values_list('pk', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            total += PedidoService.archivar_pedidos(ids)
+            ultimo_id = ids[-1]
+            self.stdout.write(f'   {total} archivados...')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {total} pedidos archivados\n'))
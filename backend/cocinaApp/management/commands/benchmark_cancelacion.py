@@ -0,0 +1,127 @@
+"""
+Benchmark de cancelación de pedidos (PedidoService.cancelar_pedido).
+Crea datos temporales dentro de una transacción que se revierte al final,
+por lo que no deja rastros en la base de datos.
+
+Uso:
+    python manage.py benchmark_cancelacion
+    python manage.py benchmark_cancelacion --lineas 20 --iteraciones 50
+"""
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from mainApp.models import Mesa
+from menuApp.models import CategoriaMenu, Ingrediente, Plato, Receta
+from cocinaApp.models import Pedido, DetallePedido
+from cocinaApp.services import PedidoService
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y número de queries al cancelar un pedido de N líneas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lineas',
+            type=int,
+            default=20,
+            help='Número de líneas (detalles) del pedido (default: 20)'
+        )
+        parser.add_argument(
+            '--iteraciones',
+            type=int,
+            default=20,
+            help='Número de cancelaciones a medir (default: 20)'
+        )
+        parser.add_argument(
+            '--ingredientes-por-plato',
+            type=int,
+            default=4,
+            help='Ingredientes en la receta de cada plato (default: 4)'
+        )
+
+    def handle(self, *args, **options):
+        lineas = options['lineas']
+        iteraciones = options['iteraciones']
+        ingredientes_por_plato = options['ingredientes_por_plato']
+
+        self.stdout.write(self.style.WARNING(
+            f'\n⏱  Cancelando {iteraciones} pedidos de {lineas} líneas '
+            f'({ingredientes_por_plato} ingredientes por plato)...'
+        ))
+
+        tiempos = []
+        queries = []
+
+        with transaction.atomic():
+            usuario, mesa, platos = self._crear_datos(lineas, ingredientes_por_plato)
+
+            for _ in range(iteraciones):
+                pedido = self._crear_pedido(mesa, platos)
+
+                with CaptureQueriesContext(connection) as contexto:
+                    inicio = time.perf_counter()
+                    PedidoService.cancelar_pedido(
+                        pedido,
+                        usuario=usuario,
+                        motivo='Benchmark de cancelación de pedidos'
+                    )
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                queries.append(len(contexto))
+
+            # Revertir todos los datos temporales
+            transaction.set_rollback(True)
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completado'))
+        self.stdout.write(f'  ✓ Queries por cancelación: {max(queries)}')
+        self.stdout.write(f'  ✓ Tiempo mediano: {statistics.median(tiempos):.2f} ms')
+        self.stdout.write(f'  ✓ Tiempo mínimo: {min(tiempos):.2f} ms')
+        self.stdout.write(f'  ✓ Tiempo máximo: {max(tiempos):.2f} ms')
+
+    def _crear_datos(self, lineas, ingredientes_por_plato):
+        """Crea usuario, mesa, ingredientes y platos temporales"""
+        usuario = User.objects.create_user(username='benchmark_cancelacion')
+        numero_mesa = (Mesa.objects.order_by('-numero').values_list('numero', flat=True).first() or 0) + 1
+        mesa = Mesa.objects.create(numero=numero_mesa, capacidad=4)
+        categoria = CategoriaMenu.objects.create(nombre='Benchmark')
+
+        ingredientes = Ingrediente.objects.bulk_create([
+            Ingrediente(
+                nombre=f'Ingrediente benchmark {i}',
+                unidad_medida='gr',
+                cantidad_disponible=Decimal('100000'),
+            )
+            for i in range(lineas + ingredientes_por_plato)
+        ])
+
+        platos = Plato.objects.bulk_create([
+            Plato(nombre=f'Plato benchmark {i}', precio=Decimal('5990'), categoria=categoria)
+            for i in range(lineas)
+        ])
+
+        Receta.objects.bulk_create([
+            Receta(
+                plato=plato,
+                ingrediente=ingredientes[i + j],
+                cantidad_requerida=Decimal('25')
+            )
+            for i, plato in enumerate(platos)
+            for j in range(ingredientes_por_plato)
+        ])
+
+        return usuario, mesa, platos
+
+    def _crear_pedido(self, mesa, platos):
+        """Crea un pedido con una línea por plato (sin descontar stock)"""
+        pedido = Pedido.objects.create(mesa=mesa)
+        DetallePedido.objects.bulk_create([
+            DetallePedido(pedido=pedido, plato=plato, cantidad=2, precio_unitario=plato.precio)
+            for plato in platos
+        ])
+        return Pedido.objects.select_related('mesa', 'cliente').get(pk=pedido.pk)
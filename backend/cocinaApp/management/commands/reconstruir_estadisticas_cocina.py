@@ -0,0 +1,45 @@
+"""
+Recalcula las estadísticas diarias de cocina (EstadisticaCocinaDiaria)
+desde los pedidos. Útil tras desplegar la tabla o si hubo cambios fuera
+de los servicios (p.ej. UPDATE manuales). Los días con pedidos archivados
+no se recalculan.
+
+Uso:
+    python manage.py reconstruir_estadisticas_cocina
+    python manage.py reconstruir_estadisticas_cocina --dias 90
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cocinaApp.models import EstadisticaCocinaDiaria
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las estadísticas diarias de cocina de los últimos N días'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=30,
+            help='Días hacia atrás a recalcular, incluyendo hoy (default: 30)'
+        )
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        dias = options['dias']
+
+        self.stdout.write(self.style.WARNING(f'\n📊 Recalculando estadísticas de {dias} días...'))
+
+        for i in range(dias):
+            fecha = hoy - timedelta(days=i)
+            fila = EstadisticaCocinaDiaria.reconstruir(fecha)
+            if fila is None:
+                self.stdout.write(f'   {fecha} y anteriores: con pedidos archivados, se conservan')
+                break
+            if fila.total_pedidos or fila.hist_preparacion:
+                self.stdout.write(f'   {fecha}: {fila.total_pedidos} pedidos')
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Estadísticas recalculadas\n'))
@@ -0,0 +1,49 @@
+"""
+Recalcula el rollup diario de cancelaciones (ResumenCancelacionDiario)
+desde la auditoría PedidoCancelacion. Los días con pedidos archivados no
+se recalculan (sus cancelaciones se borraron al archivar).
+
+Uso:
+    python manage.py reconstruir_resumen_cancelaciones
+    python manage.py reconstruir_resumen_cancelaciones --dias 365
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cocinaApp.models import PedidoArchivado, ResumenCancelacionDiario
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen diario de cancelaciones de los últimos N días'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=90,
+            help='Días hacia atrás a recalcular, incluyendo hoy (default: 90)'
+        )
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        fecha_inicio = hoy - timedelta(days=options['dias'] - 1)
+
+        ultimo_archivado = PedidoArchivado.ultimo_dia_archivado()
+        if ultimo_archivado is not None and ultimo_archivado >= fecha_inicio:
+            self.stdout.write(
+                f'   Hasta {ultimo_archivado} hay pedidos archivados: esos días se conservan'
+            )
+            fecha_inicio = ultimo_archivado + timedelta(days=1)
+            if fecha_inicio > hoy:
+                self.stdout.write(self.style.SUCCESS('\n✅ Nada que recalcular\n'))
+                return
+
+        self.stdout.write(self.style.WARNING(
+            f'\n📊 Recalculando cancelaciones desde {fecha_inicio} hasta {hoy}...'
+        ))
+
+        procesadas = ResumenCancelacionDiario.reconstruir(fecha_inicio, hoy)
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {procesadas} cancelaciones resumidas\n'))
@@ -0,0 +1,118 @@
+"""
+Valida el planificador de ETA (cocinaApp.eta) contra los fecha_listo históricos.
+
+Reproduce la cola una sola vez en orden cronológico: cada pedido que llegó
+a LISTO entra al crearse, pasa a EN_PREPARACION cuando empezó a prepararse
+(registro de transiciones) y sale en su fecha_listo. Al crearse cada pedido
+se estima su hora de salida con la cola de ese momento y se compara con el
+fecha_listo real.
+
+Limitación: los pedidos URGENTE se simulan como CREADO.
+
+Uso:
+    python manage.py validar_eta
+    python manage.py validar_eta --dias 7 --estaciones 4
+"""
+import heapq
+import statistics
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from cocinaApp.eta import PlanificadorETA, duracion_pedido
+from cocinaApp.models import Pedido, DetallePedido, EstadoPedido, TransicionPedido
+
+TAMANO_LOTE = 500
+
+
+def _con_inicio_preparacion(pedidos):
+    """(pedido, inicio de preparación o None) en el orden de pedidos, por lotes"""
+    lote = []
+    for pedido in pedidos.iterator(chunk_size=TAMANO_LOTE):
+        lote.append(pedido)
+        if len(lote) == TAMANO_LOTE:
+            inicios = TransicionPedido.inicios_preparacion([p.pk for p in lote])
+            yield from ((p, inicios.get(p.pk)) for p in lote)
+            lote = []
+    if lote:
+        inicios = TransicionPedido.inicios_preparacion([p.pk for p in lote])
+        yield from ((p, inicios.get(p.pk)) for p in lote)
+
+
+class Command(BaseCommand):
+    help = 'Compara las ETA estimadas con los fecha_listo históricos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=30,
+            help='Días de historial a evaluar (default: 30)'
+        )
+        parser.add_argument(
+            '--estaciones',
+            type=int,
+            default=None,
+            help='Estaciones de cocina a simular (default: settings.COCINA_ESTACIONES)'
+        )
+
+    def handle(self, *args, **options):
+        estaciones = options['estaciones'] or getattr(settings, 'COCINA_ESTACIONES', 3)
+        desde = timezone.now() - timedelta(days=options['dias'])
+
+        pedidos = Pedido.objects.filter(
+            fecha_creacion__gte=desde,
+            fecha_listo__isnull=False
+        ).prefetch_related(
+            Prefetch('detalles', queryset=DetallePedido.objects.select_related('plato'))
+        ).order_by('fecha_creacion')
+
+        self.stdout.write(self.style.WARNING(
+            f'\n🔍 Validando ETA de los últimos {options["dias"]} días con {estaciones} estaciones...'
+        ))
+
+        planificador = PlanificadorETA(estaciones)
+        activos = {}    # id -> (fecha_creacion, duracion) de los pedidos en la cola
+        eventos = []    # heap (fecha, id, estado): inicio de preparación o LISTO
+        errores = []
+        for pedido, inicio in _con_inicio_preparacion(pedidos):
+            ahora = pedido.fecha_creacion
+
+            # Aplicar lo ocurrido en la cola hasta la creación de este pedido
+            while eventos and eventos[0][0] <= ahora:
+                fecha, pedido_id, estado = heapq.heappop(eventos)
+                if estado == EstadoPedido.LISTO:
+                    planificador.quitar(pedido_id)
+                    del activos[pedido_id]
+                else:
+                    fecha_creacion, duracion = activos[pedido_id]
+                    planificador.actualizar(pedido_id, estado, fecha_creacion, duracion, inicio=fecha)
+
+            duracion = duracion_pedido(detalle.plato.tiempo_preparacion for detalle in pedido.detalles.all())
+            activos[pedido.pk] = (ahora, duracion)
+            planificador.actualizar(pedido.pk, EstadoPedido.CREADO, ahora, duracion)
+            if inicio is not None and ahora < inicio < pedido.fecha_listo:
+                heapq.heappush(eventos, (inicio, pedido.pk, EstadoPedido.EN_PREPARACION))
+            heapq.heappush(eventos, (pedido.fecha_listo, pedido.pk, EstadoPedido.LISTO))
+
+            # 'ahora' cambia en cada pedido: se replanifica la cola activa, no el historial
+            planificador.recalcular(ahora, completo=True)
+            errores.append((planificador.etas[pedido.pk] - pedido.fecha_listo).total_seconds() / 60)
+
+        if not errores:
+            self.stdout.write(self.style.WARNING('⚠️  No hay pedidos con fecha_listo en el período'))
+            return
+
+        absolutos = sorted(abs(e) for e in errores)
+        p90 = absolutos[min(len(absolutos) - 1, int(len(absolutos) * 0.9))]
+        dentro_5 = sum(1 for e in absolutos if e <= 5) * 100 / len(absolutos)
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {len(errores)} pedidos evaluados'))
+        self.stdout.write(f'   Error absoluto medio: {statistics.mean(absolutos):.1f} min')
+        self.stdout.write(f'   Mediana:              {statistics.median(absolutos):.1f} min')
+        self.stdout.write(f'   p90:                  {p90:.1f} min')
+        self.stdout.write(f'   Sesgo (ETA - real):   {statistics.mean(errores):+.1f} min')
+        self.stdout.write(f'   Dentro de ±5 min:     {dentro_5:.0f}%\n')
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:15
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_totales(apps, schema_editor):
+    """Calcular total y num_items de pedidos existentes en un solo UPDATE"""
+    Pedido = apps.get_model('cocinaApp', 'Pedido')
+    DetallePedido = apps.get_model('cocinaApp', 'DetallePedido')
+
+    detalles = DetallePedido.objects.filter(pedido=OuterRef('pk')).order_by().values('pedido')
+    Pedido.objects.update(
+        total=Coalesce(
+            Subquery(detalles.annotate(suma=Sum(F('precio_unitario') * F('cantidad'))).values('suma')),
+            Decimal('0'),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        ),
+        num_items=Coalesce(
+            Subquery(detalles.annotate(conteo=Count('id')).values('conteo')),
+            0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocinaApp', '0003_pedidocancelacion'),
+        ('mainApp', '0008_alter_reserva_estado_bloqueomesa'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='num_items',
+            field=models.PositiveIntegerField(default=0, help_text='Cantidad de líneas (detalles) del pedido'),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), help_text='Suma de subtotales de los detalles', max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha_creacion', 'total'], name='cocinaApp_p_fecha_c_5c0e7c_idx'),
+        ),
+        migrations.RunPython(backfill_totales, migrations.RunPython.noop),
+    ]
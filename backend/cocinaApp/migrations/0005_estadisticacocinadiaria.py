@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocinaApp', '0004_pedido_total_num_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaCocinaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('total_pedidos', models.PositiveIntegerField(default=0)),
+                ('por_estado', models.JSONField(blank=True, default=dict)),
+                ('hist_preparacion', models.JSONField(blank=True, default=dict)),
+                ('hist_entrega', models.JSONField(blank=True, default=dict)),
+                ('listos_por_hora', models.JSONField(blank=True, default=dict)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estadística diaria de cocina',
+                'verbose_name_plural': 'Estadísticas diarias de cocina',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
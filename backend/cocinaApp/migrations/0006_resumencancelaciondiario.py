@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:27
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocinaApp', '0005_estadisticacocinadiaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCancelacionDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('dimension', models.CharField(choices=[('TOTAL', 'Total'), ('USUARIO', 'Usuario'), ('MESA', 'Mesa'), ('PLATO', 'Plato')], max_length=10)),
+                ('clave', models.CharField(blank=True, help_text='ID del usuario/plato o número de mesa (vacío para TOTAL o sin usuario)', max_length=50)),
+                ('etiqueta', models.CharField(blank=True, help_text='Username, número de mesa o nombre del plato', max_length=200)),
+                ('descripcion', models.CharField(blank=True, help_text='Nombre completo del usuario', max_length=200)),
+                ('cancelaciones', models.PositiveIntegerField(default=0, help_text='Pedidos cancelados')),
+                ('unidades', models.PositiveIntegerField(default=0, help_text='Unidades de plato canceladas')),
+                ('monto_perdido', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de cancelaciones',
+                'verbose_name_plural': 'Resúmenes diarios de cancelaciones',
+                'ordering': ['-fecha', 'dimension', '-cancelaciones'],
+                'unique_together': {('fecha', 'dimension', 'clave')},
+            },
+        ),
+    ]
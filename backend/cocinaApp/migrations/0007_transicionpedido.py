@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocinaApp', '0006_resumencancelaciondiario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estadisticacocinadiaria',
+            name='hist_coccion',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='estadisticacocinadiaria',
+            name='hist_espera',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='TransicionPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_anterior', models.CharField(blank=True, choices=[('CREADO', 'Creado'), ('URGENTE', 'Urgente'), ('EN_PREPARACION', 'En preparación'), ('LISTO', 'Listo'), ('ENTREGADO', 'Entregado'), ('CANCELADO', 'Cancelado')], max_length=20, null=True)),
+                ('estado_nuevo', models.CharField(choices=[('CREADO', 'Creado'), ('URGENTE', 'Urgente'), ('EN_PREPARACION', 'En preparación'), ('LISTO', 'Listo'), ('ENTREGADO', 'Entregado'), ('CANCELADO', 'Cancelado')], max_length=20)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('pedido', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='transiciones', to='cocinaApp.pedido')),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transición de Pedido',
+                'verbose_name_plural': 'Transiciones de Pedidos',
+                'ordering': ['fecha'],
+                'indexes': [models.Index(fields=['fecha'], name='cocinaApp_t_fecha_eea70d_idx'), models.Index(fields=['pedido', 'fecha'], name='cocinaApp_t_pedido__e4c1fe_idx'), models.Index(fields=['estado_nuevo', 'fecha'], name='cocinaApp_t_estado__27faf0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:36
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocinaApp', '0007_transicionpedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PedidoArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pedido_id', models.PositiveIntegerField(help_text='ID original del pedido', unique=True)),
+                ('mesa_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('mesa_numero', models.IntegerField(blank=True, null=True)),
+                ('cliente_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('estado', models.CharField(choices=[('CREADO', 'Creado'), ('URGENTE', 'Urgente'), ('EN_PREPARACION', 'En preparación'), ('LISTO', 'Listo'), ('ENTREGADO', 'Entregado'), ('CANCELADO', 'Cancelado')], max_length=20)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_cierre', models.DateTimeField(blank=True, help_text='fecha_entregado o fecha de cancelación', null=True)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10)),
+                ('datos', models.JSONField()),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Pedido archivado',
+                'verbose_name_plural': 'Pedidos archivados',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['fecha_creacion'], name='cocinaApp_p_fecha_c_8a21ae_idx'), models.Index(fields=['estado', 'fecha_creacion'], name='cocinaApp_p_estado_9dc1dc_idx'), models.Index(fields=['mesa_numero', 'fecha_creacion'], name='cocinaApp_p_mesa_nu_288b3f_idx'), models.Index(fields=['cliente_id', 'fecha_creacion'], name='cocinaApp_p_cliente_56612e_idx')],
+            },
+        ),
+    ]
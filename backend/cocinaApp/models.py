@@ -1,7 +1,18 @@
-from django.db import models
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from mainApp.transacciones import LotePorTransaccion
+
 
 class EstadoPedido(models.TextChoices):
     """Estados posibles de un pedido"""
@@ -24,6 +35,26 @@ TRANSICIONES_VALIDAS = {
 }
 
 
+class PedidoQuerySet(models.QuerySet):
+    """QuerySet con transiciones de estado en bloque"""
+
+    def transicionar(self, nuevo_estado, ahora=None):
+        """
+        Aplica un cambio de estado y sus timestamps en un solo UPDATE.
+        No dispara señales por fila; no valida TRANSICIONES_VALIDAS
+        (el llamador debe filtrar por estados de origen válidos).
+
+        Returns:
+            Número de filas actualizadas
+        """
+        ahora = ahora or timezone.now()
+        return self.exclude(estado=nuevo_estado).update(
+            estado=nuevo_estado,
+            fecha_actualizacion=ahora,
+            **Pedido.campos_timestamp_transicion(nuevo_estado, ahora)
+        )
+
+
 class Pedido(models.Model):
     """Pedido de cocina asociado a una mesa y opcionalmente a una reserva"""
     # FKs a modelos existentes
@@ -67,15 +98,102 @@ class Pedido(models.Model):
         blank=True,
         help_text="Fecha y hora cuando el pedido fue entregado"
     )
+    # Totales desnormalizados (mantenidos al escribir detalles)
+    total = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0'),
+        help_text="Suma de subtotales de los detalles"
+    )
+    num_items = models.PositiveIntegerField(
+        default=0,
+        help_text="Cantidad de líneas (detalles) del pedido"
+    )
+
+    objects = PedidoQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Recuerda el estado leído de la BD para detectar transiciones sin otro SELECT"""
+        instance = super().from_db(db, field_names, values)
+        instance._estado_original = instance.__dict__.get('estado')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or 'estado' in fields:
+            self._estado_original = self.estado
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._estado_original = self.estado
+
+    @property
+    def estado_original(self):
+        """Estado persistido en la BD (None si no se conoce, p.ej. campo diferido)"""
+        return getattr(self, '_estado_original', None)
+
+    @staticmethod
+    def campos_timestamp_transicion(nuevo_estado, ahora):
+        """
+        Expresiones para fecha_listo/fecha_entregado al entrar a nuevo_estado.
+        Solo completan fechas vacías (Coalesce), igual que la transición individual.
+        """
+        if nuevo_estado == EstadoPedido.LISTO:
+            return {'fecha_listo': Coalesce(F('fecha_listo'), Value(ahora))}
+        if nuevo_estado == EstadoPedido.ENTREGADO:
+            return {
+                'fecha_listo': Coalesce(F('fecha_listo'), Value(ahora)),
+                'fecha_entregado': Coalesce(F('fecha_entregado'), Value(ahora)),
+            }
+        return {}
+
+    def aplicar_timestamps_transicion(self, estado_anterior, ahora=None):
+        """Completa fecha_listo/fecha_entregado si el estado cambió respecto a estado_anterior"""
+        if self.estado == estado_anterior:
+            return
+        ahora = ahora or timezone.now()
+
+        # Transición a LISTO
+        if self.estado == EstadoPedido.LISTO and not self.fecha_listo:
+            self.fecha_listo = ahora
+
+        # Transición a ENTREGADO
+        if self.estado == EstadoPedido.ENTREGADO:
+            if not self.fecha_entregado:
+                self.fecha_entregado = ahora
+            if not self.fecha_listo:
+                self.fecha_listo = ahora
 
     def puede_transicionar_a(self, nuevo_estado):
         """Verifica si la transición de estado es válida"""
         return nuevo_estado in TRANSICIONES_VALIDAS.get(self.estado, [])
 
-    @property
-    def total(self):
-        """Calcula el total del pedido"""
-        return sum(detalle.subtotal for detalle in self.detalles.all())
+    @staticmethod
+    def expresiones_totales():
+        """
+        Subqueries que calculan total y num_items desde DetallePedido.
+        Permiten recalcular los totales en un solo UPDATE.
+        """
+        detalles = DetallePedido.objects.filter(pedido=OuterRef('pk')).order_by().values('pedido')
+        return {
+            'total': Coalesce(
+                Subquery(detalles.annotate(
+                    suma=Sum(F('precio_unitario') * F('cantidad'))
+                ).values('suma')),
+                Decimal('0'),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            ),
+            'num_items': Coalesce(
+                Subquery(detalles.annotate(conteo=Count('id')).values('conteo')),
+                0
+            ),
+        }
+
+    @classmethod
+    def recalcular_totales(cls, pedido_ids):
+        """Recalcula total y num_items de los pedidos indicados en un solo UPDATE"""
+        return cls.objects.filter(pk__in=pedido_ids).update(**cls.expresiones_totales())
 
     def __str__(self):
         return f"Pedido #{self.id} - Mesa {self.mesa.numero} - {self.get_estado_display()}"
@@ -90,6 +208,7 @@ class Pedido(models.Model):
             models.Index(fields=['fecha_listo']),
             models.Index(fields=['fecha_entregado']),
             models.Index(fields=['estado', 'fecha_listo']),
+            models.Index(fields=['fecha_creacion', 'total']),
         ]
 
 
@@ -182,3 +301,568 @@ class PedidoCancelacion(models.Model):
             models.Index(fields=['fecha_cancelacion']),
             models.Index(fields=['cancelado_por', 'fecha_cancelacion']),
         ]
+
+
+def _minutos(inicio, fin):
+    """Minutos enteros entre dos fechas (histogramas de latencia)"""
+    return max(0, min(EstadisticaCocinaDiaria.MAX_MINUTOS, round((fin - inicio).total_seconds() / 60)))
+
+
+def _percentil(histograma, p):
+    """Percentil p (0-100) de un histograma {minutos: cantidad}"""
+    total = sum(histograma.values())
+    if not total:
+        return None
+    objetivo = p * total / 100
+    acumulado = 0
+    for minutos in sorted(histograma, key=int):
+        acumulado += histograma[minutos]
+        if acumulado >= objetivo:
+            return int(minutos)
+    return None
+
+
+class EstadisticaCocinaDiaria(models.Model):
+    """
+    Estadísticas de cocina de un día, mantenidas en cada transición de pedido.
+
+    - por_estado: pedidos creados ese día según su estado actual
+    - hist_preparacion / hist_entrega: histogramas {minutos: cantidad} de
+      creación→listo y listo→entregado (por día de fecha_listo / fecha_entregado)
+    - hist_espera / hist_coccion: creación→inicio de preparación e inicio de
+      preparación→listo, según el registro TransicionPedido
+    - listos_por_hora: pedidos que pasaron a LISTO por hora local
+    """
+    MAX_MINUTOS = 24 * 60
+    CAMPOS_CONTADORES = [
+        'por_estado', 'hist_preparacion', 'hist_entrega', 'hist_espera', 'hist_coccion', 'listos_por_hora'
+    ]
+
+    fecha = models.DateField(unique=True)
+    total_pedidos = models.PositiveIntegerField(default=0)
+    por_estado = models.JSONField(default=dict, blank=True)
+    hist_preparacion = models.JSONField(default=dict, blank=True)
+    hist_entrega = models.JSONField(default=dict, blank=True)
+    hist_espera = models.JSONField(default=dict, blank=True)
+    hist_coccion = models.JSONField(default=dict, blank=True)
+    listos_por_hora = models.JSONField(default=dict, blank=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def _acumulado():
+        return {
+            'total_pedidos': 0,
+            'por_estado': Counter(),
+            'hist_preparacion': Counter(),
+            'hist_entrega': Counter(),
+            'hist_espera': Counter(),
+            'hist_coccion': Counter(),
+            'listos_por_hora': Counter(),
+        }
+
+    @classmethod
+    def _acumular(cls, cambios, pedido, estado_anterior, inicio_preparacion=None):
+        """
+        Suma a 'cambios' (fecha -> acumulado) el efecto de una transición.
+        pedido.fecha_actualizacion es el momento de la transición.
+        """
+        dia_creacion = cambios[timezone.localdate(pedido.fecha_creacion)]
+        if estado_anterior is None:
+            dia_creacion['total_pedidos'] += 1
+        else:
+            dia_creacion['por_estado'][estado_anterior] -= 1
+        dia_creacion['por_estado'][pedido.estado] += 1
+
+        if pedido.estado == EstadoPedido.EN_PREPARACION and pedido.fecha_actualizacion:
+            dia_inicio = cambios[timezone.localdate(pedido.fecha_actualizacion)]
+            dia_inicio['hist_espera'][str(_minutos(pedido.fecha_creacion, pedido.fecha_actualizacion))] += 1
+
+        if pedido.fecha_listo and pedido.estado == EstadoPedido.LISTO:
+            listo_local = timezone.localtime(pedido.fecha_listo)
+            dia_listo = cambios[listo_local.date()]
+            dia_listo['hist_preparacion'][str(_minutos(pedido.fecha_creacion, pedido.fecha_listo))] += 1
+            dia_listo['listos_por_hora'][str(listo_local.hour)] += 1
+            if inicio_preparacion:
+                dia_listo['hist_coccion'][str(_minutos(inicio_preparacion, pedido.fecha_listo))] += 1
+
+        if pedido.fecha_entregado and pedido.estado == EstadoPedido.ENTREGADO:
+            dia_entrega = cambios[timezone.localdate(pedido.fecha_entregado)]
+            if estado_anterior == EstadoPedido.LISTO:
+                dia_entrega['hist_entrega'][str(_minutos(pedido.fecha_listo, pedido.fecha_entregado))] += 1
+
+    @classmethod
+    def registrar_transiciones(cls, transiciones):
+        """
+        Acumula el efecto de transiciones ya guardadas; las filas diarias se
+        actualizan cuando la transacción confirma (ver _aplicar_cambios), así
+        las escrituras de cocina no esperan el bloqueo de la fila del día.
+
+        Args:
+            transiciones: Iterable de (pedido, estado_anterior); estado_anterior
+                None indica un pedido recién creado
+        """
+        transiciones = [(p, anterior) for p, anterior in transiciones if anterior != p.estado]
+
+        # Inicio de preparación de los pedidos que pasan a LISTO (registro de transiciones)
+        listos = [p.pk for p, _ in transiciones if p.estado == EstadoPedido.LISTO]
+        inicios = TransicionPedido.inicios_preparacion(listos) if listos else {}
+
+        cambios = defaultdict(cls._acumulado)
+        for pedido, estado_anterior in transiciones:
+            cls._acumular(cambios, pedido, estado_anterior, inicios.get(pedido.pk))
+        if cambios:
+            _estadisticas_pendientes.agregar(cambios)
+
+    @staticmethod
+    def _combinar(pendientes, cambios):
+        """Suma 'cambios' (fecha -> acumulado) a los pendientes de la transacción"""
+        for fecha, acumulado in cambios.items():
+            destino = pendientes[fecha]
+            destino['total_pedidos'] += acumulado['total_pedidos']
+            for campo in EstadisticaCocinaDiaria.CAMPOS_CONTADORES:
+                destino[campo].update(acumulado[campo])
+
+    @classmethod
+    def _aplicar_cambios(cls, cambios):
+        """
+        Suma los cambios de una transacción confirmada a las filas diarias:
+        una transacción corta, una fila bloqueada por día tocado.
+        """
+        with transaction.atomic():
+            # Orden fijo de bloqueo entre transacciones concurrentes
+            for fecha in sorted(cambios):
+                fila, _ = cls.objects.select_for_update().get_or_create(fecha=fecha)
+                fila._sumar(cambios[fecha])
+                fila.save()
+
+    @classmethod
+    def registrar_transicion(cls, pedido, estado_anterior):
+        cls.registrar_transiciones([(pedido, estado_anterior)])
+
+    def _sumar(self, acumulado):
+        self.total_pedidos += acumulado['total_pedidos']
+        for campo in self.CAMPOS_CONTADORES:
+            valores = Counter(getattr(self, campo))
+            valores.update(acumulado[campo])
+            setattr(self, campo, {clave: n for clave, n in valores.items() if n > 0})
+
+    @classmethod
+    def reconstruir(cls, fecha):
+        """
+        Recalcula la fila de un día desde los pedidos y el registro de
+        transiciones (rangos de fecha sargables sobre sus índices).
+
+        Returns:
+            La fila recalculada, o None si el día puede tener pedidos
+            archivados: ya no están en Pedido y la fila se conserva
+        """
+        ultimo_archivado = PedidoArchivado.ultimo_dia_archivado()
+        if ultimo_archivado is not None and fecha <= ultimo_archivado:
+            return None
+
+        inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+        fin = inicio + timedelta(days=1)
+
+        acumulado = cls._acumulado()
+        creados = Pedido.objects.filter(fecha_creacion__gte=inicio, fecha_creacion__lt=fin)
+        for estado in creados.values_list('estado', flat=True):
+            acumulado['total_pedidos'] += 1
+            acumulado['por_estado'][estado] += 1
+
+        listos = Pedido.objects.filter(
+            fecha_listo__gte=inicio, fecha_listo__lt=fin
+        ).values_list('fecha_creacion', 'fecha_listo')
+        for fecha_creacion, fecha_listo in listos:
+            acumulado['hist_preparacion'][str(_minutos(fecha_creacion, fecha_listo))] += 1
+            acumulado['listos_por_hora'][str(timezone.localtime(fecha_listo).hour)] += 1
+
+        entregados = Pedido.objects.filter(
+            fecha_entregado__gte=inicio, fecha_entregado__lt=fin, fecha_listo__isnull=False
+        ).values_list('fecha_listo', 'fecha_entregado')
+        for fecha_listo, fecha_entregado in entregados:
+            acumulado['hist_entrega'][str(_minutos(fecha_listo, fecha_entregado))] += 1
+
+        transiciones_dia = TransicionPedido.objects.filter(fecha__gte=inicio, fecha__lt=fin)
+        esperas = transiciones_dia.filter(
+            estado_nuevo=EstadoPedido.EN_PREPARACION
+        ).values_list('fecha', 'pedido__fecha_creacion')
+        for fecha_inicio, fecha_creacion in esperas:
+            acumulado['hist_espera'][str(_minutos(fecha_creacion, fecha_inicio))] += 1
+
+        listos = dict(transiciones_dia.filter(
+            estado_nuevo=EstadoPedido.LISTO
+        ).values_list('pedido_id', 'fecha'))
+        inicios = TransicionPedido.inicios_preparacion(listos)
+        for pedido_id, fecha_listo in listos.items():
+            if pedido_id in inicios:
+                acumulado['hist_coccion'][str(_minutos(inicios[pedido_id], fecha_listo))] += 1
+
+        fila = cls(fecha=fecha)
+        fila._sumar(acumulado)
+        cls.objects.update_or_create(fecha=fecha, defaults={
+            campo: getattr(fila, campo) for campo in ['total_pedidos'] + cls.CAMPOS_CONTADORES
+        })
+        return fila
+
+    @staticmethod
+    def _resumen_latencia(histograma):
+        muestras = sum(histograma.values())
+        return {
+            'muestras': muestras,
+            'p50': _percentil(histograma, 50),
+            'p90': _percentil(histograma, 90),
+            'promedio': (
+                round(sum(int(m) * n for m, n in histograma.items()) / muestras, 1)
+                if muestras else None
+            ),
+        }
+
+    def resumen(self):
+        """Datos para el endpoint de estadísticas de cocina"""
+        por_estado = self.por_estado
+        return {
+            'fecha': self.fecha.isoformat(),
+            'total_pedidos': self.total_pedidos,
+            'por_estado': por_estado,
+            'pedidos_pendientes': por_estado.get('CREADO', 0) + por_estado.get('URGENTE', 0),
+            'pedidos_en_preparacion': por_estado.get('EN_PREPARACION', 0),
+            'pedidos_listos': por_estado.get('LISTO', 0),
+            'pedidos_entregados': por_estado.get('ENTREGADO', 0),
+            'pedidos_cancelados': por_estado.get('CANCELADO', 0),
+            'tiempo_preparacion': self._resumen_latencia(self.hist_preparacion),
+            'tiempo_entrega': self._resumen_latencia(self.hist_entrega),
+            'tiempo_espera': self._resumen_latencia(self.hist_espera),
+            'tiempo_coccion': self._resumen_latencia(self.hist_coccion),
+            'listos_por_hora': {
+                int(hora): n for hora, n in sorted(self.listos_por_hora.items(), key=lambda x: int(x[0]))
+            },
+            'actualizado': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None,
+        }
+
+    def __str__(self):
+        return f"Estadísticas de cocina {self.fecha}"
+
+    class Meta:
+        verbose_name = "Estadística diaria de cocina"
+        verbose_name_plural = "Estadísticas diarias de cocina"
+        ordering = ['-fecha']
+
+
+# Cambios de estadísticas por transacción de cocina; se aplican al confirmar
+_estadisticas_pendientes = LotePorTransaccion(
+    lambda cambios: EstadisticaCocinaDiaria._aplicar_cambios(cambios),
+    crear=lambda: defaultdict(EstadisticaCocinaDiaria._acumulado),
+    acumular=EstadisticaCocinaDiaria._combinar,
+)
+
+
+class TransicionPedido(models.Model):
+    """
+    Registro append-only de cambios de estado de pedidos (analítica).
+
+    Se escribe en cada transición (creación incluida, con estado_anterior
+    vacío) y no se modifica. No tiene FK real hacia Pedido para que sobreviva
+    al archivado de pedidos antiguos y no compita con los UPDATE de cocina.
+    """
+    pedido = models.ForeignKey(
+        Pedido,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='transiciones'
+    )
+    estado_anterior = models.CharField(
+        max_length=20, choices=EstadoPedido.choices, null=True, blank=True
+    )
+    estado_nuevo = models.CharField(max_length=20, choices=EstadoPedido.choices)
+    fecha = models.DateTimeField(default=timezone.now)
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='+'
+    )
+
+    @classmethod
+    def registrar(cls, transiciones, usuario=None):
+        """
+        Escribe las transiciones y encola su efecto en las estadísticas
+        diarias (se aplica al confirmar la transacción).
+
+        Args:
+            transiciones: Iterable de (pedido, estado_anterior) ya guardados;
+                pedido.fecha_actualizacion es el momento de la transición
+            usuario: Usuario que ejecutó el cambio (opcional)
+        """
+        transiciones = [(p, anterior) for p, anterior in transiciones if anterior != p.estado]
+        if not transiciones:
+            return
+        usuario_id = usuario.pk if usuario is not None and usuario.is_authenticated else None
+        cls.objects.bulk_create([
+            cls(
+                pedido_id=pedido.pk,
+                estado_anterior=estado_anterior,
+                estado_nuevo=pedido.estado,
+                fecha=pedido.fecha_actualizacion or timezone.now(),
+                usuario_id=usuario_id,
+            )
+            for pedido, estado_anterior in transiciones
+        ])
+        EstadisticaCocinaDiaria.registrar_transiciones(transiciones)
+
+    @classmethod
+    def inicios_preparacion(cls, pedido_ids):
+        """{pedido_id: fecha} de la última entrada a EN_PREPARACION de cada pedido"""
+        return dict(
+            cls.objects.filter(
+                pedido_id__in=pedido_ids, estado_nuevo=EstadoPedido.EN_PREPARACION
+            ).order_by().values('pedido_id').annotate(inicio=Max('fecha')).values_list('pedido_id', 'inicio')
+        )
+
+    @classmethod
+    def tiempos_por_estado(cls, desde, hasta):
+        """
+        Minutos que los pedidos pasaron en cada estado, a partir de pares de
+        transiciones consecutivas dentro de [desde, hasta).
+
+        Returns:
+            dict {estado: [minutos, ...]}
+        """
+        filas = cls.objects.filter(
+            fecha__gte=desde, fecha__lt=hasta
+        ).order_by('pedido_id', 'fecha', 'id').values_list('pedido_id', 'estado_nuevo', 'fecha')
+
+        tiempos = defaultdict(list)
+        anterior = None
+        for pedido_id, estado, fecha in filas.iterator(chunk_size=2000):
+            if anterior is not None and anterior[0] == pedido_id:
+                tiempos[anterior[1]].append((fecha - anterior[2]).total_seconds() / 60)
+            anterior = (pedido_id, estado, fecha)
+        return tiempos
+
+    def __str__(self):
+        return f"Pedido #{self.pedido_id}: {self.estado_anterior or '-'} → {self.estado_nuevo}"
+
+    class Meta:
+        verbose_name = "Transición de Pedido"
+        verbose_name_plural = "Transiciones de Pedidos"
+        ordering = ['fecha']
+        indexes = [
+            models.Index(fields=['fecha']),
+            models.Index(fields=['pedido', 'fecha']),
+            models.Index(fields=['estado_nuevo', 'fecha']),
+        ]
+
+
+class ResumenCancelacionDiario(models.Model):
+    """
+    Rollup diario de cancelaciones por dimensión (total, usuario, mesa, plato).
+    Se mantiene al registrar cada PedidoCancelacion y se puede reconstruir
+    con el comando reconstruir_resumen_cancelaciones.
+    """
+
+    class Dimension(models.TextChoices):
+        TOTAL = 'TOTAL', 'Total'
+        USUARIO = 'USUARIO', 'Usuario'
+        MESA = 'MESA', 'Mesa'
+        PLATO = 'PLATO', 'Plato'
+
+    fecha = models.DateField()
+    dimension = models.CharField(max_length=10, choices=Dimension.choices)
+    clave = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="ID del usuario/plato o número de mesa (vacío para TOTAL o sin usuario)"
+    )
+    etiqueta = models.CharField(max_length=200, blank=True, help_text="Username, número de mesa o nombre del plato")
+    descripcion = models.CharField(max_length=200, blank=True, help_text="Nombre completo del usuario")
+    cancelaciones = models.PositiveIntegerField(default=0, help_text="Pedidos cancelados")
+    unidades = models.PositiveIntegerField(default=0, help_text="Unidades de plato canceladas")
+    monto_perdido = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+
+    @classmethod
+    def _acumular(cls, acumulado, cancelacion):
+        """Suma una cancelación a acumulado {(fecha, dimension, clave): fila}"""
+        fecha = timezone.localdate(cancelacion.fecha_cancelacion)
+
+        def fila(dimension, clave, etiqueta='', descripcion=''):
+            return acumulado.setdefault((fecha, dimension, str(clave)), {
+                'etiqueta': str(etiqueta)[:200],
+                'descripcion': descripcion[:200],
+                'cancelaciones': 0,
+                'unidades': 0,
+                'monto_perdido': Decimal('0'),
+            })
+
+        usuario = cancelacion.cancelado_por
+        if usuario is not None:
+            perfil = getattr(usuario, 'perfil', None)
+            fila_usuario = fila(
+                cls.Dimension.USUARIO, usuario.pk, usuario.username,
+                perfil.nombre_completo if perfil else ''
+            )
+        else:
+            fila_usuario = fila(cls.Dimension.USUARIO, '')
+
+        total = Decimal(cancelacion.total_pedido or 0)
+        for f in [fila(cls.Dimension.TOTAL, ''), fila_usuario,
+                  fila(cls.Dimension.MESA, cancelacion.mesa_numero, cancelacion.mesa_numero)]:
+            f['cancelaciones'] += 1
+            f['monto_perdido'] += total
+
+        platos = {}
+        for producto in cancelacion.productos_detalle or []:
+            plato = platos.setdefault(
+                producto['plato_id'],
+                fila(cls.Dimension.PLATO, producto['plato_id'], producto.get('plato_nombre', ''))
+            )
+            plato['unidades'] += producto.get('cantidad', 0)
+            plato['monto_perdido'] += Decimal(str(producto.get('subtotal', 0)))
+        for plato in platos.values():
+            plato['cancelaciones'] += 1
+
+    @classmethod
+    def registrar(cls, cancelacion):
+        """
+        Acumula una cancelación ya guardada; los rollups se actualizan cuando
+        la transacción confirma (ver _aplicar), así la cancelación no espera
+        el bloqueo de la fila TOTAL del día.
+        """
+        _cancelaciones_pendientes.agregar(cancelacion)
+
+    @classmethod
+    def _aplicar(cls, acumulado):
+        """
+        Suma las cancelaciones de una transacción confirmada a los rollups:
+        una transacción corta de 2 queries.
+        """
+        with transaction.atomic():
+            # Crear las filas que falten en cero y sumar en un solo UPDATE
+            cls.objects.bulk_create([
+                cls(fecha=fecha, dimension=dimension, clave=clave,
+                    etiqueta=fila['etiqueta'], descripcion=fila['descripcion'])
+                for (fecha, dimension, clave), fila in acumulado.items()
+            ], ignore_conflicts=True)
+
+            def suma(campo, output_field):
+                return F(campo) + Case(
+                    *[When(fecha=fecha, dimension=dimension, clave=clave, then=Value(fila[campo]))
+                      for (fecha, dimension, clave), fila in acumulado.items()],
+                    default=Value(0),
+                    output_field=output_field
+                )
+
+            filtro = Q()
+            for fecha, dimension, clave in acumulado:
+                filtro |= Q(fecha=fecha, dimension=dimension, clave=clave)
+            cls.objects.filter(filtro).update(
+                cancelaciones=suma('cancelaciones', IntegerField()),
+                unidades=suma('unidades', IntegerField()),
+                monto_perdido=suma('monto_perdido', DecimalField(max_digits=12, decimal_places=2)),
+            )
+
+    @classmethod
+    def reconstruir(cls, fecha_inicio, fecha_fin):
+        """
+        Reemplaza los rollups de [fecha_inicio, fecha_fin] recalculándolos
+        desde PedidoCancelacion (rango sargable sobre fecha_cancelacion).
+        Los días que pueden tener pedidos archivados se conservan: sus
+        cancelaciones se borraron junto con el pedido.
+
+        Returns:
+            Número de cancelaciones procesadas
+        """
+        ultimo_archivado = PedidoArchivado.ultimo_dia_archivado()
+        if ultimo_archivado is not None:
+            fecha_inicio = max(fecha_inicio, ultimo_archivado + timedelta(days=1))
+        if fecha_inicio > fecha_fin:
+            return 0
+
+        inicio = timezone.make_aware(datetime.combine(fecha_inicio, time.min))
+        fin = timezone.make_aware(datetime.combine(fecha_fin + timedelta(days=1), time.min))
+
+        acumulado = {}
+        cancelaciones = PedidoCancelacion.objects.filter(
+            fecha_cancelacion__gte=inicio,
+            fecha_cancelacion__lt=fin
+        ).select_related('cancelado_por', 'cancelado_por__perfil')
+        procesadas = 0
+        for cancelacion in cancelaciones.iterator(chunk_size=1000):
+            cls._acumular(acumulado, cancelacion)
+            procesadas += 1
+
+        with transaction.atomic():
+            cls.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin).delete()
+            cls.objects.bulk_create([
+                cls(fecha=fecha, dimension=dimension, clave=clave, **fila)
+                for (fecha, dimension, clave), fila in acumulado.items()
+            ], batch_size=1000)
+        return procesadas
+
+    def __str__(self):
+        return f"{self.fecha} {self.dimension} {self.etiqueta or self.clave}: {self.cancelaciones}"
+
+    class Meta:
+        verbose_name = "Resumen diario de cancelaciones"
+        verbose_name_plural = "Resúmenes diarios de cancelaciones"
+        ordering = ['-fecha', 'dimension', '-cancelaciones']
+        unique_together = ['fecha', 'dimension', 'clave']
+
+
+# Cancelaciones por transacción; los rollups se actualizan al confirmar
+_cancelaciones_pendientes = LotePorTransaccion(
+    lambda acumulado: ResumenCancelacionDiario._aplicar(acumulado),
+    crear=dict,
+    acumular=lambda acumulado, cancelacion: ResumenCancelacionDiario._acumular(acumulado, cancelacion),
+)
+
+
+class PedidoArchivado(models.Model):
+    """
+    Pedido finalizado (ENTREGADO o CANCELADO) movido fuera de las tablas
+    activas por el comando archivar_pedidos.
+
+    'datos' guarda la representación completa de PedidoSerializer al momento
+    de archivar (detalles y cancelación incluidos); las demás columnas son
+    solo para filtrar el historial sin leer el JSON.
+    """
+    pedido_id = models.PositiveIntegerField(unique=True, help_text="ID original del pedido")
+    mesa_id = models.PositiveIntegerField(null=True, blank=True)
+    mesa_numero = models.IntegerField(null=True, blank=True)
+    cliente_id = models.PositiveIntegerField(null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=EstadoPedido.choices)
+    fecha_creacion = models.DateTimeField()
+    fecha_cierre = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="fecha_entregado o fecha de cancelación"
+    )
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0'))
+    datos = models.JSONField()
+    fecha_archivado = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def ultimo_dia_archivado(cls):
+        """
+        Último día (local) con actividad de pedidos archivados, o None.
+        Hasta ese día las tablas activas ya no tienen todos los pedidos, así
+        que los rollups de esos días no se pueden recalcular desde ellas.
+        """
+        fechas = cls.objects.aggregate(cierre=Max('fecha_cierre'), creacion=Max('fecha_creacion'))
+        fechas = [fecha for fecha in fechas.values() if fecha is not None]
+        return timezone.localdate(max(fechas)) if fechas else None
+
+    def __str__(self):
+        return f"Pedido archivado #{self.pedido_id} - {self.estado}"
+
+    class Meta:
+        verbose_name = "Pedido archivado"
+        verbose_name_plural = "Pedidos archivados"
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['fecha_creacion']),
+            models.Index(fields=['estado', 'fecha_creacion']),
+            models.Index(fields=['mesa_numero', 'fecha_creacion']),
+            models.Index(fields=['cliente_id', 'fecha_creacion']),
+        ]
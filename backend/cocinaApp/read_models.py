@@ -0,0 +1,247 @@
+"""
+Modelos de lectura en memoria para las vistas de cocina.
+
+ColaCocina mantiene los pedidos activos (CREADO, URGENTE, EN_PREPARACION)
+ya serializados y ordenados por (URGENTE primero, fecha_creacion). Se
+construye una vez desde la BD y luego se actualiza con los mismos eventos
+delta que alimentan el grupo WebSocket 'cola_cocina' (event_stream), por
+lo que una lectura de la cola no toca la base de datos: solo compara la
+secuencia del grupo y aplica los eventos pendientes.
+
+Cada pedido de la cola lleva además su hora estimada de salida (eta),
+calculada por el planificador incremental de cocinaApp.eta.
+"""
+import bisect
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Case, When, IntegerField
+from django.utils import timezone
+
+from . import event_stream
+from .eta import PlanificadorETA, duracion_pedido
+from .models import Pedido, EstadoPedido, TransicionPedido
+
+GRUPO_COLA = 'cola_cocina'
+ESTADOS_COLA = {EstadoPedido.CREADO, EstadoPedido.URGENTE, EstadoPedido.EN_PREPARACION}
+
+
+def _clave_orden(pedido_data):
+    return (
+        0 if pedido_data['estado'] == EstadoPedido.URGENTE else 1,
+        datetime.fromisoformat(pedido_data['fecha_creacion']),
+        pedido_data['id'],
+    )
+
+
+class ColaCocina:
+    """Cola de cocina ordenada en memoria (por proceso)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pedidos = {}   # id -> (clave, pedido_data)
+        self._orden = []     # claves ordenadas
+        self._seq = None     # última secuencia de 'cola_cocina' aplicada
+        self._construida_en = 0.0
+        self._planificador = self._nuevo_planificador()
+
+    @staticmethod
+    def _nuevo_planificador():
+        return PlanificadorETA(getattr(settings, 'COCINA_ESTACIONES', 3))
+
+    # ---------- Escritura ----------
+
+    def _quitar(self, pedido_id):
+        actual = self._pedidos.pop(pedido_id, None)
+        if actual is not None:
+            indice = bisect.bisect_left(self._orden, actual[0])
+            del self._orden[indice]
+            self._planificador.quitar(pedido_id)
+
+    def _guardar(self, pedido_data, inicio=None):
+        """
+        Args:
+            inicio: Entrada a EN_PREPARACION según TransicionPedido. En los
+                eventos no hace falta: el evento que entra a EN_PREPARACION
+                trae fecha_actualizacion = momento de la transición y los
+                siguientes conservan el inicio ya planificado.
+        """
+        self._quitar(pedido_data['id'])
+        if pedido_data['estado'] not in ESTADOS_COLA:
+            return
+        clave = _clave_orden(pedido_data)
+        self._pedidos[pedido_data['id']] = (clave, pedido_data)
+        bisect.insort(self._orden, clave)
+        self._planificador.actualizar(
+            pedido_data['id'],
+            pedido_data['estado'],
+            clave[1],
+            duracion_pedido(d.get('plato_tiempo_preparacion') for d in pedido_data['detalles']),
+            inicio=inicio or datetime.fromisoformat(pedido_data['fecha_actualizacion']),
+        )
+
+    def _aplicar_evento(self, evento):
+        """Aplica un delta del grupo. Retorna False si falta información (reconstruir)"""
+        if 'pedido' in evento:
+            self._guardar(evento['pedido'])
+            return True
+
+        actual = self._pedidos.get(evento['id'])
+        if evento['estado'] not in ESTADOS_COLA:
+            self._quitar(evento['id'])
+            return True
+        if actual is None:
+            return False
+
+        self._guardar({**actual[1], **evento['cambios'], 'estado': evento['estado']})
+        return True
+
+    def _reconstruir(self):
+        """Carga la cola desde la BD (misma consulta que la vista original)"""
+        from .serializers import PedidoSerializer
+        from .websocket_utils import a_tipos_nativos
+
+        # Leer la secuencia ANTES de consultar: los eventos posteriores se
+        # vuelven a aplicar y son idempotentes (valores absolutos)
+        seq = event_stream.secuencia_actual(GRUPO_COLA)
+
+        pedidos = Pedido.objects.filter(
+            estado__in=ESTADOS_COLA
+        ).select_related(
+            'mesa', 'cliente', 'cliente__perfil'
+        ).prefetch_related(
+            'detalles__plato', 'cancelacion'
+        ).annotate(
+            urgente_primero=Case(
+                When(estado='URGENTE', then=0),
+                default=1,
+                output_field=IntegerField()
+            )
+        ).order_by('urgente_primero', 'fecha_creacion')
+
+        datos = a_tipos_nativos(PedidoSerializer(pedidos, many=True).data)
+        # fecha_actualizacion cambia con cualquier edición (p.ej. notas): el
+        # inicio de preparación sale del registro de transiciones
+        inicios = TransicionPedido.inicios_preparacion([
+            pedido_data['id'] for pedido_data in datos
+            if pedido_data['estado'] == EstadoPedido.EN_PREPARACION
+        ])
+
+        self._pedidos = {}
+        self._orden = []
+        self._planificador = self._nuevo_planificador()
+        for pedido_data in datos:
+            self._guardar(pedido_data, inicio=inicios.get(pedido_data['id']))
+        self._seq = seq
+        self._construida_en = time.monotonic()
+
+    def _aplicar_pendientes(self):
+        """
+        Aplica los eventos del grupo posteriores a la última secuencia.
+        Retorna False si hay un hueco, la secuencia se reinició o falta
+        información (reconstruir).
+        """
+        actual = event_stream.secuencia_actual(GRUPO_COLA)
+        if actual == self._seq:
+            return True
+        if actual < self._seq:
+            # La secuencia se reinició: los eventos nuevos reusan números ya vistos
+            return False
+
+        eventos, completo = event_stream.eventos_desde(GRUPO_COLA, self._seq)
+        if not completo:
+            return False
+
+        for evento in eventos:
+            if not self._aplicar_evento(evento):
+                return False
+            self._seq = evento['seq']
+        return True
+
+    def sincronizar(self):
+        """Aplica los eventos pendientes del grupo o reconstruye si hay un hueco"""
+        ttl = getattr(settings, 'COLA_COCINA_TTL', 300)
+        with self._lock:
+            if (
+                self._seq is None
+                or time.monotonic() - self._construida_en > ttl
+                or not self._aplicar_pendientes()
+            ):
+                self._reconstruir()
+
+    def _recalcular_eta(self):
+        """Recalcula las ETA pendientes; retorna las que cambiaron"""
+        ahora = timezone.now()
+        base = self._planificador.base
+        completo = (
+            base is None
+            or (ahora - base).total_seconds() > getattr(settings, 'COCINA_ETA_RECALCULO', 60)
+        )
+        return self._planificador.recalcular(ahora, completo=completo)
+
+    def etas_actualizadas(self):
+        """
+        Retorna (etas, cambios): la ETA de cada pedido activo y las que
+        cambiaron desde el último cálculo, en ISO 8601.
+
+        Pensado para el camino de publicación: solo aplica a la cola en
+        memoria los eventos nuevos del grupo, sin consultar la BD. Si la cola
+        no está construida o no puede ponerse al día retorna ({}, {}) y la
+        próxima lectura la reconstruye.
+        """
+        with self._lock:
+            if self._seq is None:
+                return {}, {}
+            if not self._aplicar_pendientes():
+                self._seq = None
+                return {}, {}
+            cambios = self._recalcular_eta()
+            etas = dict(self._planificador.etas)
+        return (
+            {pedido_id: eta.isoformat() for pedido_id, eta in etas.items()},
+            {pedido_id: eta.isoformat() for pedido_id, eta in cambios.items()},
+        )
+
+    def invalidar(self):
+        with self._lock:
+            self._seq = None
+
+    # ---------- Lectura ----------
+
+    def listar(self, estado=None, desde=None):
+        """
+        Pedidos de la cola en orden (URGENTE primero, luego por creación).
+
+        Args:
+            estado: Filtrar por un estado de la cola (opcional)
+            desde: datetime; solo pedidos creados desde entonces (opcional)
+        """
+        self.sincronizar()
+        ahora = timezone.now()
+        resultado = []
+        with self._lock:
+            self._recalcular_eta()
+            etas = self._planificador.etas
+            for clave in self._orden:
+                if desde is not None and clave[1] < desde:
+                    continue
+                pedido_data = self._pedidos[clave[2]][1]
+                if estado is not None and pedido_data['estado'] != estado:
+                    # URGENTE va primero: al terminar los urgentes no hay más
+                    if estado == EstadoPedido.URGENTE:
+                        break
+                    continue
+                eta = etas[clave[2]]
+                resultado.append({
+                    **pedido_data,
+                    # Campos dependientes del reloj
+                    'tiempo_desde_creacion': int((ahora - clave[1]).total_seconds() / 60),
+                    'eta': eta.isoformat(),
+                    'eta_minutos': max(0, int((eta - ahora).total_seconds() // 60)),
+                })
+        return resultado
+
+
+cola_cocina = ColaCocina()
@@ -6,12 +6,13 @@ from menuApp.models import Plato
 
 class DetallePedidoSerializer(serializers.ModelSerializer):
     plato_nombre = serializers.CharField(source='plato.nombre', read_only=True)
+    plato_tiempo_preparacion = serializers.IntegerField(source='plato.tiempo_preparacion', read_only=True)
     subtotal = serializers.ReadOnlyField()
 
     class Meta:
         model = DetallePedido
         fields = [
-            'id', 'plato', 'plato_nombre', 'cantidad',
+            'id', 'plato', 'plato_nombre', 'plato_tiempo_preparacion', 'cantidad',
             'precio_unitario', 'notas_especiales', 'subtotal'
         ]
         read_only_fields = ['precio_unitario']
@@ -63,10 +64,13 @@ class PedidoSerializer(serializers.ModelSerializer):
             'estado', 'notas', 'fecha_creacion', 'fecha_actualizacion',
             'fecha_listo', 'fecha_entregado',
             'tiempo_desde_creacion', 'tiempo_desde_listo', 'tiempo_total',
-            'detalles', 'transiciones_permitidas', 'total',
+            'detalles', 'transiciones_permitidas', 'total', 'num_items',
             'cancelacion'
         ]
-        read_only_fields = ['estado', 'fecha_creacion', 'fecha_actualizacion', 'fecha_listo', 'fecha_entregado']
+        read_only_fields = [
+            'estado', 'fecha_creacion', 'fecha_actualizacion', 'fecha_listo', 'fecha_entregado',
+            'num_items'
+        ]
 
     def get_cliente_nombre(self, obj):
         """Obtener nombre completo del cliente desde perfil"""
@@ -125,7 +129,7 @@ class PedidoListSerializer(serializers.ModelSerializer):
     mesa_numero = serializers.IntegerField(source='mesa.numero', read_only=True)
     cliente_nombre = serializers.SerializerMethodField()
     total = serializers.ReadOnlyField()
-    num_items = serializers.SerializerMethodField()
+    num_items = serializers.ReadOnlyField()
     tiempo_desde_listo = serializers.SerializerMethodField()
     tiempo_desde_creacion = serializers.SerializerMethodField()
     transiciones_permitidas = serializers.SerializerMethodField()
@@ -145,9 +149,6 @@ class PedidoListSerializer(serializers.ModelSerializer):
             return obj.cliente.perfil.nombre_completo
         return None
 
-    def get_num_items(self, obj):
-        return obj.detalles.count()
-
     def get_tiempo_desde_listo(self, obj):
         """Minutos desde LISTO hasta estado final o ahora. None si no ha llegado a LISTO"""
         if not obj.fecha_listo:
@@ -221,6 +222,21 @@ class PedidoCreateSerializer(serializers.Serializer):
         return validated
 
 
+class DetalleCotizacionSerializer(serializers.Serializer):
+    """Detalle para cotizar: el plato se valida en bloque en el servicio"""
+    plato = serializers.IntegerField(min_value=1)
+    cantidad = serializers.IntegerField(min_value=1)
+    notas = serializers.CharField(required=False, allow_blank=True, max_length=200)
+
+
+class PedidoCotizacionSerializer(serializers.Serializer):
+    """Mismo payload que PedidoCreateSerializer, sin consultas por plato"""
+    mesa = serializers.IntegerField(required=False, allow_null=True)
+    reserva = serializers.IntegerField(required=False, allow_null=True)
+    notas = serializers.CharField(required=False, allow_blank=True, max_length=500)
+    detalles = DetalleCotizacionSerializer(many=True, min_length=1)
+
+
 class CambiarEstadoSerializer(serializers.Serializer):
     """Serializer para cambiar estado de pedido"""
     estado = serializers.ChoiceField(choices=[
@@ -230,3 +246,18 @@ class CambiarEstadoSerializer(serializers.Serializer):
         ('ENTREGADO', 'Entregado'),
         ('CANCELADO', 'Cancelado'),
     ])
+
+
+class CambioEstadoMasivoSerializer(serializers.Serializer):
+    """Serializer para cambiar el estado de varios pedidos (sin cancelación)"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=200
+    )
+    estado = serializers.ChoiceField(choices=[
+        ('EN_PREPARACION', 'En preparación'),
+        ('URGENTE', 'Urgente'),
+        ('LISTO', 'Listo'),
+        ('ENTREGADO', 'Entregado'),
+    ])
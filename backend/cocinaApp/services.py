@@ -1,10 +1,18 @@
+from collections import defaultdict
+from decimal import Decimal
+
 from django.db import transaction
-from django.db.models import F
+from django.db.models import F, Prefetch, Case, When, Value, DecimalField
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
-from .models import Pedido, DetallePedido, PedidoCancelacion, TRANSICIONES_VALIDAS
-from menuApp.models import Ingrediente
+from .models import (
+    Pedido, DetallePedido, PedidoCancelacion, PedidoArchivado, TransicionPedido,
+    EstadoPedido, TRANSICIONES_VALIDAS
+)
+from menuApp.alertas_stock import registrar_movimiento
+from menuApp.models import Ingrediente, Plato, Receta
+from menuApp.services import InventarioService
 from .websocket_utils import enviar_notificacion_pedido
 
 
@@ -31,52 +39,186 @@ class PedidoService:
         Raises:
             ValidationError si el stock es insuficiente
         """
-        # Crear pedido
-        pedido = Pedido.objects.create(
-            mesa=mesa,
-            reserva=reserva,
-            cliente=cliente,
-            notas=notas
-        )
+        # Recetas de todos los platos y bloqueo de sus ingredientes en orden
+        # de pk, el mismo orden que el ajuste masivo de stock: dos transacciones
+        # que tocan los mismos ingredientes nunca se esperan en ciclo
+        recetas = defaultdict(list)
+        for receta in Receta.objects.select_for_update().filter(
+            plato_id__in={d['plato'].pk for d in detalles_data}
+        ).order_by('pk'):
+            recetas[receta.plato_id].append(receta)
+        ingredientes = {
+            ingrediente.pk: ingrediente
+            for ingrediente in Ingrediente.objects.select_for_update().filter(
+                pk__in={r.ingrediente_id for lista in recetas.values() for r in lista}
+            ).order_by('pk').only('nombre', 'unidad_medida', 'cantidad_disponible', 'stock_minimo')
+        }
+        anteriores = {pk: ingrediente.cantidad_disponible for pk, ingrediente in ingredientes.items()}
+
+        detalles = []
+        total = Decimal('0')
 
         for detalle_data in detalles_data:
             plato = detalle_data['plato']
             cantidad = detalle_data['cantidad']
 
-            # Validar y reservar stock para cada ingrediente
-            for receta in plato.recetas.select_for_update().all():
+            # Validar y descontar (en memoria) el stock de cada ingrediente
+            for receta in recetas[plato.pk]:
                 cantidad_necesaria = receta.cantidad_requerida * cantidad
-
-                # Verificar stock disponible
-                ingrediente = Ingrediente.objects.select_for_update().get(pk=receta.ingrediente_id)
+                ingrediente = ingredientes[receta.ingrediente_id]
                 if ingrediente.cantidad_disponible < cantidad_necesaria:
                     raise ValidationError(
                         f"Stock insuficiente de {ingrediente.nombre}. "
                         f"Disponible: {ingrediente.cantidad_disponible}, Necesario: {cantidad_necesaria}"
                     )
+                ingrediente.cantidad_disponible -= cantidad_necesaria
 
-                # Descontar stock con F() para atomicidad
-                Ingrediente.objects.filter(pk=ingrediente.pk).update(
-                    cantidad_disponible=F('cantidad_disponible') - cantidad_necesaria
-                )
-
-            # Crear detalle con precio snapshot
-            DetallePedido.objects.create(
-                pedido=pedido,
+            # Detalle con precio snapshot
+            detalle = DetallePedido(
                 plato=plato,
                 cantidad=cantidad,
                 precio_unitario=plato.precio,
                 notas_especiales=detalle_data.get('notas', '')
             )
+            total += detalle.subtotal
+            detalles.append(detalle)
+
+        # Descontar el stock de todos los ingredientes en un solo UPDATE con F()
+        consumos = {
+            pk: anteriores[pk] - ingrediente.cantidad_disponible
+            for pk, ingrediente in ingredientes.items()
+            if ingrediente.cantidad_disponible != anteriores[pk]
+        }
+        if consumos:
+            Ingrediente.objects.filter(pk__in=consumos).update(
+                cantidad_disponible=F('cantidad_disponible') - Case(
+                    *[When(pk=pk, then=Value(consumo)) for pk, consumo in consumos.items()],
+                    output_field=DecimalField(max_digits=10, decimal_places=3)
+                )
+            )
+            for pk in consumos:
+                registrar_movimiento(ingredientes[pk], anteriores[pk])
+
+        # Crear pedido con totales ya calculados
+        pedido = Pedido.objects.create(
+            mesa=mesa,
+            reserva=reserva,
+            cliente=cliente,
+            notas=notas,
+            total=total,
+            num_items=len(detalles)
+        )
+
+        # bulk_create no dispara post_save: los totales ya quedaron guardados arriba
+        for detalle in detalles:
+            detalle.pedido = pedido
+        DetallePedido.objects.bulk_create(detalles)
 
         # Actualizar disponibilidad de platos afectados
-        PedidoService._actualizar_disponibilidad_platos(pedido)
+        PedidoService._actualizar_disponibilidad_platos(
+            pedido, plato_ids={d.plato_id for d in detalles}
+        )
 
         # NUEVO: Enviar notificación WebSocket
         enviar_notificacion_pedido(pedido, 'creado')
 
         return pedido
 
+    @staticmethod
+    def cotizar_pedido(detalles_data):
+        """
+        Calcula total y factibilidad de un pedido sin escribir ni bloquear filas.
+        Simula el descuento secuencial de stock que haría crear_pedido_con_detalles
+        usando una sola carga de platos, recetas e ingredientes.
+
+        Args:
+            detalles_data: Lista de dicts con {'plato': id, 'cantidad': int}
+
+        Returns:
+            Dict con 'factible', 'total' y 'detalles' (factibilidad por línea e
+            ingrediente limitante)
+        """
+        plato_ids = {d['plato'] for d in detalles_data}
+        platos = {
+            plato.id: plato
+            for plato in Plato.objects.filter(id__in=plato_ids).prefetch_related(
+                Prefetch('recetas', queryset=Receta.objects.select_related('ingrediente'))
+            )
+        }
+
+        # Stock simulado por ingrediente (se descuenta línea a línea)
+        stock = {}
+        for plato in platos.values():
+            for receta in plato.recetas.all():
+                stock[receta.ingrediente_id] = receta.ingrediente.cantidad_disponible
+
+        total = Decimal('0')
+        lineas = []
+        for detalle_data in detalles_data:
+            plato = platos.get(detalle_data['plato'])
+            cantidad = detalle_data['cantidad']
+            linea = {
+                'plato': detalle_data['plato'],
+                'plato_nombre': plato.nombre if plato else None,
+                'cantidad': cantidad,
+                'precio_unitario': plato.precio if plato else None,
+                'subtotal': None,
+                'factible': False,
+                'max_cantidad': 0,
+                'ingrediente_limitante': None,
+                'motivo': None,
+            }
+            lineas.append(linea)
+
+            if plato is None or not plato.activo:
+                linea['motivo'] = 'Plato inexistente o inactivo'
+                continue
+
+            linea['subtotal'] = plato.precio * cantidad
+            total += linea['subtotal']
+
+            if not plato.disponible:
+                linea['motivo'] = f"El plato '{plato.nombre}' no está disponible actualmente"
+                continue
+
+            # Ingrediente limitante: el que permite menos porciones con el stock restante
+            max_cantidad = None
+            limitante = None
+            for receta in plato.recetas.all():
+                if receta.cantidad_requerida <= 0:
+                    continue
+                porciones = int(stock[receta.ingrediente_id] // receta.cantidad_requerida)
+                if max_cantidad is None or porciones < max_cantidad:
+                    max_cantidad = porciones
+                    limitante = receta
+
+            linea['max_cantidad'] = max_cantidad if max_cantidad is not None else cantidad
+            if limitante is not None:
+                linea['ingrediente_limitante'] = {
+                    'id': limitante.ingrediente_id,
+                    'nombre': limitante.ingrediente.nombre,
+                    'disponible': stock[limitante.ingrediente_id],
+                    'necesario': limitante.cantidad_requerida * cantidad,
+                }
+
+            if linea['max_cantidad'] < cantidad:
+                ingrediente = linea['ingrediente_limitante']
+                linea['motivo'] = (
+                    f"Stock insuficiente de {ingrediente['nombre']}. "
+                    f"Disponible: {ingrediente['disponible']}, Necesario: {ingrediente['necesario']}"
+                )
+                continue
+
+            linea['factible'] = True
+            for receta in plato.recetas.all():
+                stock[receta.ingrediente_id] -= receta.cantidad_requerida * cantidad
+
+        return {
+            'factible': all(linea['factible'] for linea in lineas),
+            'total': total,
+            'detalles': lineas,
+        }
+
     @staticmethod
     @transaction.atomic
     def cancelar_pedido(pedido, usuario=None, motivo=None):
@@ -110,16 +252,20 @@ class PedidoService:
         if usuario and motivo and len(motivo.strip()) < 10:
             raise ValidationError("El motivo de cancelación debe tener al menos 10 caracteres")
 
-        # Revertir stock de cada detalle ANTES de cambiar estado
-        for detalle in pedido.detalles.all():
-            for receta in detalle.plato.recetas.all():
-                cantidad_a_revertir = receta.cantidad_requerida * detalle.cantidad
-                Ingrediente.objects.filter(pk=receta.ingrediente_id).update(
-                    cantidad_disponible=F('cantidad_disponible') + cantidad_a_revertir
-                )
+        # Cargar el grafo del pedido una sola vez (detalles + platos + recetas)
+        detalles = list(
+            pedido.detalles.select_related('plato').prefetch_related('plato__recetas')
+        )
 
+        # Revertir stock ANTES de cambiar estado: montos agregados por ingrediente
+        # y aplicados en un único UPDATE
+        PedidoService._revertir_stock(detalles)
+
+        estado_anterior = pedido.estado
+        if usuario is not None:
+            pedido._usuario_transicion = usuario
         pedido.estado = 'CANCELADO'
-        pedido.save()
+        pedido.save(update_fields=['estado', 'fecha_actualizacion'])
 
         # NUEVO: Guardar auditoría de cancelación si se proporcionan datos
         if usuario and motivo:
@@ -128,8 +274,7 @@ class PedidoService:
             if pedido.cliente and hasattr(pedido.cliente, 'perfil'):
                 cliente_nombre = pedido.cliente.perfil.nombre_completo
 
-            # Crear snapshots de productos (texto y JSON)
-            detalles = pedido.detalles.all()
+            # Crear snapshots de productos (texto y JSON) desde los detalles ya cargados
 
             # Resumen en texto legible
             productos_resumen = ', '.join([
@@ -161,25 +306,28 @@ class PedidoService:
             )
 
         # Actualizar disponibilidad de platos
-        PedidoService._actualizar_disponibilidad_platos(pedido)
+        PedidoService._actualizar_disponibilidad_platos(
+            pedido, plato_ids={d.plato_id for d in detalles}
+        )
 
         # NUEVO: Enviar notificación WebSocket
         enviar_notificacion_pedido(pedido, 'cancelado', {
             'motivo': motivo if motivo else 'Sin motivo especificado',
             'cancelado_por': usuario.username if usuario else None
-        })
+        }, estado_anterior=estado_anterior)
 
         return pedido
 
     @staticmethod
     @transaction.atomic
-    def cambiar_estado(pedido, nuevo_estado):
+    def cambiar_estado(pedido, nuevo_estado, usuario=None):
         """
         Cambia estado validando transición. Si es CANCELADO, usa cancelar_pedido.
 
         Args:
             pedido: Instancia de Pedido
             nuevo_estado: Nuevo estado a asignar
+            usuario: Usuario que hace el cambio (para el registro de transiciones)
 
         Returns:
             Pedido actualizado
@@ -187,6 +335,9 @@ class PedidoService:
         Raises:
             ValidationError si la transición no es válida
         """
+        # Usuario para TransicionPedido (lo lee la señal post_save)
+        pedido._usuario_transicion = usuario
+
         if nuevo_estado == 'CANCELADO':
             return PedidoService.cancelar_pedido(pedido)
 
@@ -195,35 +346,200 @@ class PedidoService:
                 f"Transición inválida: {pedido.estado} → {nuevo_estado}"
             )
 
+        estado_anterior = pedido.estado
         pedido.estado = nuevo_estado
-        pedido.save()
+        # Un solo UPDATE: el estado anterior lo conoce la instancia (Pedido.from_db)
+        pedido.save(update_fields=[
+            'estado', 'fecha_listo', 'fecha_entregado', 'fecha_actualizacion'
+        ])
 
         # NUEVO: Enviar notificación WebSocket
-        enviar_notificacion_pedido(pedido, 'actualizado')
+        enviar_notificacion_pedido(pedido, 'actualizado', estado_anterior=estado_anterior)
 
         return pedido
 
     @staticmethod
-    def _actualizar_disponibilidad_platos(pedido):
+    @transaction.atomic
+    def cambiar_estado_masivo(pedido_ids, nuevo_estado, usuario=None):
         """
-        Actualiza disponibilidad de platos según stock actual.
-        Optimizado para reducir queries usando prefetch_related.
+        Cambia el estado de varios pedidos a la vez.
+
+        Valida cada transición en memoria contra TRANSICIONES_VALIDAS y aplica
+        estado y timestamps con un UPDATE por estado de origen. Las
+        notificaciones se envían coalescidas (un mensaje por grupo).
+
+        Args:
+            pedido_ids: Lista de IDs de pedido
+            nuevo_estado: Estado destino (no CANCELADO)
+            usuario: Usuario que hace el cambio (para el registro de transiciones)
+
+        Returns:
+            Lista de resultados por ID, en el orden recibido:
+            {'id', 'ok', 'estado_anterior', 'estado', 'error'}
+
+        Raises:
+            ValidationError si nuevo_estado es CANCELADO
+        """
+        if nuevo_estado == 'CANCELADO':
+            raise ValidationError(
+                "La cancelación masiva no está soportada: cada cancelación requiere motivo y devolver stock"
+            )
+
+        pedido_ids = list(dict.fromkeys(pedido_ids))
+        pedidos = {
+            p.pk: p for p in Pedido.objects.select_for_update().filter(pk__in=pedido_ids).only(
+                'id', 'estado', 'mesa_id', 'fecha_creacion', 'fecha_listo', 'fecha_entregado'
+            )
+        }
+
+        resultados = {}
+        por_origen = defaultdict(list)
+        for pedido_id in pedido_ids:
+            pedido = pedidos.get(pedido_id)
+            if pedido is None:
+                resultados[pedido_id] = {
+                    'id': pedido_id, 'ok': False, 'estado_anterior': None,
+                    'estado': None, 'error': 'Pedido no encontrado'
+                }
+            elif not pedido.puede_transicionar_a(nuevo_estado):
+                resultados[pedido_id] = {
+                    'id': pedido_id, 'ok': False, 'estado_anterior': pedido.estado,
+                    'estado': pedido.estado,
+                    'error': f"Transición inválida: {pedido.estado} → {nuevo_estado}"
+                }
+            else:
+                por_origen[pedido.estado].append(pedido)
+
+        ahora = timezone.now()
+        transiciones = []
+        for estado_anterior, grupo in por_origen.items():
+            Pedido.objects.filter(
+                pk__in=[p.pk for p in grupo], estado=estado_anterior
+            ).transicionar(nuevo_estado, ahora)
+
+            # Reflejar en memoria lo que hizo el UPDATE (mismas reglas de timestamps)
+            for pedido in grupo:
+                pedido.estado = nuevo_estado
+                pedido.fecha_actualizacion = ahora
+                pedido.aplicar_timestamps_transicion(estado_anterior, ahora)
+                transiciones.append((pedido, estado_anterior))
+                resultados[pedido.pk] = {
+                    'id': pedido.pk, 'ok': True, 'estado_anterior': estado_anterior,
+                    'estado': nuevo_estado, 'error': None
+                }
+
+        # transicionar() no dispara señales: registrar transiciones y notificar aquí
+        TransicionPedido.registrar(transiciones, usuario=usuario)
+        for pedido, estado_anterior in transiciones:
+            enviar_notificacion_pedido(
+                pedido, 'actualizado', estado_anterior=estado_anterior, coalescer=True
+            )
+
+        return [resultados[pedido_id] for pedido_id in pedido_ids]
+
+    @staticmethod
+    @transaction.atomic
+    def archivar_pedidos(pedido_ids):
         """
-        # Solo actualizar los platos directamente en el pedido
-        # (no todos los platos que comparten ingredientes - demasiado costoso)
-        platos_afectados = set()
+        Mueve pedidos finalizados a PedidoArchivado y los borra de las tablas
+        activas (detalles y cancelación caen en cascada; TransicionPedido se
+        conserva). Ignora los que no estén ENTREGADOS o CANCELADOS.
 
-        # Obtener detalles con prefetch de relaciones para evitar N+1 queries
-        detalles = pedido.detalles.select_related('plato').prefetch_related('plato__recetas')
+        Args:
+            pedido_ids: IDs de pedidos a archivar (un lote)
 
+        Returns:
+            Cantidad de pedidos archivados
+        """
+        from .serializers import PedidoSerializer
+        from .websocket_utils import a_tipos_nativos
+
+        pedidos = list(
+            Pedido.objects.select_for_update(of=('self',)).filter(
+                pk__in=pedido_ids,
+                estado__in=[EstadoPedido.ENTREGADO, EstadoPedido.CANCELADO]
+            ).select_related(
+                'mesa', 'cliente', 'cliente__perfil'
+            ).prefetch_related(
+                'detalles__plato',
+                Prefetch('cancelacion', queryset=PedidoCancelacion.objects.select_related(
+                    'cancelado_por',
+                    'cancelado_por__perfil'
+                ))
+            )
+        )
+        if not pedidos:
+            return 0
+
+        archivados = []
+        for pedido in pedidos:
+            cancelacion = getattr(pedido, 'cancelacion', None)
+            archivados.append(PedidoArchivado(
+                pedido_id=pedido.pk,
+                mesa_id=pedido.mesa_id,
+                mesa_numero=pedido.mesa.numero,
+                cliente_id=pedido.cliente_id,
+                estado=pedido.estado,
+                fecha_creacion=pedido.fecha_creacion,
+                fecha_cierre=(
+                    pedido.fecha_entregado
+                    or (cancelacion.fecha_cancelacion if cancelacion else pedido.fecha_actualizacion)
+                ),
+                total=pedido.total,
+                datos=a_tipos_nativos(PedidoSerializer(pedido).data),
+            ))
+
+        # ignore_conflicts: un lote reintentado tras una falla no duplica el archivo
+        PedidoArchivado.objects.bulk_create(archivados, ignore_conflicts=True)
+        Pedido.objects.filter(pk__in=[pedido.pk for pedido in pedidos]).delete()
+        return len(pedidos)
+
+    @staticmethod
+    def _revertir_stock(detalles):
+        """
+        Devuelve al inventario el stock consumido por los detalles.
+        Agrega la cantidad por ingrediente y la aplica en un solo UPDATE con
+        CASE, en lugar de un UPDATE por ingrediente por línea.
+
+        Args:
+            detalles: Detalles con plato y recetas ya precargados
+        """
+        cantidades = defaultdict(Decimal)
         for detalle in detalles:
-            platos_afectados.add(detalle.plato.id)
-
-        # Actualizar solo los platos del pedido en una sola operación
-        if platos_afectados:
-            from menuApp.models import Plato
-            # Optimización: prefetch recetas e ingredientes para evitar queries adicionales
-            platos = Plato.objects.filter(id__in=platos_afectados).prefetch_related('recetas__ingrediente')
-            for plato in platos:
-                plato.disponible = plato.verificar_disponibilidad()
-                plato.save(update_fields=['disponible'])
+            for receta in detalle.plato.recetas.all():
+                cantidades[receta.ingrediente_id] += receta.cantidad_requerida * detalle.cantidad
+
+        if not cantidades:
+            return
+
+        Ingrediente.objects.filter(pk__in=cantidades).update(
+            cantidad_disponible=F('cantidad_disponible') + Case(
+                *[When(pk=pk, then=Value(cantidad)) for pk, cantidad in cantidades.items()],
+                output_field=DecimalField(max_digits=10, decimal_places=3)
+            )
+        )
+
+        for ingrediente in Ingrediente.objects.filter(pk__in=cantidades).only(
+            'nombre', 'unidad_medida', 'cantidad_disponible', 'stock_minimo'
+        ):
+            registrar_movimiento(ingrediente, ingrediente.cantidad_disponible - cantidades[ingrediente.pk])
+
+    @staticmethod
+    def _actualizar_disponibilidad_platos(pedido, plato_ids=None):
+        """
+        Actualiza la disponibilidad según el stock actual de todos los platos
+        que comparten ingredientes con los del pedido (una consulta agregada
+        y un bulk_update de los que cambiaron).
+
+        Args:
+            pedido: Instancia de Pedido
+            plato_ids: IDs de platos ya conocidos (evita volver a leer los detalles)
+        """
+        if plato_ids is None:
+            plato_ids = set(pedido.detalles.values_list('plato_id', flat=True))
+
+        if plato_ids:
+            InventarioService.actualizar_disponibilidad(
+                ingrediente_ids=Receta.objects.filter(plato_id__in=plato_ids).values('ingrediente_id'),
+                plato_ids=plato_ids
+            )
@@ -1,27 +1,57 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.utils import timezone
-from .models import Pedido
+from .models import (
+    Pedido, DetallePedido, PedidoCancelacion, ResumenCancelacionDiario, TransicionPedido
+)
 
 
 @receiver(pre_save, sender=Pedido)
 def actualizar_timestamps_estado(sender, instance, **kwargs):
     """Actualiza fecha_listo y fecha_entregado cuando cambia el estado."""
-    if instance.pk:
-        try:
-            pedido_anterior = Pedido.objects.get(pk=instance.pk)
-
-            # Transición a LISTO
-            if instance.estado == 'LISTO' and pedido_anterior.estado != 'LISTO':
-                if not instance.fecha_listo:
-                    instance.fecha_listo = timezone.now()
-
-            # Transición a ENTREGADO
-            if instance.estado == 'ENTREGADO' and pedido_anterior.estado != 'ENTREGADO':
-                if not instance.fecha_entregado:
-                    instance.fecha_entregado = timezone.now()
-                if not instance.fecha_listo:
-                    instance.fecha_listo = timezone.now()
-
-        except Pedido.DoesNotExist:
-            pass
+    if not instance.pk:
+        return
+
+    # El estado anterior se recuerda desde from_db: sin SELECT extra por save()
+    estado_anterior = instance.estado_original
+    if estado_anterior is None:
+        # Instancia construida a mano o con 'estado' diferido: consultar la BD
+        estado_anterior = Pedido.objects.filter(pk=instance.pk).values_list('estado', flat=True).first()
+        if estado_anterior is None:
+            return
+
+    instance._estado_antes_de_guardar = estado_anterior
+    instance.aplicar_timestamps_transicion(estado_anterior)
+
+
+@receiver(post_save, sender=Pedido)
+def registrar_transicion_pedido(sender, instance, created, **kwargs):
+    """
+    Registra la creación o el cambio de estado en TransicionPedido (que además
+    mantiene EstadisticaCocinaDiaria). Los servicios indican el usuario con
+    instance._usuario_transicion.
+    """
+    usuario = instance.__dict__.pop('_usuario_transicion', None)
+    if created:
+        TransicionPedido.registrar([(instance, None)], usuario=usuario)
+        return
+
+    estado_anterior = instance.__dict__.pop('_estado_antes_de_guardar', None)
+    if estado_anterior is not None and estado_anterior != instance.estado:
+        TransicionPedido.registrar([(instance, estado_anterior)], usuario=usuario)
+
+
+@receiver(post_save, sender=DetallePedido)
+@receiver(post_delete, sender=DetallePedido)
+def actualizar_totales_pedido(sender, instance, origin=None, **kwargs):
+    """Mantiene Pedido.total y Pedido.num_items cuando se escriben detalles sueltos."""
+    # Borrado en cascada desde el pedido (p.ej. archivado): no hay totales que mantener
+    if isinstance(origin, Pedido) or getattr(origin, 'model', None) is Pedido:
+        return
+    Pedido.recalcular_totales([instance.pedido_id])
+
+
+@receiver(post_save, sender=PedidoCancelacion)
+def actualizar_resumen_cancelaciones(sender, instance, created, **kwargs):
+    """Suma cada cancelación nueva al rollup diario."""
+    if created:
+        ResumenCancelacionDiario.registrar(instance)
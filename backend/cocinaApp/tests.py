@@ -0,0 +1,747 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mainApp.models import Mesa, Perfil
+from menuApp.models import CategoriaMenu, Ingrediente, Plato, Receta
+from .models import (
+    DetallePedido, EstadisticaCocinaDiaria, EstadoPedido, Pedido, PedidoArchivado,
+    ResumenCancelacionDiario, TransicionPedido,
+)
+from . import event_stream
+from .consumers import PedidoConsumer
+from .read_models import ColaCocina
+from .services import PedidoService
+from .websocket_utils import enviar_notificacion_pedido
+
+
+def crear_usuario(username, rol):
+    user = User.objects.create_user(username, f'{username}@test.cl', 'clave-segura-123')
+    Perfil.objects.update_or_create(user=user, defaults={'rol': rol, 'nombre_completo': username})
+    return User.objects.get(pk=user.pk)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PedidosEntregadosViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(crear_usuario('cajero1', 'cajero'))
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+
+    def test_sin_fecha_usa_el_dia_actual(self):
+        ahora = timezone.now()
+        entregado = Pedido.objects.create(
+            mesa=self.mesa, estado=EstadoPedido.ENTREGADO, fecha_entregado=ahora
+        )
+        Pedido.objects.create(
+            mesa=self.mesa, estado=EstadoPedido.ENTREGADO, fecha_entregado=ahora - timedelta(days=1)
+        )
+
+        response = self.client.get('/api/cocina/pedidos/entregados/')
+
+        self.assertEqual(response.status_code, 200)
+        ids = [pedido['id'] for pedido in response.data['results']]
+        self.assertEqual(ids, [entregado.pk])
+
+    def test_con_fecha(self):
+        response = self.client.get('/api/cocina/pedidos/entregados/?fecha=2024-01-01')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_fecha_invalida(self):
+        response = self.client.get('/api/cocina/pedidos/entregados/?fecha=01-01-2024')
+        self.assertEqual(response.status_code, 400)
+
+
+class TotalesPedidoTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.plato = Plato.objects.create(nombre='Lomo', precio=Decimal('9000'), categoria=categoria)
+        self.pedido = Pedido.objects.create(mesa=self.mesa)
+
+    def totales(self):
+        self.pedido.refresh_from_db()
+        return self.pedido.total, self.pedido.num_items
+
+    def test_se_mantienen_al_escribir_detalles(self):
+        detalle = DetallePedido.objects.create(
+            pedido=self.pedido, plato=self.plato, cantidad=2, precio_unitario=Decimal('9000')
+        )
+        DetallePedido.objects.create(
+            pedido=self.pedido, plato=self.plato, cantidad=1, precio_unitario=Decimal('500')
+        )
+        self.assertEqual(self.totales(), (Decimal('18500'), 2))
+
+        detalle.cantidad = 3
+        detalle.save()
+        self.assertEqual(self.totales(), (Decimal('27500'), 2))
+
+        detalle.delete()
+        self.assertEqual(self.totales(), (Decimal('500'), 1))
+
+    def test_borrar_el_pedido_no_recalcula(self):
+        DetallePedido.objects.create(pedido=self.pedido, plato=self.plato, precio_unitario=Decimal('9000'))
+        with mock.patch.object(Pedido, 'recalcular_totales') as recalcular:
+            self.pedido.delete()
+        recalcular.assert_not_called()
+        self.assertFalse(DetallePedido.objects.exists())
+
+
+class TimestampsTransicionTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+        self.pedido = Pedido.objects.get(pk=Pedido.objects.create(mesa=self.mesa).pk)
+
+    def guardar(self, estado):
+        self.pedido.estado = estado
+        with CaptureQueriesContext(connection) as consultas:
+            self.pedido.save()
+        return [
+            q['sql'] for q in consultas.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "cocinaApp_pedido"' in q['sql']
+        ]
+
+    def test_completa_las_fechas_sin_releer_el_pedido(self):
+        self.assertEqual(self.guardar(EstadoPedido.EN_PREPARACION), [])
+        self.assertIsNone(self.pedido.fecha_listo)
+
+        self.assertEqual(self.guardar(EstadoPedido.LISTO), [])
+        self.assertIsNotNone(self.pedido.fecha_listo)
+        self.assertIsNone(self.pedido.fecha_entregado)
+
+        fecha_listo = self.pedido.fecha_listo
+        self.assertEqual(self.guardar(EstadoPedido.ENTREGADO), [])
+        self.assertIsNotNone(self.pedido.fecha_entregado)
+        self.assertEqual(self.pedido.fecha_listo, fecha_listo)
+
+    def test_entregado_directo_completa_fecha_listo(self):
+        self.guardar(EstadoPedido.ENTREGADO)
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.fecha_listo, self.pedido.fecha_entregado)
+
+    def test_instancia_sin_estado_cargado_consulta_el_anterior(self):
+        pedido = Pedido.objects.only('id', 'mesa').get(pk=self.pedido.pk)
+        pedido.estado = EstadoPedido.LISTO
+        pedido.save()
+        self.assertEqual(
+            TransicionPedido.objects.filter(pedido=pedido, estado_anterior=EstadoPedido.CREADO).count(), 1
+        )
+
+
+class EstadisticaCocinaDiariaTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+
+    def test_se_actualiza_al_confirmar_la_transaccion(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            pedido = Pedido.objects.create(mesa=self.mesa)
+            pedido.estado = EstadoPedido.EN_PREPARACION
+            pedido.save()
+            # La transacción de cocina no toca la fila del día
+            self.assertFalse(EstadisticaCocinaDiaria.objects.exists())
+
+        for callback in callbacks:
+            callback()
+
+        fila = EstadisticaCocinaDiaria.objects.get(fecha=timezone.localdate())
+        self.assertEqual(fila.total_pedidos, 1)
+        self.assertEqual(fila.por_estado, {EstadoPedido.EN_PREPARACION: 1})
+        self.assertEqual(sum(fila.hist_espera.values()), 1)
+
+
+class TransicionPedidoTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+
+    def test_registra_la_creacion_y_cada_cambio_con_su_usuario(self):
+        cliente = crear_usuario('cliente1', 'cliente')
+        cocinero = crear_usuario('cocinero1', 'cocinero')
+        pedido = Pedido.objects.create(mesa=self.mesa, cliente=cliente)
+        PedidoService.cambiar_estado(pedido, EstadoPedido.EN_PREPARACION, usuario=cocinero)
+        PedidoService.cambiar_estado(pedido, EstadoPedido.LISTO, usuario=cocinero)
+
+        transiciones = list(
+            TransicionPedido.objects.filter(pedido=pedido).order_by('id').values_list(
+                'estado_anterior', 'estado_nuevo', 'usuario_id'
+            )
+        )
+        # La creación no tiene un autor conocido: no se asume el cliente
+        self.assertEqual(transiciones, [
+            (None, EstadoPedido.CREADO, None),
+            (EstadoPedido.CREADO, EstadoPedido.EN_PREPARACION, cocinero.pk),
+            (EstadoPedido.EN_PREPARACION, EstadoPedido.LISTO, cocinero.pk),
+        ])
+
+    def test_guardar_sin_cambio_de_estado_no_registra(self):
+        pedido = Pedido.objects.create(mesa=self.mesa)
+        pedido.notas = 'sin cebolla'
+        pedido.save()
+        self.assertEqual(TransicionPedido.objects.filter(pedido=pedido).count(), 1)
+
+
+class ResumenCancelacionDiarioTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+        self.usuario = crear_usuario('admin1', 'admin')
+
+    def fila_total(self):
+        return ResumenCancelacionDiario.objects.get(
+            fecha=timezone.localdate(), dimension=ResumenCancelacionDiario.Dimension.TOTAL
+        )
+
+    def test_varias_cancelaciones_se_suman_al_confirmar(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for _ in range(3):
+                PedidoService.cancelar_pedido(
+                    Pedido.objects.create(mesa=self.mesa), usuario=self.usuario, motivo='cliente se retiró'
+                )
+            # La transacción de cancelación no toca las filas del día
+            self.assertFalse(ResumenCancelacionDiario.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.fila_total().cancelaciones, 3)
+
+        # Una transacción posterior suma sobre las filas existentes
+        with self.captureOnCommitCallbacks(execute=True):
+            PedidoService.cancelar_pedido(
+                Pedido.objects.create(mesa=self.mesa), usuario=self.usuario, motivo='error de mesa'
+            )
+        self.assertEqual(self.fila_total().cancelaciones, 4)
+        usuario = ResumenCancelacionDiario.objects.get(
+            dimension=ResumenCancelacionDiario.Dimension.USUARIO, clave=str(self.usuario.pk)
+        )
+        self.assertEqual(usuario.cancelaciones, 4)
+
+
+class ArchivoYReconstruccionTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+        self.usuario = crear_usuario('admin1', 'admin')
+
+    def crear_pedidos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            entregado = Pedido.objects.create(mesa=self.mesa)
+            for estado in [EstadoPedido.EN_PREPARACION, EstadoPedido.LISTO, EstadoPedido.ENTREGADO]:
+                entregado.estado = estado
+                entregado.save()
+            cancelado = PedidoService.cancelar_pedido(
+                Pedido.objects.create(mesa=self.mesa), usuario=self.usuario, motivo='cliente se retiró'
+            )
+        return [entregado.pk, cancelado.pk]
+
+    def totales(self):
+        fila = EstadisticaCocinaDiaria.objects.get(fecha=timezone.localdate())
+        cancelaciones = ResumenCancelacionDiario.objects.get(
+            fecha=timezone.localdate(), dimension=ResumenCancelacionDiario.Dimension.TOTAL
+        )
+        return (
+            fila.total_pedidos, fila.por_estado, fila.hist_preparacion, fila.hist_espera,
+            cancelaciones.cancelaciones, cancelaciones.monto_perdido,
+        )
+
+    def test_reconstruir_no_borra_los_dias_archivados(self):
+        ids = self.crear_pedidos()
+        antes = self.totales()
+        self.assertEqual(antes[0], 2)
+        self.assertEqual(antes[4], 1)
+
+        self.assertEqual(PedidoService.archivar_pedidos(ids), 2)
+        self.assertFalse(Pedido.objects.exists())
+
+        call_command('reconstruir_estadisticas_cocina', dias=3, stdout=StringIO())
+        call_command('reconstruir_resumen_cancelaciones', dias=3, stdout=StringIO())
+
+        self.assertEqual(self.totales(), antes)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class HistorialPedidosViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(crear_usuario('cajero1', 'cajero'))
+
+    def crear_pedido(self, estado, dias, mesa):
+        pedido = Pedido.objects.create(mesa=mesa)
+        Pedido.objects.filter(pk=pedido.pk).update(
+            estado=estado, fecha_creacion=timezone.now() - timedelta(days=dias)
+        )
+        return pedido.pk
+
+    def test_archiva_los_antiguos_y_los_une_al_historial(self):
+        mesa, otra = Mesa.objects.create(numero=1, capacidad=4), Mesa.objects.create(numero=2, capacidad=4)
+        antiguo = self.crear_pedido(EstadoPedido.ENTREGADO, dias=100, mesa=mesa)
+        cancelado = self.crear_pedido(EstadoPedido.CANCELADO, dias=95, mesa=otra)
+        activo = self.crear_pedido(EstadoPedido.CREADO, dias=120, mesa=mesa)
+        reciente = self.crear_pedido(EstadoPedido.ENTREGADO, dias=1, mesa=mesa)
+
+        call_command('archivar_pedidos', dias=90, stdout=StringIO())
+
+        self.assertEqual(
+            set(PedidoArchivado.objects.values_list('pedido_id', flat=True)), {antiguo, cancelado}
+        )
+        self.assertEqual(set(Pedido.objects.values_list('id', flat=True)), {activo, reciente})
+
+        response = self.client.get('/api/cocina/pedidos/historial/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [(p['id'], p['archivado']) for p in response.data['results']],
+            [(reciente, False), (cancelado, True)]
+        )
+        siguiente = self.client.get(response.data['next'])
+        self.assertEqual([(p['id'], p['archivado']) for p in siguiente.data['results']], [(antiguo, True)])
+        self.assertIsNone(siguiente.data['next'])
+
+        por_mesa = self.client.get('/api/cocina/pedidos/historial/?mesa=1')
+        self.assertEqual([p['id'] for p in por_mesa.data['results']], [reciente, antiguo])
+
+    def test_mesa_o_cliente_no_enteros_es_400(self):
+        for parametro in ('mesa=abc', 'cliente=1.5'):
+            response = self.client.get(f'/api/cocina/pedidos/historial/?{parametro}')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['error'], 'mesa y cliente deben ser números enteros')
+
+
+class ColaCocinaTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.plato = Plato.objects.create(
+            nombre='Lomo', precio=Decimal('9000'), categoria=categoria, tiempo_preparacion=20
+        )
+
+    def crear_pedido(self, estado=EstadoPedido.CREADO):
+        pedido = Pedido.objects.create(mesa=self.mesa)
+        DetallePedido.objects.create(pedido=pedido, plato=self.plato, precio_unitario=self.plato.precio)
+        if estado != EstadoPedido.CREADO:
+            pedido.estado = estado
+            pedido.save()
+        return pedido
+
+    def test_se_actualiza_con_los_eventos_sin_consultar_la_bd(self):
+        cola = ColaCocina()
+        primero, segundo, tercero = [self.crear_pedido() for _ in range(3)]
+        self.assertEqual([item['id'] for item in cola.listar()], [primero.pk, segundo.pk, tercero.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PedidoService.cambiar_estado(tercero, EstadoPedido.URGENTE)
+            PedidoService.cambiar_estado(primero, EstadoPedido.EN_PREPARACION)
+            PedidoService.cambiar_estado(primero, EstadoPedido.LISTO)
+
+        with self.assertNumQueries(0):
+            items = cola.listar()
+        self.assertEqual(
+            [(item['id'], item['estado']) for item in items],
+            [(tercero.pk, EstadoPedido.URGENTE), (segundo.pk, EstadoPedido.CREADO)]
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual([item['id'] for item in cola.listar(estado=EstadoPedido.URGENTE)], [tercero.pk])
+
+    def test_eta_desde_la_entrada_a_preparacion(self):
+        pedido = self.crear_pedido(EstadoPedido.EN_PREPARACION)
+        inicio = TransicionPedido.objects.get(
+            pedido_id=pedido.pk, estado_nuevo=EstadoPedido.EN_PREPARACION
+        ).fecha
+        # Editar el pedido mueve fecha_actualizacion, no el inicio de preparación
+        Pedido.objects.filter(pk=pedido.pk).update(
+            notas='sin sal', fecha_actualizacion=inicio + timedelta(minutes=10)
+        )
+
+        [item] = ColaCocina().listar()
+
+        self.assertEqual(datetime.fromisoformat(item['eta']), inicio + timedelta(minutes=20))
+
+    def test_etas_de_publicacion_no_consultan_la_bd(self):
+        cola = ColaCocina()
+        with self.assertNumQueries(0):
+            self.assertEqual(cola.etas_actualizadas(), ({}, {}))
+
+        primero = self.crear_pedido()
+        cola.listar()
+        with self.captureOnCommitCallbacks(execute=True):
+            segundo = PedidoService.crear_pedido_con_detalles(
+                self.mesa, [{'plato': self.plato, 'cantidad': 1}]
+            )
+
+        with self.assertNumQueries(0):
+            etas, _ = cola.etas_actualizadas()
+        self.assertEqual(set(etas), {primero.pk, segundo.pk})
+
+
+@override_settings(COCINA_ESTACIONES=1)
+class ValidarEtaCommandTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.plato = Plato.objects.create(
+            nombre='Lomo', precio=Decimal('9000'), categoria=categoria, tiempo_preparacion=20
+        )
+        self.t0 = timezone.now() - timedelta(hours=2)
+
+    def crear_pedido(self, creado, listo, inicio=None):
+        pedido = Pedido.objects.create(mesa=self.mesa)
+        DetallePedido.objects.create(pedido=pedido, plato=self.plato, cantidad=1, precio_unitario=Decimal('9000'))
+        minutos = lambda m: self.t0 + timedelta(minutes=m)
+        Pedido.objects.filter(pk=pedido.pk).update(
+            estado=EstadoPedido.LISTO, fecha_creacion=minutos(creado), fecha_listo=minutos(listo)
+        )
+        if inicio is not None:
+            TransicionPedido.objects.create(
+                pedido=pedido, estado_anterior=EstadoPedido.CREADO,
+                estado_nuevo=EstadoPedido.EN_PREPARACION, fecha=minutos(inicio)
+            )
+
+    def test_usa_el_inicio_de_preparacion_registrado(self):
+        # El primero empezó en el minuto 5: el segundo espera hasta el 25, no el 30
+        self.crear_pedido(creado=0, inicio=5, listo=25)
+        self.crear_pedido(creado=10, listo=45)
+
+        salida = StringIO()
+        call_command('validar_eta', dias=1, stdout=salida)
+
+        self.assertIn('2 pedidos evaluados', salida.getvalue())
+        # Errores: -5 (el primero, estimado al crearse) y 0 (el segundo)
+        self.assertIn('Sesgo (ETA - real):   -2.5 min', salida.getvalue())
+
+
+class CrearPedidoStockTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.carne = Ingrediente.objects.create(
+            nombre='Carne', unidad_medida='gr', cantidad_disponible=Decimal('1000'),
+            stock_minimo=Decimal('0'), precio_unitario=Decimal('10')
+        )
+        self.papas = Ingrediente.objects.create(
+            nombre='Papas', unidad_medida='gr', cantidad_disponible=Decimal('1000'),
+            stock_minimo=Decimal('0'), precio_unitario=Decimal('2')
+        )
+        self.lomo = Plato.objects.create(nombre='Lomo', precio=Decimal('9000'), categoria=categoria)
+        self.chorrillana = Plato.objects.create(nombre='Chorrillana', precio=Decimal('8000'), categoria=categoria)
+        Receta.objects.create(plato=self.lomo, ingrediente=self.carne, cantidad_requerida=Decimal('300'))
+        Receta.objects.create(plato=self.chorrillana, ingrediente=self.papas, cantidad_requerida=Decimal('400'))
+        Receta.objects.create(plato=self.chorrillana, ingrediente=self.carne, cantidad_requerida=Decimal('200'))
+
+    def test_descuenta_el_stock_de_todas_las_lineas(self):
+        pedido = PedidoService.crear_pedido_con_detalles(self.mesa, [
+            {'plato': self.lomo, 'cantidad': 2},
+            {'plato': self.chorrillana, 'cantidad': 1},
+        ])
+
+        self.assertEqual(pedido.total, Decimal('26000'))
+        self.carne.refresh_from_db()
+        self.papas.refresh_from_db()
+        self.assertEqual(self.carne.cantidad_disponible, Decimal('200'))
+        self.assertEqual(self.papas.cantidad_disponible, Decimal('600'))
+
+    def test_stock_insuficiente_considera_las_lineas_anteriores(self):
+        with self.assertRaisesMessage(
+            ValidationError, 'Stock insuficiente de Carne. Disponible: 100.000, Necesario: 200.000'
+        ):
+            PedidoService.crear_pedido_con_detalles(self.mesa, [
+                {'plato': self.lomo, 'cantidad': 3},
+                {'plato': self.chorrillana, 'cantidad': 1},
+            ])
+
+        self.carne.refresh_from_db()
+        self.assertEqual(self.carne.cantidad_disponible, Decimal('1000'))
+        self.assertFalse(Pedido.objects.exists())
+
+
+class CancelarPedidoStockTests(TestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.carne = Ingrediente.objects.create(
+            nombre='Carne', unidad_medida='gr', cantidad_disponible=Decimal('1000'),
+            stock_minimo=Decimal('0'), precio_unitario=Decimal('10')
+        )
+        self.papas = Ingrediente.objects.create(
+            nombre='Papas', unidad_medida='gr', cantidad_disponible=Decimal('1000'),
+            stock_minimo=Decimal('0'), precio_unitario=Decimal('2')
+        )
+        self.lomo = Plato.objects.create(nombre='Lomo', precio=Decimal('9000'), categoria=categoria)
+        self.chorrillana = Plato.objects.create(nombre='Chorrillana', precio=Decimal('8000'), categoria=categoria)
+        Receta.objects.create(plato=self.lomo, ingrediente=self.carne, cantidad_requerida=Decimal('300'))
+        Receta.objects.create(plato=self.chorrillana, ingrediente=self.papas, cantidad_requerida=Decimal('400'))
+        Receta.objects.create(plato=self.chorrillana, ingrediente=self.carne, cantidad_requerida=Decimal('200'))
+
+    def test_devuelve_el_stock_en_un_solo_update(self):
+        pedido = PedidoService.crear_pedido_con_detalles(self.mesa, [
+            {'plato': self.lomo, 'cantidad': 2},
+            {'plato': self.chorrillana, 'cantidad': 2},
+        ])
+        self.carne.refresh_from_db()
+        self.assertEqual(self.carne.cantidad_disponible, Decimal('0'))
+        self.lomo.refresh_from_db()
+        self.assertFalse(self.lomo.disponible)
+
+        with CaptureQueriesContext(connection) as consultas:
+            PedidoService.cancelar_pedido(pedido)
+
+        self.carne.refresh_from_db()
+        self.papas.refresh_from_db()
+        self.assertEqual(self.carne.cantidad_disponible, Decimal('1000'))
+        self.assertEqual(self.papas.cantidad_disponible, Decimal('1000'))
+        updates = [
+            q['sql'] for q in consultas.captured_queries
+            if q['sql'].startswith('UPDATE "menuApp_ingrediente"')
+        ]
+        self.assertEqual(len(updates), 1)
+
+        self.lomo.refresh_from_db()
+        self.assertTrue(self.lomo.disponible)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class EstadoMasivoViewTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_usuario('cocinero1', 'cocinero')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+
+    def crear_pedido(self, estado):
+        pedido = Pedido.objects.create(mesa=self.mesa)
+        Pedido.objects.filter(pk=pedido.pk).update(estado=estado)
+        return pedido
+
+    def test_resultado_por_id_en_el_orden_recibido(self):
+        creado = self.crear_pedido(EstadoPedido.CREADO)
+        urgente = self.crear_pedido(EstadoPedido.URGENTE)
+        listo = self.crear_pedido(EstadoPedido.LISTO)
+
+        response = self.client.post('/api/cocina/pedidos/estado-masivo/', {
+            'ids': [urgente.pk, 999, listo.pk, creado.pk, urgente.pk], 'estado': EstadoPedido.EN_PREPARACION
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['actualizados'], 2)
+        self.assertEqual(
+            [(r['id'], r['ok'], r['estado_anterior'], r['error']) for r in response.data['resultados']],
+            [
+                (urgente.pk, True, EstadoPedido.URGENTE, None),
+                (999, False, None, 'Pedido no encontrado'),
+                (listo.pk, False, EstadoPedido.LISTO, 'Transición inválida: LISTO → EN_PREPARACION'),
+                (creado.pk, True, EstadoPedido.CREADO, None),
+            ]
+        )
+        self.assertEqual(
+            dict(Pedido.objects.values_list('id', 'estado')),
+            {creado.pk: EstadoPedido.EN_PREPARACION, urgente.pk: EstadoPedido.EN_PREPARACION,
+             listo.pk: EstadoPedido.LISTO}
+        )
+        self.assertEqual(
+            TransicionPedido.objects.filter(
+                estado_nuevo=EstadoPedido.EN_PREPARACION, usuario=self.usuario
+            ).count(), 2
+        )
+
+    def test_entregado_completa_las_fechas(self):
+        listo = self.crear_pedido(EstadoPedido.LISTO)
+        self.client.post('/api/cocina/pedidos/estado-masivo/', {
+            'ids': [listo.pk], 'estado': EstadoPedido.ENTREGADO
+        }, format='json')
+        listo.refresh_from_db()
+        self.assertEqual(listo.estado, EstadoPedido.ENTREGADO)
+        self.assertIsNotNone(listo.fecha_entregado)
+        self.assertEqual(listo.fecha_listo, listo.fecha_entregado)
+
+    def test_cancelacion_masiva_no_soportada(self):
+        creado = self.crear_pedido(EstadoPedido.CREADO)
+        response = self.client.post('/api/cocina/pedidos/estado-masivo/', {
+            'ids': [creado.pk], 'estado': EstadoPedido.CANCELADO
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        creado.refresh_from_db()
+        self.assertEqual(creado.estado, EstadoPedido.CREADO)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CotizarPedidoViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(crear_usuario('mesero1', 'mesero'))
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.carne = Ingrediente.objects.create(
+            nombre='Carne', unidad_medida='gr', cantidad_disponible=Decimal('1000'),
+            stock_minimo=Decimal('0'), precio_unitario=Decimal('10')
+        )
+        self.lomo = Plato.objects.create(nombre='Lomo', precio=Decimal('9000'), categoria=categoria)
+        self.chorrillana = Plato.objects.create(nombre='Chorrillana', precio=Decimal('8000'), categoria=categoria)
+        Receta.objects.create(plato=self.lomo, ingrediente=self.carne, cantidad_requerida=Decimal('300'))
+        Receta.objects.create(plato=self.chorrillana, ingrediente=self.carne, cantidad_requerida=Decimal('200'))
+
+    def cotizar(self, *lineas):
+        return self.client.post('/api/cocina/pedidos/cotizar/', {
+            'detalles': [{'plato': plato.pk, 'cantidad': cantidad} for plato, cantidad in lineas]
+        }, format='json')
+
+    def test_factible(self):
+        response = self.cotizar((self.lomo, 2), (self.chorrillana, 1))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['factible'])
+        self.assertEqual(response.data['total'], Decimal('26000'))
+        self.assertEqual([linea['max_cantidad'] for linea in response.data['detalles']], [3, 2])
+
+    def test_stock_insuficiente_considera_las_lineas_anteriores(self):
+        response = self.cotizar((self.lomo, 3), (self.chorrillana, 1))
+
+        self.assertFalse(response.data['factible'])
+        primera, segunda = response.data['detalles']
+        self.assertTrue(primera['factible'])
+        self.assertFalse(segunda['factible'])
+        self.assertEqual(segunda['max_cantidad'], 0)
+        self.assertEqual(segunda['ingrediente_limitante']['nombre'], 'Carne')
+        self.assertEqual(segunda['motivo'], 'Stock insuficiente de Carne. Disponible: 100.000, Necesario: 200.000')
+
+    def test_no_escribe(self):
+        self.cotizar((self.lomo, 2))
+        self.carne.refresh_from_db()
+        self.assertEqual(self.carne.cantidad_disponible, Decimal('1000'))
+        self.assertFalse(Pedido.objects.exists())
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        backend = mock.patch.object(event_stream, '_backend', event_stream._MemoriaBackend(capacidad=3))
+        backend.start()
+        self.addCleanup(backend.stop)
+
+    def registrar(self, n):
+        return [event_stream.registrar_evento('cola_cocina', {'id': i}) for i in range(n)]
+
+    def test_eventos_desde_una_secuencia(self):
+        self.registrar(3)
+        eventos, completo = event_stream.eventos_desde('cola_cocina', 1)
+        self.assertTrue(completo)
+        self.assertEqual([evento['seq'] for evento in eventos], [2, 3])
+        self.assertEqual(event_stream.eventos_desde('cola_cocina', 3), ([], True))
+
+    def test_buffer_sin_el_rango_pide_recargar(self):
+        self.registrar(5)
+        eventos, completo = event_stream.eventos_desde('cola_cocina', 1)
+        self.assertFalse(completo)
+
+    def test_secuencia_reiniciada_pide_recargar(self):
+        # El cliente vio hasta la 10; el servidor reinició y va en la 2
+        self.registrar(2)
+        self.assertEqual(event_stream.eventos_desde('cola_cocina', 10), ([], False))
+
+
+class NotificacionesPedidoTests(TestCase):
+    def setUp(self):
+        backend = mock.patch.object(event_stream, '_backend', event_stream._MemoriaBackend(capacidad=10))
+        backend.start()
+        self.addCleanup(backend.stop)
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+
+    def test_un_lote_por_transaccion(self):
+        with mock.patch('cocinaApp.websocket_utils.publicar_notificaciones') as publicar:
+            with self.captureOnCommitCallbacks(execute=True):
+                pedidos = [Pedido.objects.create(mesa=self.mesa) for _ in range(3)]
+                for pedido in pedidos:
+                    enviar_notificacion_pedido(pedido, 'creado')
+                publicar.assert_not_called()
+
+        publicar.assert_called_once()
+        [eventos] = publicar.call_args.args
+        self.assertEqual([evento[0] for evento in eventos], [p.pk for p in pedidos])
+
+    def test_transaccion_revertida_no_publica(self):
+        with mock.patch('cocinaApp.websocket_utils.publicar_notificaciones') as publicar:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        enviar_notificacion_pedido(Pedido.objects.create(mesa=self.mesa), 'creado')
+                        raise ValueError
+                except ValueError:
+                    pass
+        publicar.assert_not_called()
+
+    def test_publica_a_los_grupos_del_pedido(self):
+        channel_layer = get_channel_layer()
+        canal = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)('cola_cocina', canal)
+        self.addCleanup(async_to_sync(channel_layer.group_discard), 'cola_cocina', canal)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = Pedido.objects.create(mesa=self.mesa)
+            enviar_notificacion_pedido(pedido, 'creado')
+
+        mensaje = async_to_sync(channel_layer.receive)(canal)
+        self.assertEqual(mensaje['type'], 'pedido_creado')
+        self.assertEqual(mensaje['data']['pedido']['id'], pedido.pk)
+        self.assertEqual(mensaje['delta']['seq'], 1)
+        self.assertEqual(mensaje['delta']['pedido']['id'], pedido.pk)
+
+
+class PedidoConsumerTests(TestCase):
+    def setUp(self):
+        backend = mock.patch.object(event_stream, '_backend', event_stream._MemoriaBackend(capacidad=10))
+        backend.start()
+        self.addCleanup(backend.stop)
+        self.usuario = crear_usuario('cocinero1', 'cocinero')
+
+    @staticmethod
+    def mensaje(grupo, pedido_id, mesa, seq):
+        delta = {
+            'type': 'evento', 'v': 2, 'grupo': grupo, 'event': 'actualizado', 'id': pedido_id,
+            'mesa': mesa, 'estado': EstadoPedido.CREADO, 'cambios': {}, 'timestamp': 't', 'seq': seq,
+        }
+        return {'type': 'pedido_actualizado', 'data': {'event': 'actualizado'}, 'delta': delta}
+
+    async def conectar(self, grupos, filtros=None):
+        communicator = WebsocketCommunicator(PedidoConsumer.as_asgi(), '/ws/cocina/?protocolo=2')
+        communicator.scope['user'] = self.usuario
+        conectado, _ = await communicator.connect()
+        self.assertTrue(conectado)
+        await communicator.receive_json_from()
+        await communicator.send_json_to({'type': 'subscribe', 'grupos': grupos, 'filtros': filtros or {}})
+        respuesta = await communicator.receive_json_from()
+        self.assertEqual(respuesta['type'], 'subscribed')
+        return communicator
+
+    async def test_filtra_por_mesa_en_el_servidor(self):
+        communicator = await self.conectar(['cola_cocina', 'no_existe'], {'mesas': [1]})
+        channel_layer = get_channel_layer()
+
+        await channel_layer.group_send('cola_cocina', self.mensaje('cola_cocina', 10, mesa=1, seq=1))
+        await channel_layer.group_send('cola_cocina', self.mensaje('cola_cocina', 11, mesa=2, seq=2))
+
+        self.assertEqual((await communicator.receive_json_from())['id'], 10)
+        # El filtrado igual informa la secuencia para poder reanudar
+        self.assertEqual(
+            await communicator.receive_json_from(), {'type': 'seq', 'grupo': 'cola_cocina', 'seq': 2}
+        )
+        await communicator.disconnect()
+
+    async def test_un_evento_de_varios_grupos_se_entrega_una_vez(self):
+        communicator = await self.conectar(['cola_cocina', 'mesa_1'])
+        channel_layer = get_channel_layer()
+
+        await channel_layer.group_send('cola_cocina', self.mensaje('cola_cocina', 10, mesa=1, seq=1))
+        await channel_layer.group_send('mesa_1', self.mensaje('mesa_1', 10, mesa=1, seq=1))
+
+        self.assertEqual((await communicator.receive_json_from())['grupo'], 'cola_cocina')
+        self.assertEqual(
+            await communicator.receive_json_from(), {'type': 'seq', 'grupo': 'mesa_1', 'seq': 1}
+        )
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
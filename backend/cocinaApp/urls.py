@@ -8,7 +8,10 @@ from .views import (
     PedidosListosView,
     PedidosEntregadosView,
     PedidosCanceladosView,
+    HistorialPedidosView,
     EstadisticasCancelacionesView,
+    EstadisticasTiemposEstadoView,
+    MetricasNotificacionesView,
 )
 
 router = DefaultRouter()
@@ -21,8 +24,11 @@ urlpatterns = [
     path('pedidos/listos/', PedidosListosView.as_view(), name='pedidos-listos'),
     path('pedidos/entregados/', PedidosEntregadosView.as_view(), name='pedidos-entregados'),
     path('pedidos/cancelados/', PedidosCanceladosView.as_view(), name='pedidos-cancelados'),
+    path('pedidos/historial/', HistorialPedidosView.as_view(), name='pedidos-historial'),
     path('estadisticas/', EstadisticasCocinaView.as_view(), name='estadisticas-cocina'),
     path('estadisticas/cancelaciones/', EstadisticasCancelacionesView.as_view(), name='estadisticas-cancelaciones'),
+    path('estadisticas/tiempos-estado/', EstadisticasTiemposEstadoView.as_view(), name='estadisticas-tiempos-estado'),
+    path('websocket/metricas/', MetricasNotificacionesView.as_view(), name='websocket-metricas'),
     # Router genérico al final
     path('', include(router.urls)),
 ]
@@ -4,23 +4,34 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Avg, Count, Prefetch, Case, When, IntegerField
+from django.db.models import Avg, Max, Sum
 from django.db.models.functions import TruncDate
 from django.core.exceptions import ValidationError
-from datetime import timedelta
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import heapq
 
-from .models import Pedido, DetallePedido, EstadoPedido, PedidoCancelacion
+from .models import (
+    Pedido, DetallePedido, EstadoPedido, PedidoCancelacion, EstadisticaCocinaDiaria,
+    ResumenCancelacionDiario, TransicionPedido, PedidoArchivado
+)
 from .serializers import (
     PedidoSerializer,
     PedidoListSerializer,
     PedidoCreateSerializer,
     CambiarEstadoSerializer,
-    DetallePedidoSerializer
+    CambioEstadoMasivoSerializer,
+    DetallePedidoSerializer,
+    PedidoCotizacionSerializer
 )
 from .filters import PedidoFilter
 from .services import PedidoService
+from .websocket_utils import obtener_metricas, enviar_notificacion_pedido
+from .read_models import cola_cocina
+from mainApp.idempotencia import idempotente
 from mainApp.permissions import IsAdministrador, IsAdminOrCajero
 
 
@@ -45,10 +56,19 @@ class PedidoViewSet(viewsets.ModelViewSet):
             return PedidoCreateSerializer
         if self.action == 'estado':
             return CambiarEstadoSerializer
+        if self.action == 'cotizar':
+            return PedidoCotizacionSerializer
+        if self.action == 'estado_masivo':
+            return CambioEstadoMasivoSerializer
         return PedidoSerializer
 
+    @idempotente
     def create(self, request, *args, **kwargs):
-        """Crear pedido usando el servicio transaccional"""
+        """
+        Crear pedido usando el servicio transaccional.
+        Acepta el header Idempotency-Key para que los reintentos no descuenten
+        stock dos veces.
+        """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
@@ -70,6 +90,56 @@ class PedidoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    def perform_update(self, serializer):
+        """Guardar cambios (p.ej. notas) y notificar a los suscriptores y la cola"""
+        pedido = serializer.save()
+        enviar_notificacion_pedido(
+            pedido, 'actualizado',
+            estado_anterior=pedido.estado,
+            campos=list(serializer.validated_data) + ['mesa_numero', 'cliente_nombre']
+        )
+
+    @action(detail=False, methods=['post'])
+    def cotizar(self, request):
+        """
+        Cotiza un pedido sin crearlo (solo lectura, sin bloqueos).
+
+        Recibe el mismo payload que la creación y retorna el total, la
+        factibilidad de cada línea y el ingrediente limitante, para que el
+        frontend no tenga que intentar crear el pedido para descubrir que
+        falta stock.
+        """
+        serializer = PedidoCotizacionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cotizacion = PedidoService.cotizar_pedido(serializer.validated_data['detalles'])
+        return Response(cotizacion)
+
+    @action(detail=False, methods=['post'], url_path='estado-masivo')
+    def estado_masivo(self, request):
+        """
+        Cambiar el estado de varios pedidos en una sola llamada.
+
+        Body: {"ids": [1, 2, 3], "estado": "ENTREGADO"}
+
+        Cada transición se valida por separado: los pedidos con transición
+        inválida o inexistentes se reportan en 'resultados' sin afectar al
+        resto. La cancelación masiva no está soportada (requiere motivo).
+        """
+        serializer = CambioEstadoMasivoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        resultados = PedidoService.cambiar_estado_masivo(
+            serializer.validated_data['ids'],
+            serializer.validated_data['estado'],
+            usuario=request.user
+        )
+        return Response({
+            'estado': serializer.validated_data['estado'],
+            'actualizados': sum(1 for r in resultados if r['ok']),
+            'resultados': resultados,
+        })
+
     @action(detail=True, methods=['post'])
     def estado(self, request, pk=None):
         """
@@ -114,7 +184,7 @@ class PedidoViewSet(viewsets.ModelViewSet):
                 )
             else:
                 # Llamar al método estándar para otros estados
-                pedido = PedidoService.cambiar_estado(pedido, nuevo_estado)
+                pedido = PedidoService.cambiar_estado(pedido, nuevo_estado, usuario=request.user)
 
             return Response(PedidoSerializer(pedido).data)
         except ValidationError as e:
@@ -129,48 +199,23 @@ class ColaCocinaPedidosView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Obtener pedidos pendientes y en preparación. Soporta ?horas_recientes=N"""
-        estados_cola = [
-            EstadoPedido.CREADO,
-            EstadoPedido.URGENTE,
-            EstadoPedido.EN_PREPARACION
-        ]
-
-        pedidos = Pedido.objects.filter(
-            estado__in=estados_cola
-        ).select_related(
-            'mesa',
-            'cliente',
-            'cliente__perfil'
-        ).prefetch_related(
-            'detalles__plato',
-            Prefetch('cancelacion', queryset=PedidoCancelacion.objects.select_related(
-                'cancelado_por',
-                'cancelado_por__perfil'
-            ))
-        )
+        """
+        Obtener pedidos pendientes y en preparación. Soporta ?horas_recientes=N
 
+        Se sirve desde el modelo de lectura en memoria (URGENTE primero,
+        luego por fecha de creación), sin consultas a la BD.
+        """
         # NUEVO: Filtro opcional por últimas N horas
+        desde = None
         horas_recientes = request.query_params.get('horas_recientes')
         if horas_recientes:
             try:
                 horas = int(horas_recientes)
-                limite = timezone.now() - timedelta(hours=horas)
-                pedidos = pedidos.filter(fecha_creacion__gte=limite)
+                desde = timezone.now() - timedelta(hours=horas)
             except (ValueError, TypeError):
                 pass
 
-        # Ordenar en SQL: URGENTE primero, luego por fecha de creación
-        pedidos = pedidos.annotate(
-            urgente_primero=Case(
-                When(estado='URGENTE', then=0),
-                default=1,
-                output_field=IntegerField()
-            )
-        ).order_by('urgente_primero', 'fecha_creacion')
-
-        serializer = PedidoSerializer(pedidos, many=True)
-        return Response(serializer.data)
+        return Response(cola_cocina.listar(desde=desde))
 
 
 class ColaUrgentesView(APIView):
@@ -178,13 +223,8 @@ class ColaUrgentesView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Obtener solo pedidos urgentes"""
-        pedidos = Pedido.objects.filter(
-            estado=EstadoPedido.URGENTE
-        ).select_related('mesa').prefetch_related('detalles__plato').order_by('fecha_creacion')
-
-        serializer = PedidoSerializer(pedidos, many=True)
-        return Response(serializer.data)
+        """Obtener solo pedidos urgentes (desde el modelo de lectura de la cola)"""
+        return Response(cola_cocina.listar(estado=EstadoPedido.URGENTE))
 
 
 class EstadisticasCocinaView(APIView):
@@ -192,34 +232,61 @@ class EstadisticasCocinaView(APIView):
     permission_classes = [IsAuthenticated, IsAdminOrCajero]
 
     def get(self, request):
-        """Obtener estadísticas de pedidos"""
-        hoy = timezone.now().date()
+        """
+        Obtener estadísticas de pedidos del día (o de ?fecha=YYYY-MM-DD).
+        Lee la fila diaria mantenida en cada transición: sin COUNT por request.
+        """
+        fecha = timezone.localdate()
+        fecha_param = request.query_params.get('fecha')
+        if fecha_param:
+            try:
+                fecha = datetime.strptime(fecha_param, '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        # Pedidos de hoy por estado
-        pedidos_hoy = Pedido.objects.filter(
-            fecha_creacion__date=hoy
-        ).values('estado').annotate(count=Count('id'))
+        estadistica = EstadisticaCocinaDiaria.objects.filter(fecha=fecha).first()
+        if estadistica is None:
+            estadistica = EstadisticaCocinaDiaria(fecha=fecha)
 
-        resumen_estados = {item['estado']: item['count'] for item in pedidos_hoy}
+        return Response(estadistica.resumen())
 
-        # Tiempo promedio de preparación (de CREADO a LISTO)
-        # Esto es una aproximación simplificada
-        pedidos_completados = Pedido.objects.filter(
-            estado__in=[EstadoPedido.LISTO, EstadoPedido.ENTREGADO],
-            fecha_creacion__date=hoy
-        )
 
-        total_pedidos_hoy = Pedido.objects.filter(fecha_creacion__date=hoy).count()
+class EstadisticasTiemposEstadoView(APIView):
+    """Tiempo que los pedidos pasan en cada estado, desde el registro de transiciones"""
+    permission_classes = [IsAuthenticated, IsAdminOrCajero]
+
+    def get(self, request):
+        """
+        GET /api/cocina/estadisticas/tiempos-estado/?dias=7
+
+        Por estado: muestras, promedio, p50 y p90 en minutos.
+        """
+        try:
+            dias = min(max(int(request.query_params.get('dias', 7)), 1), 90)
+        except (TypeError, ValueError):
+            dias = 7
+
+        hasta = timezone.now()
+        desde = hasta - timedelta(days=dias)
+        tiempos = TransicionPedido.tiempos_por_estado(desde, hasta)
+
+        por_estado = {}
+        for estado, minutos in tiempos.items():
+            minutos = sorted(minutos)
+            por_estado[estado] = {
+                'muestras': len(minutos),
+                'promedio': round(sum(minutos) / len(minutos), 1),
+                'p50': round(minutos[len(minutos) // 2], 1),
+                'p90': round(minutos[min(len(minutos) - 1, int(len(minutos) * 0.9))], 1),
+            }
 
         return Response({
-            'fecha': hoy.isoformat(),
-            'total_pedidos': total_pedidos_hoy,
-            'por_estado': resumen_estados,
-            'pedidos_pendientes': resumen_estados.get('CREADO', 0) + resumen_estados.get('URGENTE', 0),
-            'pedidos_en_preparacion': resumen_estados.get('EN_PREPARACION', 0),
-            'pedidos_listos': resumen_estados.get('LISTO', 0),
-            'pedidos_entregados': resumen_estados.get('ENTREGADO', 0),
-            'pedidos_cancelados': resumen_estados.get('CANCELADO', 0),
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'por_estado': por_estado,
         })
 
 
@@ -280,11 +347,10 @@ class PedidosEntregadosView(APIView):
 
     def get(self, request):
         # Default: solo del día actual
-        hoy = timezone.now().date()
+        hoy = timezone.localdate()
 
         fecha = request.query_params.get('fecha')
         if fecha:
-            from datetime import datetime
             try:
                 hoy = datetime.strptime(fecha, '%Y-%m-%d').date()
             except ValueError:
@@ -293,9 +359,12 @@ class PedidosEntregadosView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+        # Rango [inicio, fin) en vez de __date para usar el índice de fecha_entregado
+        inicio = timezone.make_aware(datetime.combine(hoy, time.min))
         pedidos = Pedido.objects.filter(
             estado=EstadoPedido.ENTREGADO,
-            fecha_entregado__date=hoy
+            fecha_entregado__gte=inicio,
+            fecha_entregado__lt=inicio + timedelta(days=1)
         ).select_related('mesa', 'reserva', 'cliente', 'cliente__perfil').prefetch_related('detalles__plato')
 
         # Filtros
@@ -431,6 +500,119 @@ class PedidosCanceladosView(APIView):
         return Response(serializer.data)
 
 
+class HistorialPedidosView(APIView):
+    """
+    Historial de pedidos finalizados: une los pedidos activos y los archivados
+    (PedidoArchivado) en una sola lista paginada, de más recientes a más antiguos.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrCajero]
+
+    def get(self, request):
+        """
+        GET /api/cocina/pedidos/historial/
+
+        Parámetros:
+        - desde, hasta: rango de fecha de creación (YYYY-MM-DD, inclusivo)
+        - estado: ENTREGADO | CANCELADO
+        - mesa: número de mesa
+        - cliente: ID del cliente
+        - page, page_size
+
+        Cada resultado incluye 'archivado' (true si viene del archivo).
+        """
+        activos = Pedido.objects.filter(
+            estado__in=[EstadoPedido.ENTREGADO, EstadoPedido.CANCELADO]
+        )
+        archivados = PedidoArchivado.objects.all()
+
+        try:
+            for parametro, lookup in (('desde', 'fecha_creacion__gte'), ('hasta', 'fecha_creacion__lt')):
+                valor = request.query_params.get(parametro)
+                if not valor:
+                    continue
+                dia = datetime.strptime(valor, '%Y-%m-%d').date()
+                if parametro == 'hasta':
+                    dia += timedelta(days=1)
+                limite = timezone.make_aware(datetime.combine(dia, time.min))
+                activos = activos.filter(**{lookup: limite})
+                archivados = archivados.filter(**{lookup: limite})
+        except ValueError:
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        estado = request.query_params.get('estado')
+        if estado in (EstadoPedido.ENTREGADO, EstadoPedido.CANCELADO):
+            activos = activos.filter(estado=estado)
+            archivados = archivados.filter(estado=estado)
+
+        try:
+            mesa = request.query_params.get('mesa')
+            mesa = int(mesa) if mesa else None
+            cliente = request.query_params.get('cliente')
+            cliente = int(cliente) if cliente else None
+        except ValueError:
+            return Response(
+                {'error': 'mesa y cliente deben ser números enteros'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if mesa is not None:
+            activos = activos.filter(mesa__numero=mesa)
+            archivados = archivados.filter(mesa_numero=mesa)
+        if cliente is not None:
+            activos = activos.filter(cliente_id=cliente)
+            archivados = archivados.filter(cliente_id=cliente)
+
+        paginator = PedidoPagination()
+        try:
+            pagina = max(int(request.query_params.get('page', 1)), 1)
+        except (TypeError, ValueError):
+            pagina = 1
+        tamano = paginator.get_page_size(request)
+        fin = pagina * tamano
+
+        # Mezclar solo las claves (fecha_creacion, id) de ambas fuentes hasta el
+        # final de la página; luego cargar completos únicamente los de la página
+        claves_activos = activos.order_by('-fecha_creacion', '-id').values_list('fecha_creacion', 'id')[:fin]
+        claves_archivo = archivados.order_by('-fecha_creacion', '-pedido_id').values_list(
+            'fecha_creacion', 'pedido_id'
+        )[:fin]
+        mezcla = heapq.merge(
+            ((fecha, pk, False) for fecha, pk in claves_activos),
+            ((fecha, pk, True) for fecha, pk in claves_archivo),
+            reverse=True
+        )
+        pagina_claves = list(mezcla)[fin - tamano:fin]
+
+        ids_activos = [pk for _, pk, archivado in pagina_claves if not archivado]
+        ids_archivo = [pk for _, pk, archivado in pagina_claves if archivado]
+        datos = {}
+        if ids_activos:
+            for pedido in Pedido.objects.filter(pk__in=ids_activos).select_related(
+                'mesa', 'cliente', 'cliente__perfil',
+                'cancelacion', 'cancelacion__cancelado_por', 'cancelacion__cancelado_por__perfil'
+            ).prefetch_related('detalles__plato'):
+                datos[(pedido.pk, False)] = {**PedidoSerializer(pedido).data, 'archivado': False}
+        if ids_archivo:
+            for pedido_id, snapshot in PedidoArchivado.objects.filter(
+                pedido_id__in=ids_archivo
+            ).values_list('pedido_id', 'datos'):
+                datos[(pedido_id, True)] = {**snapshot, 'archivado': True}
+
+        count = activos.count() + archivados.count()
+        url = request.build_absolute_uri()
+        return Response({
+            'count': count,
+            'next': replace_query_param(url, 'page', pagina + 1) if fin < count else None,
+            'previous': replace_query_param(url, 'page', pagina - 1) if pagina > 1 else None,
+            'results': [
+                datos[(pk, archivado)] for _, pk, archivado in pagina_claves
+                if (pk, archivado) in datos
+            ],
+        })
+
+
 class EstadisticasCancelacionesView(APIView):
     """Vista para estadísticas de pedidos cancelados"""
     permission_classes = [IsAuthenticated, IsAdminOrCajero]
@@ -443,7 +625,7 @@ class EstadisticasCancelacionesView(APIView):
         - periodo: 'dia' | 'semana' | 'mes' (default: dia)
         """
         periodo = request.query_params.get('periodo', 'dia')
-        hoy = timezone.now().date()
+        hoy = timezone.localdate()
 
         # Determinar rango de fechas
         if periodo == 'dia':
@@ -461,37 +643,74 @@ class EstadisticasCancelacionesView(APIView):
             fecha_inicio = hoy
             fecha_fin = hoy
 
-        # Query de cancelaciones en el periodo
-        # IMPORTANTE: Usar modelo relacionado PedidoCancelacion
-        from .models import PedidoCancelacion
-        cancelaciones = PedidoCancelacion.objects.filter(
-            fecha_cancelacion__date__gte=fecha_inicio,
-            fecha_cancelacion__date__lte=fecha_fin
-        ).select_related('cancelado_por', 'cancelado_por__perfil', 'pedido')
-
-        total_cancelados = cancelaciones.count()
-
-        # Cancelaciones por usuario
-        por_usuario = cancelaciones.values(
-            'cancelado_por__username',
-            'cancelado_por__perfil__nombre_completo'
-        ).annotate(
-            count=Count('id')
+        # Rollups diarios del periodo (pocas filas por día) en vez de escanear la auditoría
+        resumen = ResumenCancelacionDiario.objects.filter(
+            fecha__gte=fecha_inicio,
+            fecha__lte=fecha_fin
+        ).values('dimension', 'clave').annotate(
+            count=Sum('cancelaciones'),
+            unidades_total=Sum('unidades'),
+            monto=Sum('monto_perdido'),
+            etiqueta_max=Max('etiqueta'),
+            descripcion_max=Max('descripcion'),
         ).order_by('-count')
 
-        # Motivos más frecuentes (limitar a 100 caracteres por motivo y máximo 20 motivos)
-        motivos_raw = cancelaciones.values_list('motivo', flat=True)
+        por_dimension = {dimension: [] for dimension in ResumenCancelacionDiario.Dimension.values}
+        for fila in resumen:
+            por_dimension[fila['dimension']].append(fila)
+
+        total = por_dimension[ResumenCancelacionDiario.Dimension.TOTAL]
+        total_cancelados = total[0]['count'] if total else 0
+        monto_perdido = total[0]['monto'] if total else Decimal('0')
+
+        # Motivos más recientes (limitar a 100 caracteres por motivo y máximo 20 motivos)
+        motivos_raw = PedidoCancelacion.objects.filter(
+            fecha_cancelacion__gte=timezone.make_aware(datetime.combine(fecha_inicio, time.min)),
+            fecha_cancelacion__lt=timezone.make_aware(datetime.combine(fecha_fin + timedelta(days=1), time.min))
+        ).order_by('-fecha_cancelacion').values_list('motivo', flat=True)[:20]
         motivos_truncados = [
             m[:97] + '...' if len(m) > 100 else m
             for m in motivos_raw if m
-        ][:20]  # Máximo 20 motivos para evitar respuestas enormes
+        ]
 
         return Response({
             'periodo': periodo,
             'fecha_inicio': fecha_inicio.isoformat(),
             'fecha_fin': fecha_fin.isoformat(),
             'total_cancelados': total_cancelados,
-            'por_usuario': list(por_usuario),
+            'monto_perdido': monto_perdido,
+            'por_usuario': [
+                {
+                    'cancelado_por__username': fila['etiqueta_max'] or None,
+                    'cancelado_por__perfil__nombre_completo': fila['descripcion_max'] or None,
+                    'count': fila['count'],
+                    'monto_perdido': fila['monto'],
+                }
+                for fila in por_dimension[ResumenCancelacionDiario.Dimension.USUARIO]
+            ],
+            'por_mesa': [
+                {'mesa_numero': int(fila['clave']), 'count': fila['count'], 'monto_perdido': fila['monto']}
+                for fila in por_dimension[ResumenCancelacionDiario.Dimension.MESA]
+            ],
+            'por_plato': [
+                {
+                    'plato_id': int(fila['clave']),
+                    'plato_nombre': fila['etiqueta_max'],
+                    'count': fila['count'],
+                    'unidades': fila['unidades_total'],
+                    'monto_perdido': fila['monto'],
+                }
+                for fila in por_dimension[ResumenCancelacionDiario.Dimension.PLATO]
+            ],
             'motivos_sample': motivos_truncados,
-            'motivos_total': len(motivos_raw)  # Total de motivos disponibles
+            'motivos_total': total_cancelados  # El motivo es obligatorio en cada cancelación
         })
+
+
+class MetricasNotificacionesView(APIView):
+    """Contadores de publicación de notificaciones WebSocket (por proceso)"""
+    permission_classes = [IsAuthenticated, IsAdministrador]
+
+    def get(self, request):
+        """GET /api/cocina/websocket/metricas/"""
+        return Response(obtener_metricas())
@@ -1,50 +1,294 @@
 """
 Utilidades para enviar notificaciones WebSocket
+
+Las notificaciones se encolan con transaction.on_commit y se publican
+recién cuando la transacción confirma: los clientes nunca reciben eventos
+de filas que luego se revierten y la latencia del channel layer queda
+fuera de la transacción. Cada pedido se serializa una sola vez por lote y
+el envío a todos los grupos se hace concurrentemente en un solo salto al
+event loop. Las notificaciones marcadas para coalescer (transiciones
+masivas) viajan en un solo mensaje 'lote' por grupo.
 """
-from channels.layers import get_channel_layer
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
 from asgiref.sync import async_to_sync
-from typing import Dict
-from .models import Pedido, EstadoPedido
+from channels.layers import get_channel_layer
+from django.db.models import Prefetch
+from rest_framework.utils.encoders import JSONEncoder
+
+from mainApp.transacciones import LotePorTransaccion
+
+from . import event_stream
+from .models import Pedido, PedidoCancelacion, EstadoPedido
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== MÉTRICAS ====================
+
+_metricas_lock = threading.Lock()
+_metricas = {
+    'lotes_publicados': 0,
+    'eventos_publicados': 0,
+    'mensajes_enviados': 0,
+    'errores': 0,
+    'latencia_total_ms': 0.0,
+    'latencia_max_ms': 0.0,
+    'latencia_ultima_ms': 0.0,
+}
+
+
+def _registrar_publicacion(eventos, mensajes, latencia_ms, error=False):
+    with _metricas_lock:
+        _metricas['lotes_publicados'] += 1
+        _metricas['eventos_publicados'] += eventos
+        _metricas['mensajes_enviados'] += mensajes
+        _metricas['latencia_total_ms'] += latencia_ms
+        _metricas['latencia_ultima_ms'] = latencia_ms
+        _metricas['latencia_max_ms'] = max(_metricas['latencia_max_ms'], latencia_ms)
+        if error:
+            _metricas['errores'] += 1
+
+
+def obtener_metricas() -> Dict:
+    """Retorna una copia de los contadores de publicación (por proceso)"""
+    with _metricas_lock:
+        metricas = dict(_metricas)
+    lotes = metricas['lotes_publicados']
+    metricas['latencia_promedio_ms'] = metricas['latencia_total_ms'] / lotes if lotes else 0.0
+    return metricas
+
+
+def a_tipos_nativos(data):
+    """Convierte la salida de un serializer a tipos JSON nativos (sin Decimal/datetime)"""
+    return json.loads(json.dumps(data, cls=JSONEncoder))
+
+
+# ==================== GRUPOS ====================
+
+def grupos_para_estado(estado: str, mesa_id: int) -> List[str]:
+    """Determina los grupos WebSocket que reciben eventos de un pedido en ese estado"""
+    grupos = [f'mesa_{mesa_id}']
+
+    if estado in [EstadoPedido.CREADO, EstadoPedido.URGENTE, EstadoPedido.EN_PREPARACION]:
+        grupos.append('cola_cocina')
+
+    if estado == EstadoPedido.URGENTE:
+        grupos.append('pedidos_urgentes')
+
+    if estado == EstadoPedido.LISTO:
+        grupos.append('pedidos_listos')
+
+    return grupos
+
+
+def grupos_pedido(pedido: Pedido) -> List[str]:
+    """Grupos WebSocket del pedido según su estado actual"""
+    return grupos_para_estado(pedido.estado, pedido.mesa_id)
+
+
+# ==================== PAYLOAD DELTA (PROTOCOLO v2) ====================
 
+# Campos que cambian en una transición de estado
+CAMPOS_DELTA = [
+    'estado', 'fecha_actualizacion', 'fecha_listo', 'fecha_entregado', 'transiciones_permitidas'
+]
 
-def enviar_notificacion_pedido(pedido: Pedido, evento: str, data_extra: Dict = None):
+
+def construir_delta(grupo, evento, pedido_data, estado_anterior, data_extra, campos=None):
+    """
+    Evento compacto para un grupo: id, estado y campos cambiados
+    (CAMPOS_DELTA más los campos adicionales indicados).
+    Incluye el pedido completo solo si el grupo aún no lo conoce
+    (evento 'creado' o pedido que recién entra al grupo).
     """
-    Envía notificación WebSocket cuando un pedido cambia.
+    delta = {
+        'type': 'evento',
+        'v': event_stream.PROTOCOLO_VERSION,
+        'grupo': grupo,
+        'event': evento,
+        'id': pedido_data['id'],
+        'mesa': pedido_data['mesa'],
+        'estado': pedido_data['estado'],
+        'cambios': {
+            campo: pedido_data[campo]
+            for campo in CAMPOS_DELTA + [c for c in (campos or []) if c in pedido_data]
+        },
+        'timestamp': pedido_data['fecha_actualizacion'],
+        **(data_extra or {})
+    }
+    nuevo_en_grupo = (
+        estado_anterior is None
+        or grupo not in grupos_para_estado(estado_anterior, pedido_data['mesa'])
+    )
+    if evento == 'creado' or nuevo_en_grupo:
+        delta['pedido'] = pedido_data
+    return delta
+
+
+# ==================== DESPACHO ====================
+
+# Un lote de notificaciones por transacción; se publica al confirmar
+_notificaciones = LotePorTransaccion(lambda eventos: publicar_notificaciones(eventos))
+
+
+def enviar_notificacion_pedido(pedido: Pedido, evento: str, data_extra: Dict = None,
+                               estado_anterior: str = None, campos: List[str] = None,
+                               coalescer: bool = False):
+    """
+    Encola una notificación WebSocket para cuando la transacción confirme.
+    Fuera de una transacción se publica de inmediato.
 
     Args:
         pedido: Instancia del pedido
         evento: Tipo ('creado', 'actualizado', 'cancelado')
         data_extra: Datos adicionales
+        estado_anterior: Estado antes del cambio (para saber qué grupos ya conocen el pedido)
+        campos: Campos adicionales modificados a incluir en el delta (p.ej. 'notas')
+        coalescer: Agrupar con los demás eventos coalescibles del lote en un
+            solo mensaje por grupo
+    """
+    _notificaciones.agregar((pedido.pk, evento, data_extra, estado_anterior, campos, coalescer))
+
+
+def publicar_notificaciones(eventos):
     """
+    Publica un lote de eventos
+    (pedido_id, evento, data_extra, estado_anterior, campos, coalescer).
+    Carga y serializa cada pedido una sola vez y envía a todos los grupos
+    concurrentemente. Cada mensaje lleva el payload completo (protocolo v1)
+    y el delta con secuencia del grupo (protocolo v2). Los eventos
+    coalescibles se envían en un mensaje 'pedido_lote' por grupo; en el
+    buffer de reanudación cada delta conserva su propia secuencia.
+    """
+    if not eventos:
+        return
+
     channel_layer = get_channel_layer()
     if not channel_layer:
         return
 
     from .serializers import PedidoSerializer
-    pedido_data = PedidoSerializer(pedido).data
 
-    message = {
-        'type': f'pedido_{evento}',
-        'data': {
+    pedidos = Pedido.objects.filter(
+        pk__in={item[0] for item in eventos}
+    ).select_related(
+        'mesa', 'cliente', 'cliente__perfil'
+    ).prefetch_related(
+        'detalles__plato',
+        Prefetch('cancelacion', queryset=PedidoCancelacion.objects.select_related(
+            'cancelado_por',
+            'cancelado_por__perfil'
+        ))
+    )
+
+    # Serializar una vez por pedido, a tipos nativos (el channel layer no acepta Decimal)
+    serializados = {}
+    for pedido in pedidos:
+        serializados[pedido.pk] = (
+            pedido,
+            a_tipos_nativos(PedidoSerializer(pedido).data)
+        )
+
+    envios = []
+    lotes = defaultdict(list)  # grupo -> [(data, delta)]
+    for pedido_id, evento, data_extra, estado_anterior, campos, coalescer in eventos:
+        if pedido_id not in serializados:
+            continue
+        pedido, pedido_data = serializados[pedido_id]
+        data = {
             'event': evento,
             'pedido': pedido_data,
             'timestamp': pedido.fecha_actualizacion.isoformat(),
             **(data_extra or {})
         }
-    }
+        # Notificar también a los grupos que el pedido abandona (p.ej. cola_cocina al
+        # pasar a LISTO) para que puedan retirarlo
+        grupos = grupos_pedido(pedido)
+        if estado_anterior:
+            grupos += [
+                grupo for grupo in grupos_para_estado(estado_anterior, pedido.mesa_id)
+                if grupo not in grupos
+            ]
+        for grupo in grupos:
+            delta = event_stream.registrar_evento(
+                grupo, construir_delta(grupo, evento, pedido_data, estado_anterior, data_extra, campos)
+            )
+            if coalescer:
+                lotes[grupo].append((data, delta))
+                continue
+            envios.append((grupo, {
+                'type': f'pedido_{evento}',
+                'data': data,
+                'delta': delta,
+            }))
 
-    # Determinar grupos según estado
-    grupos = [f'mesa_{pedido.mesa.id}']
+    for grupo, items in lotes.items():
+        envios.append((grupo, {
+            'type': 'pedido_lote',
+            'data': {'event': 'lote', 'eventos': [data for data, _ in items]},
+            'delta': {
+                'type': 'lote',
+                'v': event_stream.PROTOCOLO_VERSION,
+                'grupo': grupo,
+                'seq': items[-1][1]['seq'],
+                'eventos': [delta for _, delta in items],
+            },
+        }))
 
-    if pedido.estado in [EstadoPedido.CREADO, EstadoPedido.URGENTE, EstadoPedido.EN_PREPARACION]:
-        grupos.append('cola_cocina')
+    _agregar_etas(envios)
 
-    if pedido.estado == EstadoPedido.URGENTE:
-        grupos.append('pedidos_urgentes')
+    inicio = time.perf_counter()
+    error = False
+    try:
+        async_to_sync(_enviar_a_grupos)(channel_layer, envios)
+    except Exception:
+        error = True
+        logger.exception("Error publicando notificaciones WebSocket")
+    finally:
+        _registrar_publicacion(len(eventos), len(envios), (time.perf_counter() - inicio) * 1000, error)
+
+
+def _agregar_etas(envios):
+    """
+    Agrega la ETA del pedido a cada delta y, en 'cola_cocina', las ETA de
+    los demás pedidos que el cambio desplazó. Usa la cola en memoria puesta al
+    día con los eventos recién registrados (sin reconstruirla desde la BD).
+    Una falla aquí no bloquea el envío.
+    """
+    from .read_models import cola_cocina, GRUPO_COLA
+
+    try:
+        etas, cambios = cola_cocina.etas_actualizadas()
+    except Exception:
+        logger.exception("Error calculando ETA de la cola de cocina")
+        return
+
+    def con_eta(delta):
+        # Copia: el delta original queda tal cual en el buffer de reanudación
+        delta = dict(delta)
+        if delta['id'] in etas:
+            delta['eta'] = etas[delta['id']]
+        return delta
+
+    for _, message in envios:
+        if message['type'] == 'pedido_lote':
+            delta = message['delta'] = dict(message['delta'])
+            delta['eventos'] = [con_eta(evento) for evento in delta['eventos']]
+        else:
+            delta = message['delta'] = con_eta(message['delta'])
+        if delta['grupo'] == GRUPO_COLA and cambios:
+            delta['etas'] = cambios
 
-    if pedido.estado == EstadoPedido.LISTO:
-        grupos.append('pedidos_listos')
 
-    # Enviar a grupos
-    for grupo in grupos:
-        async_to_sync(channel_layer.group_send)(grupo, message)
+async def _enviar_a_grupos(channel_layer, envios):
+    """Envía todos los mensajes concurrentemente"""
+    await asyncio.gather(*(
+        channel_layer.group_send(grupo, message) for grupo, message in envios
+    ))
@@ -3,8 +3,12 @@ WebSocket URL routing
 """
 from django.urls import re_path
 from cocinaApp.consumers import PedidoConsumer
+from menuApp.consumers import StockConsumer
 
 websocket_urlpatterns = [
+    # Socket multiplexado: suscripción a varios grupos con filtros por mensaje
+    re_path(r'^ws/cocina/$', PedidoConsumer.as_asgi()),
+
     # Cola de cocina (todos los pedidos CREADO/URGENTE/EN_PREPARACION)
     re_path(r'^ws/cocina/cola/$', PedidoConsumer.as_asgi()),
 
@@ -16,4 +20,7 @@ websocket_urlpatterns = [
 
     # Pedidos urgentes
     re_path(r'^ws/cocina/urgentes/$', PedidoConsumer.as_asgi()),
+
+    # Alertas de stock bajo el mínimo (administradores)
+    re_path(r'^ws/menu/stock/$', StockConsumer.as_asgi()),
 ]
@@ -244,6 +244,8 @@ REST_FRAMEWORK = {
         'register': '5/hour',
         # Rate especial para login: 10 intentos por hora
         'login': '10/hour',
+        # Menú público (listados cacheados con ETag, ver menuApp.cache)
+        'menu': '600/hour',
     },
     # FIX #14 (MODERADO): Paginación para mejorar rendimiento en listados
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -283,6 +285,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
 
 # Métodos HTTP permitidos
@@ -503,3 +506,38 @@ else:
         "En Railway: Agrega servicio Redis desde el dashboard.\n"
         "En desarrollo: Usa docker-compose.dev.yml o configura DEBUG=True"
     )
+
+# Eventos de pedidos (protocolo v2): cantidad de eventos por grupo que se
+# conservan para que un cliente reconectado pueda reanudar con resume_from
+WEBSOCKET_REPLAY_BUFFER = int(os.environ.get('WEBSOCKET_REPLAY_BUFFER', 200))
+
+# Cola de cocina en memoria (cocinaApp.read_models): segundos antes de
+# reconstruirla desde la BD aunque no haya huecos en los eventos
+COLA_COCINA_TTL = int(os.environ.get('COLA_COCINA_TTL', 300))
+
+# Estimación de salida de pedidos (cocinaApp.eta): estaciones de cocina que
+# trabajan en paralelo y cada cuántos segundos se recalcula toda la cola
+COCINA_ESTACIONES = int(os.environ.get('COCINA_ESTACIONES', 3))
+COCINA_ETA_RECALCULO = int(os.environ.get('COCINA_ETA_RECALCULO', 60))
+
+# Idempotency-Key (mainApp.idempotencia): horas que se conserva la respuesta
+# de un POST para devolverla a los reintentos
+IDEMPOTENCIA_TTL_HORAS = int(os.environ.get('IDEMPOTENCIA_TTL_HORAS', 24))
+
+# Archivo de pedidos (cocinaApp archivar_pedidos): días que un pedido
+# ENTREGADO o CANCELADO permanece en las tablas activas
+PEDIDOS_DIAS_RETENCION = int(os.environ.get('PEDIDOS_DIAS_RETENCION', 90))
+
+# Menú público cacheado (menuApp.cache): segundos que un proceso confía en
+# la versión del menú sin releerla y duración de cada respuesta cacheada
+MENU_VERSION_TTL = int(os.environ.get('MENU_VERSION_TTL', 5))
+MENU_CACHE_TTL = int(os.environ.get('MENU_CACHE_TTL', 3600))
+
+# Pronóstico de demanda de ingredientes (menuApp.pronostico): horas tras las
+# que el perfil guardado se informa como vencido (se recalcula cada noche)
+PRONOSTICO_TTL_HORAS = int(os.environ.get('PRONOSTICO_TTL_HORAS', 24))
+
+# Sugerencias de reposición (menuApp.reposicion): días que tarda el
+# proveedor en entregar y días de consumo que cubre cada pedido
+REPOSICION_DIAS_ENTREGA = int(os.environ.get('REPOSICION_DIAS_ENTREGA', 2))
+REPOSICION_DIAS_COBERTURA = int(os.environ.get('REPOSICION_DIAS_COBERTURA', 7))
@@ -0,0 +1,147 @@
+"""
+Soporte de Idempotency-Key para endpoints POST que crean recursos.
+
+Con el header Idempotency-Key, la primera solicitud reserva la clave
+(fila EN_PROCESO, única por alcance + clave) y al terminar guarda su
+respuesta. Los reintentos con la misma clave:
+
+- mismo cuerpo, ya completada: reciben la respuesta original
+  (header Idempotent-Replayed: true) sin ejecutar la vista
+- mismo cuerpo, aún en proceso: 409, reintentar más tarde
+- otro cuerpo: 422, la clave no se puede reutilizar
+
+Las respuestas 5xx o las excepciones liberan la clave para permitir
+reintentar. Sin header la vista funciona igual que antes.
+
+La copia guardada no incluye credenciales (CAMPOS_SENSIBLES, p.ej. el
+token de auto-login de register_and_reserve): la repetición responde sin
+ellas y el cliente inicia sesión normalmente.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpRequest
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import SolicitudIdempotente
+
+HEADER = 'Idempotency-Key'
+MAX_LONGITUD_CLAVE = 255
+CAMPOS_SENSIBLES = {'token'}
+
+
+def _hash_solicitud(request):
+    cuerpo = json.dumps(request.data, sort_keys=True, cls=JSONEncoder, default=str)
+    return hashlib.sha256(cuerpo.encode('utf-8')).hexdigest()
+
+
+def _sin_campos_sensibles(data):
+    """Copia de la respuesta sin CAMPOS_SENSIBLES (en cualquier nivel)"""
+    if isinstance(data, dict):
+        return {
+            clave: _sin_campos_sensibles(valor)
+            for clave, valor in data.items() if clave not in CAMPOS_SENSIBLES
+        }
+    if isinstance(data, list):
+        return [_sin_campos_sensibles(valor) for valor in data]
+    return data
+
+
+def _alcance(request):
+    usuario = request.user.pk if request.user and request.user.is_authenticated else 'anon'
+    return f'{request.method} {request.path} {usuario}'[:255]
+
+
+def _reservar(alcance, clave, hash_solicitud):
+    """
+    Intenta reservar la clave. Retorna (solicitud, creada).
+    Una reserva expirada se reemplaza.
+    """
+    ahora = timezone.now()
+    ttl = timedelta(hours=getattr(settings, 'IDEMPOTENCIA_TTL_HORAS', 24))
+    existente = None
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return SolicitudIdempotente.objects.create(
+                    alcance=alcance,
+                    clave=clave,
+                    hash_solicitud=hash_solicitud,
+                    expira_en=ahora + ttl
+                ), True
+        except IntegrityError:
+            existente = SolicitudIdempotente.objects.filter(alcance=alcance, clave=clave).first()
+            if existente is None:
+                continue
+            if existente.expira_en > ahora:
+                return existente, False
+            SolicitudIdempotente.objects.filter(pk=existente.pk, expira_en__lte=ahora).delete()
+    return existente, False
+
+
+def idempotente(vista):
+    """
+    Decorador para vistas (funciones @api_view o métodos de ViewSet) que
+    acepta el header Idempotency-Key.
+    """
+    @wraps(vista)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+        clave = request.headers.get(HEADER)
+        if not clave:
+            return vista(*args, **kwargs)
+
+        if len(clave) > MAX_LONGITUD_CLAVE:
+            return Response(
+                {'error': f'{HEADER} no puede superar {MAX_LONGITUD_CLAVE} caracteres'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        hash_solicitud = _hash_solicitud(request)
+        solicitud, creada = _reservar(_alcance(request), clave, hash_solicitud)
+
+        if not creada:
+            if solicitud is not None and solicitud.hash_solicitud != hash_solicitud:
+                return Response(
+                    {'error': f'{HEADER} ya fue usada con otro contenido'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if solicitud is None or solicitud.estado != 'COMPLETADA':
+                return Response(
+                    {'error': 'Una solicitud con esta clave aún se está procesando'},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={'Retry-After': '1'}
+                )
+            return Response(
+                solicitud.respuesta,
+                status=solicitud.codigo_respuesta,
+                headers={'Idempotent-Replayed': 'true'}
+            )
+
+        try:
+            response = vista(*args, **kwargs)
+        except Exception:
+            solicitud.delete()
+            raise
+
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            solicitud.delete()
+            return response
+
+        solicitud.estado = 'COMPLETADA'
+        solicitud.codigo_respuesta = response.status_code
+        solicitud.respuesta = _sin_campos_sensibles(
+            json.loads(json.dumps(response.data, cls=JSONEncoder))
+        )
+        solicitud.save(update_fields=['estado', 'codigo_respuesta', 'respuesta'])
+        return response
+
+    return wrapper
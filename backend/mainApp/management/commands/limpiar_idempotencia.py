@@ -0,0 +1,18 @@
+"""
+Elimina las respuestas idempotentes expiradas (SolicitudIdempotente).
+
+Uso:
+    python manage.py limpiar_idempotencia
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from mainApp.models import SolicitudIdempotente
+
+
+class Command(BaseCommand):
+    help = 'Elimina las claves Idempotency-Key expiradas'
+
+    def handle(self, *args, **options):
+        eliminadas, _ = SolicitudIdempotente.objects.filter(expira_en__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'✅ {eliminadas} claves expiradas eliminadas'))
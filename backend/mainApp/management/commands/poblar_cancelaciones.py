@@ -141,8 +141,8 @@ class Command(BaseCommand):
 
                     total += plato.precio * cantidad
 
-                # Actualizar total del pedido
-                pedido.save()  # Esto recalcula el total automáticamente
+                # Refrescar totales mantenidos al crear los detalles
+                pedido.refresh_from_db(fields=['total', 'num_items'])
 
                 # Crear auditoría de cancelación
                 motivo = random.choice(self.MOTIVOS_CANCELACION)
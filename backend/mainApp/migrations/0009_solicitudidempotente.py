@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0008_alter_reserva_estado_bloqueomesa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolicitudIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alcance', models.CharField(help_text='Método, ruta y usuario de la solicitud', max_length=255)),
+                ('clave', models.CharField(help_text='Valor del header Idempotency-Key', max_length=255)),
+                ('hash_solicitud', models.CharField(help_text='SHA-256 del cuerpo de la solicitud', max_length=64)),
+                ('estado', models.CharField(choices=[('EN_PROCESO', 'En proceso'), ('COMPLETADA', 'Completada')], default='EN_PROCESO', max_length=20)),
+                ('codigo_respuesta', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('respuesta', models.JSONField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('expira_en', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Solicitud idempotente',
+                'verbose_name_plural': 'Solicitudes idempotentes',
+                'unique_together': {('alcance', 'clave')},
+            },
+        ),
+    ]
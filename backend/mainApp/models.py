@@ -507,3 +507,35 @@ class BloqueoMesa(models.Model):
             models.Index(fields=['categoria']),
         ]
 
+
+
+class SolicitudIdempotente(models.Model):
+    """
+    Respuesta guardada de un POST con header Idempotency-Key.
+    Un reintento con la misma clave y el mismo cuerpo recibe la respuesta
+    original sin volver a ejecutar la operación (ver mainApp.idempotencia).
+    """
+    ESTADO_CHOICES = (
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADA', 'Completada'),
+    )
+
+    alcance = models.CharField(
+        max_length=255,
+        help_text="Método, ruta y usuario de la solicitud"
+    )
+    clave = models.CharField(max_length=255, help_text="Valor del header Idempotency-Key")
+    hash_solicitud = models.CharField(max_length=64, help_text="SHA-256 del cuerpo de la solicitud")
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='EN_PROCESO')
+    codigo_respuesta = models.PositiveSmallIntegerField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    expira_en = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.alcance} [{self.clave}] - {self.estado}"
+
+    class Meta:
+        verbose_name = "Solicitud idempotente"
+        verbose_name_plural = "Solicitudes idempotentes"
+        unique_together = ['alcance', 'clave']
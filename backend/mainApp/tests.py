@@ -0,0 +1,204 @@
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from cocinaApp.models import Pedido
+from menuApp.models import CategoriaMenu, Ingrediente, Plato, Receta
+from . import idempotencia
+from .idempotencia import idempotente
+from .models import Mesa, Perfil, SolicitudIdempotente
+from .transacciones import LotePorTransaccion
+
+
+class LotePorTransaccionTests(TestCase):
+    def setUp(self):
+        self.publicados = []
+        self.lote = LotePorTransaccion(self.publicados.append)
+
+    def test_agrupa_la_transaccion_en_un_lote(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                self.lote.agregar(i)
+        self.assertEqual(self.publicados, [[0, 1, 2]])
+
+    def test_transaccion_revertida_no_contamina_la_siguiente(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.lote.agregar('revertido')
+                    raise ValueError
+            except ValueError:
+                pass
+            with transaction.atomic():
+                self.lote.agregar('confirmado')
+        self.assertEqual(self.publicados, [['confirmado']])
+
+    def test_savepoint_revertido_descarta_sus_registros(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lote.agregar('antes')
+            try:
+                with transaction.atomic():
+                    self.lote.agregar('revertido')
+                    raise ValueError
+            except ValueError:
+                pass
+            self.lote.agregar('despues')
+        self.assertEqual(self.publicados, [['antes', 'despues']])
+
+    def test_atomic_sin_savepoint_usa_el_mismo_lote(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lote.agregar(1)
+            with transaction.atomic(savepoint=False):
+                self.lote.agregar(2)
+        self.assertEqual(self.publicados, [[1, 2]])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class IdempotenciaTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.llamadas = 0
+        self.responder = lambda request: Response({'id': self.llamadas}, status=201)
+
+        @api_view(['POST'])
+        @permission_classes([AllowAny])
+        @idempotente
+        def vista(request):
+            self.llamadas += 1
+            return self.responder(request)
+
+        self.vista = vista
+
+    def post(self, datos, clave='clave-1'):
+        request = self.factory.post('/api/prueba/', datos, format='json', HTTP_IDEMPOTENCY_KEY=clave)
+        return self.vista(request)
+
+    def test_reintento_completado_repite_la_respuesta(self):
+        primera = self.post({'mesa': 1})
+        segunda = self.post({'mesa': 1})
+
+        self.assertEqual(self.llamadas, 1)
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda.data, primera.data)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertFalse(primera.has_header('Idempotent-Replayed'))
+
+    def test_no_guarda_el_token(self):
+        self.responder = lambda request: Response(
+            {'user_id': 1, 'token': 'secreto', 'reserva': {'id': 2}}, status=201
+        )
+        primera = self.post({'mesa': 1})
+        segunda = self.post({'mesa': 1})
+
+        self.assertEqual(primera.data['token'], 'secreto')
+        self.assertNotIn('secreto', str(SolicitudIdempotente.objects.get().respuesta))
+        self.assertEqual(segunda.data, {'user_id': 1, 'reserva': {'id': 2}})
+
+    def test_misma_clave_con_otro_cuerpo_es_422(self):
+        self.post({'mesa': 1})
+        response = self.post({'mesa': 2})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.llamadas, 1)
+
+    def test_duplicado_en_proceso_es_409(self):
+        duplicados = []
+
+        def responder(request):
+            # La primera solicitud aún no termina cuando llega el reintento
+            duplicados.append(self.post({'mesa': 1}))
+            return Response({'id': 1}, status=201)
+
+        self.responder = responder
+        self.post({'mesa': 1})
+
+        self.assertEqual(self.llamadas, 1)
+        self.assertEqual(duplicados[0].status_code, 409)
+        self.assertEqual(duplicados[0]['Retry-After'], '1')
+
+    def test_error_5xx_libera_la_clave(self):
+        self.responder = lambda request: Response({'error': 'no disponible'}, status=503)
+        self.assertEqual(self.post({'mesa': 1}).status_code, 503)
+        self.assertFalse(SolicitudIdempotente.objects.exists())
+
+        self.responder = lambda request: Response({'id': 2}, status=201)
+        self.assertEqual(self.post({'mesa': 1}).status_code, 201)
+        self.assertEqual(self.llamadas, 2)
+
+    def test_excepcion_libera_la_clave(self):
+        def responder(request):
+            raise RuntimeError('falla')
+
+        self.responder = responder
+        with self.assertRaises(RuntimeError):
+            self.post({'mesa': 1})
+        self.assertFalse(SolicitudIdempotente.objects.exists())
+
+        self.responder = lambda request: Response({'id': 2}, status=201)
+        self.assertEqual(self.post({'mesa': 1}).status_code, 201)
+        self.assertEqual(self.llamadas, 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class IdempotenciaConcurrenteTests(TransactionTestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('cajero1', 'cajero1@test.cl', 'clave-segura-123')
+        Perfil.objects.update_or_create(
+            user=self.usuario, defaults={'rol': 'cajero', 'nombre_completo': 'cajero1'}
+        )
+        self.usuario = User.objects.get(pk=self.usuario.pk)
+        self.mesa = Mesa.objects.create(numero=1, capacidad=4)
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.plato = Plato.objects.create(nombre='Lomo', precio=Decimal('9000'), categoria=categoria)
+        ingrediente = Ingrediente.objects.create(
+            nombre='Carne', unidad_medida='gr', cantidad_disponible=Decimal('1000'),
+            stock_minimo=Decimal('0'), precio_unitario=Decimal('10')
+        )
+        Receta.objects.create(plato=self.plato, ingrediente=ingrediente, cantidad_requerida=Decimal('200'))
+
+    def test_solicitudes_simultaneas_crean_un_solo_pedido(self):
+        hilos = 2
+        barrera = threading.Barrier(hilos)
+        escritura = threading.Lock()
+        reservar = idempotencia._reservar
+
+        def reservar_a_la_vez(*args):
+            # SQLite en memoria no admite dos escrituras simultáneas
+            # ("database table is locked"); la unicidad de la clave decide igual
+            with escritura:
+                resultado = reservar(*args)
+            # Ninguna solicitud continúa hasta que ambas intentaron reservar
+            barrera.wait(timeout=5)
+            return resultado
+
+        codigos = []
+        datos = {'mesa': self.mesa.pk, 'detalles': [{'plato': self.plato.pk, 'cantidad': 1}]}
+
+        def enviar():
+            client = APIClient()
+            client.force_authenticate(self.usuario)
+            try:
+                response = client.post(
+                    '/api/cocina/pedidos/', datos, format='json', HTTP_IDEMPOTENCY_KEY='pedido-1'
+                )
+                codigos.append(response.status_code)
+            finally:
+                connection.close()
+
+        with mock.patch.object(idempotencia, '_reservar', reservar_a_la_vez):
+            threads = [threading.Thread(target=enviar) for _ in range(hilos)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(codigos), [201, 409])
+        self.assertEqual(Pedido.objects.count(), 1)
@@ -0,0 +1,74 @@
+"""
+Trabajo diferido al confirmar la transacción, agrupado por transacción.
+
+LotePorTransaccion junta lo que se va registrando dentro de una misma
+transacción en un solo lote y lo entrega una vez al confirmar. Cada
+registro se agenda con transaction.on_commit; si su transacción (o el
+savepoint donde se hizo) se revierte, Django lo descarta y no llega al
+lote. El lote se entrega cuando se ejecuta el último registro que sigue
+pendiente. Fuera de una transacción cada registro se entrega de inmediato.
+"""
+import threading
+import weakref
+
+from django.db import transaction
+
+
+class _Lote:
+    """Datos de una transacción y sus registros aún no ejecutados"""
+
+    def __init__(self, datos):
+        self.datos = datos
+        # Débil: los registros que Django descarta en un rollback desaparecen solos
+        self.pendientes = weakref.WeakSet()
+
+
+class _Registro:
+    """Callback de on_commit de un registro; suma sus datos al lote al ejecutarse"""
+
+    def __init__(self, acumulador, lote, args):
+        self._acumulador = acumulador
+        self._lote = lote
+        self._args = args
+
+    def __call__(self):
+        lote = self._lote
+        if self not in lote.pendientes:
+            return
+        lote.pendientes.discard(self)
+        self._acumulador._acumular(lote.datos, *self._args)
+        if not lote.pendientes:
+            self._acumulador._publicar(lote.datos)
+
+
+class LotePorTransaccion:
+    """
+    Acumulador por transacción y por hilo.
+
+    Args:
+        publicar: Función que recibe los datos del lote al confirmar
+        crear: Fábrica de los datos de un lote nuevo (list por defecto)
+        acumular: Función (datos, *args) que agrega un registro al lote
+            (list.append por defecto); se llama al confirmar
+
+    Ejemplo:
+        _notificaciones = LotePorTransaccion(publicar_notificaciones)
+        _notificaciones.agregar(evento)
+    """
+
+    def __init__(self, publicar, crear=list, acumular=list.append):
+        self._publicar = publicar
+        self._crear = crear
+        self._acumular = acumular
+        self._local = threading.local()
+
+    def agregar(self, *args):
+        # Un lote con registros pendientes pertenece a la transacción en
+        # curso: los de transacciones anteriores ya se ejecutaron o se descartaron
+        lote = getattr(self._local, 'lote', None)
+        if lote is None or not lote.pendientes:
+            lote = self._local.lote = _Lote(self._crear())
+
+        registro = _Registro(self, lote, args)
+        lote.pendientes.add(registro)
+        transaction.on_commit(registro, robust=True)
@@ -23,6 +23,7 @@ from .serializers import (
     BloqueoMesaSerializer,
     BloqueoMesaListSerializer
 )
+from .idempotencia import idempotente
 from .permissions import (
     IsAdministrador,
     IsCajero,
@@ -86,6 +87,7 @@ def register_user(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 @throttle_classes([RegisterRateThrottle])
+@idempotente
 def register_and_reserve(request):
     """
     Endpoint combinado: registrar usuario y crear reserva en una sola transacción.
@@ -106,6 +108,8 @@ def register_and_reserve(request):
         confirm_existing: boolean
     }
     Rate limit: 5 intentos por hora
+    Header opcional Idempotency-Key: un reintento con la misma clave recibe la
+    respuesta original sin crear otra reserva.
 
     FIX #231: Si el email existe y no se proporciona confirm_existing=true,
     retorna requires_confirmation=true para que el frontend pida confirmación.
@@ -0,0 +1,91 @@
+"""
+Alertas de stock en tiempo real (grupo WebSocket 'stock').
+
+Cada movimiento de stock se registra con la cantidad anterior y la nueva
+del ingrediente; solo si cruza stock_minimo (en cualquier sentido) se
+publica una alerta. El cruce se calcula con esos dos valores, sin volver a
+consultar los ingredientes. Las alertas de una transacción se publican
+juntas al confirmar, una por ingrediente con su estado final.
+"""
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from mainApp.transacciones import LotePorTransaccion
+
+logger = logging.getLogger(__name__)
+
+GRUPO_STOCK = 'stock'
+
+
+def _acumular(movimientos, ingrediente, cantidad_anterior, minimo_anterior):
+    """Agrega un movimiento al lote; conserva la primera cantidad anterior del ingrediente"""
+    previo = movimientos.get(ingrediente.pk)
+    movimientos[ingrediente.pk] = {
+        'ingrediente': ingrediente.pk,
+        'nombre': ingrediente.nombre,
+        'unidad_medida': ingrediente.unidad_medida,
+        'cantidad_anterior': previo['cantidad_anterior'] if previo else cantidad_anterior,
+        'minimo_anterior': previo['minimo_anterior'] if previo else minimo_anterior,
+        'cantidad_disponible': ingrediente.cantidad_disponible,
+        'stock_minimo': ingrediente.stock_minimo,
+    }
+
+
+# ingrediente_id -> movimiento, un lote por transacción
+_movimientos = LotePorTransaccion(
+    lambda movimientos: publicar_alertas(movimientos.values()), crear=dict, acumular=_acumular
+)
+
+
+def registrar_movimiento(ingrediente, cantidad_anterior, minimo_anterior=None):
+    """
+    Registra un movimiento de stock para alertar si cruza el mínimo.
+
+    Args:
+        ingrediente: Ingrediente con cantidad_disponible y stock_minimo ya actualizados
+        cantidad_anterior: Cantidad antes del movimiento
+        minimo_anterior: stock_minimo antes del cambio (si también cambió)
+    """
+    if minimo_anterior is None:
+        minimo_anterior = ingrediente.stock_minimo
+    _movimientos.agregar(ingrediente, cantidad_anterior, minimo_anterior)
+
+
+def publicar_alertas(movimientos):
+    """Publica en el grupo 'stock' los movimientos que cruzaron el mínimo"""
+    alertas = []
+    for movimiento in movimientos:
+        bajo_antes = movimiento['cantidad_anterior'] < movimiento['minimo_anterior']
+        bajo_ahora = movimiento['cantidad_disponible'] < movimiento['stock_minimo']
+        if bajo_antes == bajo_ahora:
+            continue
+        alertas.append({
+            'event': 'bajo_minimo' if bajo_ahora else 'repuesto',
+            'ingrediente': movimiento['ingrediente'],
+            'nombre': movimiento['nombre'],
+            'unidad_medida': movimiento['unidad_medida'],
+            'cantidad_disponible': movimiento['cantidad_disponible'],
+            'stock_minimo': movimiento['stock_minimo'],
+            'timestamp': timezone.now(),
+        })
+
+    if not alertas:
+        return
+
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return
+
+    try:
+        async_to_sync(channel_layer.group_send)(GRUPO_STOCK, {
+            'type': 'stock_alertas',
+            # Tipos JSON nativos: el channel layer no acepta Decimal
+            'alertas': json.loads(json.dumps(alertas, cls=JSONEncoder)),
+        })
+    except Exception:
+        logger.exception("Error publicando alertas de stock")
@@ -0,0 +1,209 @@
+"""
+Búsqueda de platos para la toma de pedidos.
+
+Índice invertido en memoria (por proceso) sobre nombre, categoría y
+descripción de los platos activos:
+
+- Los términos se normalizan sin tildes ni mayúsculas ("Céviche" -> "ceviche").
+- Los términos del índice se guardan ordenados; cada palabra de la consulta
+  se resuelve como prefijo con bisect (log n + coincidencias).
+- Todas las palabras de la consulta deben coincidir; el puntaje suma el
+  mejor campo de cada una (primera palabra del nombre > resto del nombre >
+  categoría > descripción), con bono si la palabra es completa. A igual
+  puntaje, orden alfabético.
+
+El índice se reconstruye cuando cambia VersionMenu (platos, categorías,
+recetas o disponibilidad). El stock no versiona el menú, así que las
+porciones restantes se calculan al buscar con las recetas del índice y una
+consulta al stock de los ingredientes involucrados.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from .cache import obtener_version
+from .models import Ingrediente, Plato, Receta
+
+PESOS = {'inicio_nombre': 4, 'nombre': 3, 'categoria': 2, 'descripcion': 1}
+BONO_TERMINO_COMPLETO = 1
+LIMITE_DEFAULT = 20
+LIMITE_MAXIMO = 100
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes ("Piña" -> "pina", como suele teclearse)"""
+    texto = unicodedata.normalize('NFD', (texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    return _TOKEN.findall(normalizar(texto))
+
+
+class IndiceMenu:
+    """Índice de una versión del menú; inmutable una vez construido"""
+
+    def __init__(self, version):
+        self.version = version
+        self.platos = {}
+        self.recetas = defaultdict(list)
+        # término -> {plato_id: peso del mejor campo}
+        postings = defaultdict(dict)
+
+        for (plato_id, nombre, descripcion, precio, disponible, tiempo_preparacion,
+             categoria_id, categoria_nombre) in Plato.objects.filter(activo=True).values_list(
+            'id', 'nombre', 'descripcion', 'precio', 'disponible', 'tiempo_preparacion',
+            'categoria_id', 'categoria__nombre'
+        ):
+            self.platos[plato_id] = {
+                'id': plato_id,
+                'nombre': nombre,
+                'precio': precio,
+                'categoria': categoria_id,
+                'categoria_nombre': categoria_nombre,
+                'disponible': disponible,
+                'tiempo_preparacion': tiempo_preparacion,
+                'nombre_normalizado': normalizar(nombre),
+            }
+            terminos_nombre = tokenizar(nombre)
+            for campo, terminos in (
+                ('descripcion', tokenizar(descripcion)),
+                ('categoria', tokenizar(categoria_nombre)),
+                ('nombre', terminos_nombre[1:]),
+                ('inicio_nombre', terminos_nombre[:1]),
+            ):
+                for termino in terminos:
+                    if postings[termino].get(plato_id, 0) < PESOS[campo]:
+                        postings[termino][plato_id] = PESOS[campo]
+
+        for plato_id, ingrediente_id, cantidad in Receta.objects.filter(
+            plato_id__in=self.platos
+        ).values_list('plato_id', 'ingrediente_id', 'cantidad_requerida'):
+            self.recetas[plato_id].append((ingrediente_id, cantidad))
+
+        self.terminos = sorted(postings)
+        self.postings = [postings[termino] for termino in self.terminos]
+        # Posición alfabética de cada plato, para desempatar sin comparar textos
+        self.por_orden = sorted(self.platos, key=lambda plato_id: self.platos[plato_id]['nombre_normalizado'])
+        self.orden = {plato_id: i for i, plato_id in enumerate(self.por_orden)}
+
+    def _coincidencias(self, prefijo):
+        """{plato_id: puntaje} de los términos que empiezan con 'prefijo'"""
+        resultado = {}
+        i = bisect_left(self.terminos, prefijo)
+        while i < len(self.terminos) and self.terminos[i].startswith(prefijo):
+            completo = BONO_TERMINO_COMPLETO if self.terminos[i] == prefijo else 0
+            for plato_id, peso in self.postings[i].items():
+                puntaje = peso + completo
+                if resultado.get(plato_id, 0) < puntaje:
+                    resultado[plato_id] = puntaje
+            i += 1
+        return resultado
+
+    def buscar(self, consulta, limite=LIMITE_DEFAULT, categoria=None, disponible=None):
+        """
+        Returns:
+            Lista de (plato_id, puntaje) ordenada por relevancia
+        """
+        palabras = tokenizar(consulta)
+        if not palabras:
+            return []
+
+        puntajes = None
+        # Primero la palabra más larga: suele ser la más selectiva
+        for palabra in sorted(set(palabras), key=len, reverse=True):
+            coincidencias = self._coincidencias(palabra)
+            if puntajes is None:
+                puntajes = coincidencias
+            else:
+                puntajes = {
+                    plato_id: puntaje + coincidencias[plato_id]
+                    for plato_id, puntaje in puntajes.items()
+                    if plato_id in coincidencias
+                }
+            if not puntajes:
+                return []
+
+        # Clave entera: mayor puntaje primero y, a igual puntaje, orden alfabético
+        base = len(self.orden)
+        orden = self.orden
+        platos = self.platos
+        claves = [
+            orden[plato_id] - puntaje * base
+            for plato_id, puntaje in puntajes.items()
+            if (categoria is None or platos[plato_id]['categoria'] == categoria)
+            and (disponible is None or platos[plato_id]['disponible'] == disponible)
+        ]
+        return [
+            (self.por_orden[clave % base], -(clave // base))
+            for clave in heapq.nsmallest(limite, claves)
+        ]
+
+    def porciones(self, plato_ids):
+        """{plato_id: porciones que alcanzan con el stock actual (None si no tiene receta)}"""
+        ingrediente_ids = {
+            ingrediente_id
+            for plato_id in plato_ids
+            for ingrediente_id, _ in self.recetas.get(plato_id, ())
+        }
+        stock = dict(
+            Ingrediente.objects.filter(pk__in=ingrediente_ids).values_list('id', 'cantidad_disponible')
+        ) if ingrediente_ids else {}
+
+        resultado = {}
+        for plato_id in plato_ids:
+            porciones = None
+            for ingrediente_id, cantidad in self.recetas.get(plato_id, ()):
+                if cantidad <= 0:
+                    continue
+                alcanza = max(0, int(stock.get(ingrediente_id, 0) // cantidad))
+                if porciones is None or alcanza < porciones:
+                    porciones = alcanza
+            resultado[plato_id] = porciones
+        return resultado
+
+
+_indice = None
+_lock = threading.Lock()
+
+
+def obtener_indice():
+    """Índice de la versión actual del menú; se reconstruye una vez por cambio de versión"""
+    global _indice
+    version = obtener_version()
+    indice = _indice
+    if indice is not None and indice.version == version:
+        return indice
+    with _lock:
+        if _indice is None or _indice.version != version:
+            _indice = IndiceMenu(version)
+        return _indice
+
+
+def buscar_platos(consulta, limite=LIMITE_DEFAULT, categoria=None, disponible=None):
+    """Platos que coinciden con 'consulta', con porciones restantes, ordenados por relevancia"""
+    indice = obtener_indice()
+    limite = min(max(1, limite), LIMITE_MAXIMO)
+    encontrados = indice.buscar(consulta, limite, categoria, disponible)
+    porciones = indice.porciones([plato_id for plato_id, _ in encontrados])
+
+    resultados = []
+    for plato_id, puntaje in encontrados:
+        plato = indice.platos[plato_id]
+        resultados.append({
+            'id': plato_id,
+            'nombre': plato['nombre'],
+            'precio': plato['precio'],
+            'categoria': plato['categoria'],
+            'categoria_nombre': plato['categoria_nombre'],
+            'tiempo_preparacion': plato['tiempo_preparacion'],
+            'disponible': plato['disponible'],
+            'porciones_restantes': porciones[plato_id],
+            'relevancia': puntaje,
+        })
+    return resultados
@@ -0,0 +1,104 @@
+"""
+Caché del menú público con ETag por versión.
+
+VersionMenu se incrementa (al confirmar la transacción) cada vez que cambia
+una categoría, un plato, una receta o la disponibilidad de un plato. Los
+listados decorados con @menu_cacheado:
+
+- responden 304 sin tocar la BD si el If-None-Match coincide con la versión
+- sirven la respuesta cacheada de la versión actual, o la generan una vez
+
+La versión se lee de la BD a lo sumo cada MENU_VERSION_TTL segundos por
+proceso; el proceso que hace el cambio la actualiza de inmediato.
+"""
+import hashlib
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import VersionMenu
+
+CLAVE_VERSION = 'menu:version'
+
+
+def obtener_version():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        version = VersionMenu.actual()
+        cache.set(CLAVE_VERSION, version, getattr(settings, 'MENU_VERSION_TTL', 5))
+    return version
+
+
+def _incrementar():
+    cache.set(CLAVE_VERSION, VersionMenu.incrementar(), getattr(settings, 'MENU_VERSION_TTL', 5))
+
+
+class _Incremento:
+    """Incremento de versión compartido por los cambios de una transacción"""
+
+    def __init__(self):
+        self.aplicado = False
+
+    def __call__(self):
+        # El primer callback que sobrevive al commit incrementa; el resto no hace nada
+        if not self.aplicado:
+            self.aplicado = True
+            _incrementar()
+
+
+_local = threading.local()
+
+
+def invalidar_menu():
+    """
+    Marca el menú como modificado cuando la transacción actual confirme.
+    Varios cambios en una misma transacción incrementan la versión una vez.
+
+    Cada llamada registra su propio callback (un savepoint revertido
+    descarta solo los suyos); todos comparten el mismo _Incremento hasta que
+    uno se ejecuta.
+    """
+    incremento = getattr(_local, 'incremento', None)
+    if incremento is None or incremento.aplicado:
+        incremento = _local.incremento = _Incremento()
+    transaction.on_commit(incremento)
+
+
+def _etag(request, version):
+    # La respuesta depende de la URL completa (filtros, página y host de las imágenes)
+    huella = hashlib.sha1(request.build_absolute_uri().encode('utf-8')).hexdigest()[:16]
+    return f'"menu-{version}-{huella}"'
+
+
+def menu_cacheado(vista):
+    """
+    Decorador para acciones de listado de ViewSets del menú: cachea la
+    respuesta por versión del menú y responde a If-None-Match.
+    """
+    @wraps(vista)
+    def wrapper(self, request, *args, **kwargs):
+        version = obtener_version()
+        etag = _etag(request, version)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [valor.strip() for valor in if_none_match.split(',')]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        clave = f'menu:respuesta:{etag.strip(chr(34))}'
+        data = cache.get(clave)
+        if data is None:
+            response = vista(self, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(clave, data, getattr(settings, 'MENU_CACHE_TTL', 3600))
+
+        return Response(data, headers=headers)
+
+    return wrapper
@@ -0,0 +1,60 @@
+"""
+WebSocket consumer para alertas de stock (solo administradores)
+"""
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.contrib.auth.models import AnonymousUser
+
+from .alertas_stock import GRUPO_STOCK
+
+
+@database_sync_to_async
+def _es_administrador(user):
+    try:
+        return user.perfil.rol == 'admin'
+    except AttributeError:
+        return False
+
+
+class StockConsumer(AsyncWebsocketConsumer):
+    """
+    Consumer del grupo 'stock'. Envía
+    {"type": "stock_alertas", "alertas": [{"event": "bajo_minimo" | "repuesto", ...}]}
+    cuando un movimiento hace que un ingrediente cruce su stock mínimo.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if not user or isinstance(user, AnonymousUser):
+            await self.close(code=4001)
+            return
+        if not await _es_administrador(user):
+            await self.close(code=4003)
+            return
+
+        await self.channel_layer.group_add(GRUPO_STOCK, self.channel_name)
+        await self.accept()
+        await self.send(text_data=json.dumps({
+            'type': 'connection_established',
+            'groups': [GRUPO_STOCK],
+            'message': 'Conectado a alertas de stock'
+        }))
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(GRUPO_STOCK, self.channel_name)
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            return
+        if isinstance(data, dict) and data.get('type') == 'ping':
+            await self.send(text_data=json.dumps({'type': 'pong'}))
+
+    async def stock_alertas(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'stock_alertas',
+            'alertas': event['alertas'],
+        }))
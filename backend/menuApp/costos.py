@@ -0,0 +1,85 @@
+"""
+Costo por porción y margen de los platos a partir de la matriz de recetas.
+
+El costo de una línea de receta es cantidad_requerida (en la unidad de
+medida del ingrediente) convertida a la unidad de precio del ingrediente
+por precio_unitario: un ingrediente que se controla en gr pero se compra
+por kg se registra con unidad_precio='kg'.
+
+Todo el menú se calcula en una pasada (dos consultas) y queda cacheado por
+versión del menú; cambiar un precio de ingrediente, una receta o un plato
+incrementa la versión.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import obtener_version
+from .models import Plato, Receta
+
+# (unidad de la receta, unidad del precio) -> factor
+FACTORES = {
+    ('gr', 'kg'): Decimal('0.001'),
+    ('kg', 'gr'): Decimal('1000'),
+    ('ml', 'lt'): Decimal('0.001'),
+    ('lt', 'ml'): Decimal('1000'),
+}
+
+CENTAVOS = Decimal('0.01')
+
+
+def factor_conversion(unidad_medida, unidad_precio):
+    """Factor para llevar una cantidad a la unidad del precio (None si no son compatibles)"""
+    if not unidad_precio or unidad_precio == unidad_medida:
+        return Decimal('1')
+    return FACTORES.get((unidad_medida, unidad_precio))
+
+
+def calcular_costos():
+    """
+    Calcula el costo de todos los platos.
+
+    Returns:
+        dict {plato_id: {costo, margen, margen_porcentaje, food_cost_porcentaje, completo}}
+        'completo' es False si algún ingrediente no tiene precio o su unidad
+        de precio no es convertible.
+    """
+    costos = defaultdict(Decimal)
+    incompletos = set()
+    for plato_id, cantidad, unidad_medida, unidad_precio, precio in Receta.objects.values_list(
+        'plato_id',
+        'cantidad_requerida',
+        'ingrediente__unidad_medida',
+        'ingrediente__unidad_precio',
+        'ingrediente__precio_unitario',
+    ):
+        factor = factor_conversion(unidad_medida, unidad_precio)
+        if factor is None or not precio:
+            incompletos.add(plato_id)
+            continue
+        costos[plato_id] += cantidad * factor * precio
+
+    resultado = {}
+    for plato_id, precio_venta in Plato.objects.values_list('id', 'precio'):
+        costo = costos[plato_id].quantize(CENTAVOS)
+        margen = precio_venta - costo
+        resultado[plato_id] = {
+            'costo': costo,
+            'margen': margen,
+            'margen_porcentaje': (margen * 100 / precio_venta).quantize(CENTAVOS) if precio_venta else None,
+            'food_cost_porcentaje': (costo * 100 / precio_venta).quantize(CENTAVOS) if precio_venta else None,
+            'completo': plato_id not in incompletos,
+        }
+    return resultado
+
+
+def obtener_costos():
+    """Costos de todos los platos para la versión actual del menú (cacheados)"""
+    clave = f'menu:costos:{obtener_version()}'
+    costos = cache.get(clave)
+    if costos is None:
+        costos = calcular_costos()
+        cache.set(clave, costos, getattr(settings, 'MENU_CACHE_TTL', 3600))
+    return costos
@@ -0,0 +1,129 @@
+"""
+Derivados de Plato.imagen en tamaños fijos (thumb, card, full), cada uno
+en WebP y JPEG, generados con Pillow al subir la imagen o con el comando
+generar_imagenes_platos.
+
+Los metadatos quedan en Plato.imagenes:
+
+    {
+        'origen': 'platos/lomo.jpg',
+        'thumb': {'ancho': 120, 'alto': 120, 'webp': 'platos/derivados/...', 'jpeg': '...'},
+        ...
+    }
+
+'origen' permite detectar que la imagen cambió y los derivados están obsoletos.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# nombre -> (ancho, alto, recortar). Con recorte el derivado tiene exactamente
+# ese tamaño; sin recorte se ajusta dentro del recuadro manteniendo proporción.
+TAMANOS = {
+    'thumb': (120, 120, True),
+    'card': (480, 320, True),
+    'full': (1200, 800, False),
+}
+
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+DIRECTORIO = 'platos/derivados'
+
+
+def derivados_vigentes(plato):
+    """True si Plato.imagenes corresponde a la imagen actual"""
+    if not plato.imagen:
+        return not plato.imagenes
+    return bool(plato.imagenes) and plato.imagenes.get('origen') == plato.imagen.name
+
+
+def borrar_derivados(imagenes):
+    for nombre in TAMANOS:
+        for formato in FORMATOS:
+            ruta = (imagenes or {}).get(nombre, {}).get(formato)
+            if ruta and default_storage.exists(ruta):
+                default_storage.delete(ruta)
+
+
+def generar_derivados(plato):
+    """
+    Genera los derivados de la imagen del plato y retorna los metadatos
+    (dict vacío si el plato no tiene imagen). Borra los derivados anteriores.
+    No guarda el plato.
+    """
+    anteriores = plato.imagenes
+    if not plato.imagen:
+        borrar_derivados(anteriores)
+        return {}
+
+    with plato.imagen.open('rb') as archivo:
+        original = Image.open(archivo)
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'L'):
+            # Aplanar transparencia sobre blanco (JPEG no la soporta)
+            fondo = Image.new('RGB', original.size, (255, 255, 255))
+            fondo.paste(original, mask=original.convert('RGBA').split()[-1])
+            original = fondo
+        else:
+            original = original.convert('RGB')
+
+    base = os.path.splitext(os.path.basename(plato.imagen.name))[0]
+    imagenes = {'origen': plato.imagen.name}
+    for nombre, (ancho, alto, recortar) in TAMANOS.items():
+        if recortar:
+            derivado = ImageOps.fit(original, (ancho, alto), Image.Resampling.LANCZOS)
+        else:
+            derivado = original.copy()
+            derivado.thumbnail((ancho, alto), Image.Resampling.LANCZOS)
+
+        imagenes[nombre] = {'ancho': derivado.width, 'alto': derivado.height}
+        for formato, (formato_pil, opciones) in FORMATOS.items():
+            buffer = BytesIO()
+            derivado.save(buffer, formato_pil, **opciones)
+            extension = 'jpg' if formato == 'jpeg' else formato
+            imagenes[nombre][formato] = default_storage.save(
+                f'{DIRECTORIO}/{plato.pk}/{base}-{nombre}.{extension}',
+                ContentFile(buffer.getvalue())
+            )
+
+    borrar_derivados(anteriores)
+    return imagenes
+
+
+def actualizar_derivados(plato, forzar=False):
+    """
+    Regenera los derivados si están obsoletos y los persiste con update()
+    (sin volver a disparar post_save). Retorna True si hubo cambios.
+    """
+    from .cache import invalidar_menu
+
+    if not forzar and derivados_vigentes(plato):
+        return False
+
+    plato.imagenes = generar_derivados(plato)
+    type(plato).objects.filter(pk=plato.pk).update(imagenes=plato.imagenes)
+    invalidar_menu()
+    return True
+
+
+def urls_derivados(imagenes, request=None):
+    """Metadatos de Plato.imagenes con URLs (absolutas si hay request) en vez de rutas"""
+    resultado = {}
+    for nombre in TAMANOS:
+        datos = (imagenes or {}).get(nombre)
+        if not datos:
+            continue
+        resultado[nombre] = {'ancho': datos['ancho'], 'alto': datos['alto']}
+        for formato in FORMATOS:
+            url = default_storage.url(datos[formato])
+            resultado[nombre][formato] = request.build_absolute_uri(url) if request else url
+    return resultado or None
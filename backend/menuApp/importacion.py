@@ -0,0 +1,296 @@
+"""
+Importación y exportación masiva del menú (categorías, platos y recetas).
+
+El formato usa nombres en vez de ids, así un menú exportado de una
+instalación se puede importar en otra:
+
+    {
+        "categorias": [{"nombre", "descripcion", "activa", "orden"}],
+        "platos": [{"nombre", "categoria", "descripcion", "precio",
+                    "tiempo_preparacion", "activo",
+                    "recetas": [{"ingrediente", "cantidad_requerida"}]}]
+    }
+
+En CSV cada fila es una línea de receta (un plato sin receta ocupa una fila
+con el ingrediente vacío); las categorías se deducen de los platos.
+
+La importación compara el menú recibido con el actual y aplica la
+diferencia en una transacción: bulk_create/bulk_update de categorías,
+platos y recetas; los platos (y las categorías, si vienen) que no están en
+el archivo se desactivan. La versión del menú cambia una vez y la
+disponibilidad se recalcula una vez para los platos tocados.
+"""
+import csv
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .cache import invalidar_menu
+from .models import CategoriaMenu, Ingrediente, Plato, Receta
+from .services import InventarioService
+
+CAMPOS_CATEGORIA = ('descripcion', 'activa', 'orden')
+CAMPOS_PLATO = ('descripcion', 'precio', 'tiempo_preparacion', 'activo')
+
+COLUMNAS_CSV = [
+    'categoria', 'plato', 'descripcion', 'precio', 'tiempo_preparacion', 'activo',
+    'ingrediente', 'cantidad_requerida',
+]
+
+
+def exportar_menu():
+    """Menú completo (activo e inactivo) en el formato de importación"""
+    recetas = defaultdict(list)
+    for plato_id, ingrediente, cantidad in Receta.objects.values_list(
+        'plato_id', 'ingrediente__nombre', 'cantidad_requerida'
+    ).order_by('plato_id', 'ingrediente__nombre'):
+        recetas[plato_id].append({'ingrediente': ingrediente, 'cantidad_requerida': cantidad})
+
+    return {
+        'categorias': [
+            {'nombre': nombre, 'descripcion': descripcion, 'activa': activa, 'orden': orden}
+            for nombre, descripcion, activa, orden in CategoriaMenu.objects.values_list(
+                'nombre', 'descripcion', 'activa', 'orden'
+            )
+        ],
+        'platos': [
+            {
+                'nombre': nombre,
+                'categoria': categoria,
+                'descripcion': descripcion,
+                'precio': precio,
+                'tiempo_preparacion': tiempo_preparacion,
+                'activo': activo,
+                'recetas': recetas.get(plato_id, []),
+            }
+            for plato_id, nombre, categoria, descripcion, precio, tiempo_preparacion, activo
+            in Plato.objects.values_list(
+                'id', 'nombre', 'categoria__nombre', 'descripcion', 'precio',
+                'tiempo_preparacion', 'activo'
+            )
+        ],
+    }
+
+
+def escribir_csv(menu, destino):
+    """Escribe los platos de 'menu' en CSV, una fila por línea de receta"""
+    writer = csv.writer(destino)
+    writer.writerow(COLUMNAS_CSV)
+    for plato in menu['platos']:
+        base = [
+            plato['categoria'], plato['nombre'], plato['descripcion'], plato['precio'],
+            plato['tiempo_preparacion'], 'true' if plato['activo'] else 'false',
+        ]
+        for receta in plato['recetas'] or [{'ingrediente': '', 'cantidad_requerida': ''}]:
+            writer.writerow(base + [receta['ingrediente'], receta['cantidad_requerida']])
+
+
+def leer_csv(texto):
+    """
+    Convierte un CSV de escribir_csv al formato de importación (sin validar).
+    Los datos del plato se toman de su primera fila.
+    """
+    platos = {}
+    for fila in csv.DictReader(texto.splitlines()):
+        nombre = (fila.get('plato') or '').strip()
+        if not nombre:
+            continue
+        if nombre not in platos:
+            platos[nombre] = {
+                'nombre': nombre,
+                'categoria': (fila.get('categoria') or '').strip(),
+                'descripcion': fila.get('descripcion') or '',
+                'precio': fila.get('precio'),
+                'tiempo_preparacion': fila.get('tiempo_preparacion') or 15,
+                'activo': fila.get('activo') or 'true',
+                'recetas': [],
+            }
+        ingrediente = (fila.get('ingrediente') or '').strip()
+        if ingrediente:
+            platos[nombre]['recetas'].append({
+                'ingrediente': ingrediente,
+                'cantidad_requerida': fila.get('cantidad_requerida'),
+            })
+    return {'platos': list(platos.values())}
+
+
+def _por_nombre(queryset, tipo):
+    """{nombre: instancia}; falla si hay nombres repetidos (no se sabría cuál actualizar)"""
+    resultado = {}
+    repetidos = set()
+    for instancia in queryset:
+        if instancia.nombre in resultado:
+            repetidos.add(instancia.nombre)
+        resultado[instancia.nombre] = instancia
+    if repetidos:
+        raise ValidationError(
+            f"Hay {tipo} con el mismo nombre en el menú actual: {', '.join(sorted(repetidos))}"
+        )
+    return resultado
+
+
+def _aplicar_campos(instancia, datos, campos):
+    """Copia los campos distintos; True si cambió alguno"""
+    cambio = False
+    for campo in campos:
+        if getattr(instancia, campo) != datos[campo]:
+            setattr(instancia, campo, datos[campo])
+            cambio = True
+    return cambio
+
+
+@transaction.atomic
+def importar_menu(menu, simular=False):
+    """
+    Aplica un menú validado con MenuImportacionSerializer.
+
+    Args:
+        menu: validated_data ({'categorias'?: [...], 'platos': [...]})
+        simular: Si es True calcula la diferencia y no guarda nada
+
+    Returns:
+        dict con los nombres creados/actualizados/desactivados y el conteo de recetas
+
+    Raises:
+        ValidationError si una categoría o un ingrediente no existe o un nombre es ambiguo
+    """
+    categorias = _por_nombre(CategoriaMenu.objects.select_for_update(), 'categorias')
+    platos = _por_nombre(Plato.objects.select_for_update(), 'platos')
+
+    nombres_ingredientes = {
+        receta['ingrediente'] for plato in menu['platos'] for receta in plato['recetas']
+    }
+    ingredientes = {}
+    for ingrediente_id, nombre in Ingrediente.objects.filter(
+        nombre__in=nombres_ingredientes
+    ).values_list('id', 'nombre'):
+        if nombre in ingredientes:
+            raise ValidationError(f"Hay ingredientes con el mismo nombre: {nombre}")
+        ingredientes[nombre] = ingrediente_id
+    faltantes = nombres_ingredientes - set(ingredientes)
+    if faltantes:
+        raise ValidationError(f"Ingredientes inexistentes: {', '.join(sorted(faltantes))}")
+
+    resumen = {
+        'simulacion': simular,
+        'categorias': {'creadas': [], 'actualizadas': [], 'desactivadas': []},
+        'platos': {'creados': [], 'actualizados': [], 'desactivados': []},
+        'recetas': {'creadas': 0, 'actualizadas': 0, 'eliminadas': 0},
+        'platos_actualizados': [],
+    }
+
+    # Categorías: las declaradas, más las referenciadas por platos que no existen
+    declaradas = {categoria['nombre']: categoria for categoria in menu.get('categorias', [])}
+    for plato in menu['platos']:
+        if plato['categoria'] not in declaradas and plato['categoria'] not in categorias:
+            declaradas[plato['categoria']] = {
+                'nombre': plato['categoria'], 'descripcion': '', 'activa': True, 'orden': 0
+            }
+
+    categorias_nuevas, categorias_cambiadas = [], []
+    for nombre, datos in declaradas.items():
+        categoria = categorias.get(nombre)
+        if categoria is None:
+            categoria = CategoriaMenu(nombre=nombre, **{campo: datos[campo] for campo in CAMPOS_CATEGORIA})
+            categorias[nombre] = categoria
+            categorias_nuevas.append(categoria)
+        elif _aplicar_campos(categoria, datos, CAMPOS_CATEGORIA):
+            categorias_cambiadas.append(categoria)
+    if 'categorias' in menu:
+        referenciadas = {plato['categoria'] for plato in menu['platos']}
+        for nombre, categoria in categorias.items():
+            if nombre not in declaradas and nombre not in referenciadas and categoria.activa:
+                categoria.activa = False
+                categorias_cambiadas.append(categoria)
+                resumen['categorias']['desactivadas'].append(nombre)
+    resumen['categorias']['creadas'] = [c.nombre for c in categorias_nuevas]
+    resumen['categorias']['actualizadas'] = [
+        c.nombre for c in categorias_cambiadas if c.nombre not in resumen['categorias']['desactivadas']
+    ]
+
+    # Platos
+    platos_nuevos, platos_cambiados = [], []
+    importados = set()
+    for datos in menu['platos']:
+        importados.add(datos['nombre'])
+        plato = platos.get(datos['nombre'])
+        if plato is None:
+            plato = Plato(
+                nombre=datos['nombre'],
+                categoria=categorias[datos['categoria']],
+                **{campo: datos[campo] for campo in CAMPOS_PLATO}
+            )
+            platos[datos['nombre']] = plato
+            platos_nuevos.append(plato)
+            continue
+        cambio = _aplicar_campos(plato, datos, CAMPOS_PLATO)
+        if plato.categoria_id != getattr(categorias[datos['categoria']], 'pk', None):
+            plato.categoria = categorias[datos['categoria']]
+            cambio = True
+        if cambio:
+            platos_cambiados.append(plato)
+    desactivados = []
+    for nombre, plato in platos.items():
+        if nombre not in importados and plato.activo:
+            plato.activo = False
+            desactivados.append(plato)
+    resumen['platos']['creados'] = [p.nombre for p in platos_nuevos]
+    resumen['platos']['actualizados'] = [p.nombre for p in platos_cambiados]
+    resumen['platos']['desactivados'] = [p.nombre for p in desactivados]
+
+    # Recetas: diferencia por (plato, ingrediente) de los platos importados que ya existen
+    actuales = defaultdict(dict)
+    for receta in Receta.objects.filter(plato__in=[p for p in platos.values() if p.pk]).select_for_update():
+        actuales[receta.plato_id][receta.ingrediente_id] = receta
+
+    recetas_nuevas, recetas_cambiadas, recetas_eliminadas = [], [], []
+    platos_con_eliminadas = set()
+    for datos in menu['platos']:
+        plato = platos[datos['nombre']]
+        existentes = actuales.get(plato.pk, {}) if plato.pk else {}
+        deseadas = {
+            ingredientes[receta['ingrediente']]: receta['cantidad_requerida']
+            for receta in datos['recetas']
+        }
+        for ingrediente_id, cantidad in deseadas.items():
+            receta = existentes.get(ingrediente_id)
+            if receta is None:
+                recetas_nuevas.append(
+                    Receta(plato=plato, ingrediente_id=ingrediente_id, cantidad_requerida=cantidad)
+                )
+            elif receta.cantidad_requerida != cantidad:
+                receta.cantidad_requerida = cantidad
+                recetas_cambiadas.append(receta)
+        for ingrediente_id, receta in existentes.items():
+            if ingrediente_id not in deseadas:
+                recetas_eliminadas.append(receta.pk)
+                platos_con_eliminadas.add(plato.pk)
+    resumen['recetas'] = {
+        'creadas': len(recetas_nuevas),
+        'actualizadas': len(recetas_cambiadas),
+        'eliminadas': len(recetas_eliminadas),
+    }
+
+    hay_cambios = any((
+        categorias_nuevas, categorias_cambiadas, platos_nuevos, platos_cambiados,
+        desactivados, recetas_nuevas, recetas_cambiadas, recetas_eliminadas
+    ))
+    if simular or not hay_cambios:
+        return resumen
+
+    CategoriaMenu.objects.bulk_create(categorias_nuevas)
+    CategoriaMenu.objects.bulk_update(categorias_cambiadas, CAMPOS_CATEGORIA)
+    # bulk_create toma el pk de las categorías y platos recién creados
+    Plato.objects.bulk_create(platos_nuevos)
+    Plato.objects.bulk_update(platos_cambiados + desactivados, CAMPOS_PLATO + ('categoria',))
+    Receta.objects.filter(pk__in=recetas_eliminadas).delete()
+    Receta.objects.bulk_create(recetas_nuevas)
+    Receta.objects.bulk_update(recetas_cambiadas, ['cantidad_requerida'])
+
+    # Sin señales de post_save en las operaciones masivas: una sola versión nueva
+    invalidar_menu()
+    tocados = {p.pk for p in platos_nuevos + platos_cambiados} | platos_con_eliminadas
+    tocados.update(r.plato_id for r in recetas_nuevas + recetas_cambiadas)
+    resumen['platos_actualizados'] = InventarioService.actualizar_disponibilidad(plato_ids=tocados)
+    return resumen
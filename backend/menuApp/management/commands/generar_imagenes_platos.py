@@ -0,0 +1,40 @@
+"""
+Genera los derivados (thumb, card, full en WebP y JPEG) de las imágenes de
+los platos que no los tienen o cuya imagen cambió.
+
+Uso:
+    python manage.py generar_imagenes_platos
+    python manage.py generar_imagenes_platos --forzar
+"""
+from django.core.management.base import BaseCommand
+
+from menuApp.imagenes import actualizar_derivados
+from menuApp.models import Plato
+
+
+class Command(BaseCommand):
+    help = 'Genera las imágenes derivadas de los platos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Regenerar también los derivados vigentes'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('\n🖼️  Generando imágenes derivadas de los platos...'))
+
+        generados = 0
+        errores = 0
+        for plato in Plato.objects.exclude(imagen='').exclude(imagen__isnull=True).iterator():
+            try:
+                if actualizar_derivados(plato, forzar=options['forzar']):
+                    generados += 1
+            except Exception as e:
+                errores += 1
+                self.stdout.write(self.style.ERROR(f'   ❌ {plato.nombre}: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {generados} platos procesados'))
+        if errores:
+            self.stdout.write(self.style.WARNING(f'⚠️  {errores} platos con error\n'))
@@ -0,0 +1,71 @@
+"""
+Recalcula el perfil de consumo de ingredientes (menuApp.pronostico) y
+muestra los que se agotarían dentro del horizonte. Pensado para correr
+cada noche; la API reutiliza el último perfil guardado.
+
+Uso:
+    python manage.py pronosticar_demanda
+    python manage.py pronosticar_demanda --dias 84 --horizonte 14
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from menuApp.models import PronosticoDemanda
+from menuApp.pronostico import DIAS_HISTORIA_DEFAULT, calcular_perfiles, proyectar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el pronóstico de consumo de ingredientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=DIAS_HISTORIA_DEFAULT,
+            help=f'Días de historial, en semanas completas (default: {DIAS_HISTORIA_DEFAULT})'
+        )
+        parser.add_argument(
+            '--horizonte',
+            type=int,
+            default=14,
+            help='Días a proyectar (default: 14)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING(
+            f'\n📈 Calculando consumo de los últimos {options["dias"]} días...'
+        ))
+
+        inicio = time.perf_counter()
+        pronostico = calcular_perfiles(options['dias'])
+        duracion = time.perf_counter() - inicio
+
+        # Conservar solo los cálculos del último mes
+        PronosticoDemanda.objects.filter(
+            fecha_calculo__lt=timezone.now() - timedelta(days=30)
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Perfil de {len(pronostico.perfiles)} ingredientes '
+            f'({pronostico.desde} a {pronostico.hasta}) en {duracion:.2f}s'
+        ))
+
+        en_riesgo = [
+            r for r in proyectar(pronostico, options['horizonte'])
+            if r['dias_hasta_quiebre'] is not None
+        ]
+        if not en_riesgo:
+            self.stdout.write(f'   Ningún ingrediente se agota en {options["horizonte"]} días\n')
+            return
+
+        self.stdout.write(self.style.WARNING(f'\n⚠️  Se agotan en {options["horizonte"]} días:'))
+        for r in en_riesgo:
+            self.stdout.write(
+                f'   {r["nombre"]}: {r["dias_hasta_quiebre"]} días '
+                f'({r["cantidad_disponible"]} {r["unidad_medida"]}, '
+                f'~{r["consumo_diario_promedio"]}/día)'
+            )
+        self.stdout.write('')
@@ -0,0 +1,45 @@
+"""
+Recalcula Plato.disponible de todo el menú según el stock actual y corrige
+los platos cuyo flag no coincide.
+
+Uso:
+    python manage.py reconciliar_disponibilidad
+    python manage.py reconciliar_disponibilidad --dry-run
+"""
+from django.core.management.base import BaseCommand
+
+from menuApp.services import InventarioService
+
+
+class Command(BaseCommand):
+    help = 'Corrige la disponibilidad de los platos según el stock actual'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informar los platos con disponibilidad incorrecta'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('\n🔄 Revisando disponibilidad de los platos...'))
+
+        resumen = InventarioService.reconciliar_disponibilidad(simular=options['dry_run'])
+
+        for plato in resumen['platos']:
+            estado = 'disponible' if plato['disponible'] else 'no disponible'
+            self.stdout.write(f"   {plato['nombre']}: pasa a {estado}")
+
+        if not resumen['corregidos']:
+            self.stdout.write(self.style.SUCCESS(
+                f"\n✅ {resumen['revisados']} platos revisados, todos correctos\n"
+            ))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"\n⚠️  {resumen['corregidos']} de {resumen['revisados']} platos con disponibilidad "
+                f"incorrecta (dry-run, sin cambios)\n"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"\n✅ {resumen['corregidos']} de {resumen['revisados']} platos corregidos\n"
+            ))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionMenu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Versión del menú',
+                'verbose_name_plural': 'Versión del menú',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuApp', '0002_versionmenu'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plato',
+            name='imagenes',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Derivados de la imagen (menuApp.imagenes)'),
+        ),
+    ]
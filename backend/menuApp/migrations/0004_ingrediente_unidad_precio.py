@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuApp', '0003_plato_imagenes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingrediente',
+            name='unidad_precio',
+            field=models.CharField(blank=True, choices=[('gr', 'Gramos'), ('kg', 'Kilogramos'), ('un', 'Unidades'), ('lt', 'Litros'), ('ml', 'Mililitros')], help_text='Unidad a la que corresponde el precio (vacío: la unidad de medida)', max_length=20),
+        ),
+    ]
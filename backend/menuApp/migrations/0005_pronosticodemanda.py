@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuApp', '0004_ingrediente_unidad_precio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PronosticoDemanda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_calculo', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('dias_historia', models.PositiveIntegerField()),
+                ('desde', models.DateField()),
+                ('hasta', models.DateField(help_text='Último día incluido')),
+                ('perfiles', models.JSONField(default=dict)),
+            ],
+            options={
+                'verbose_name': 'Pronóstico de demanda',
+                'verbose_name_plural': 'Pronósticos de demanda',
+                'ordering': ['-fecha_calculo'],
+            },
+        ),
+    ]
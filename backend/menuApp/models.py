@@ -44,10 +44,29 @@ class Ingrediente(models.Model):
         max_digits=10, decimal_places=2, default=0,
         help_text="Precio de compra por unidad"
     )
+    unidad_precio = models.CharField(
+        max_length=20, choices=UNIDADES, blank=True,
+        help_text="Unidad a la que corresponde el precio (vacío: la unidad de medida)"
+    )
     activo = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    CAMPOS_COSTO = ('precio_unitario', 'unidad_medida', 'unidad_precio')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Recuerda los campos de costo leídos para detectar cambios de precio sin otro SELECT"""
+        instance = super().from_db(db, field_names, values)
+        instance._costo_original = tuple(instance.__dict__.get(campo) for campo in cls.CAMPOS_COSTO)
+        return instance
+
+    @property
+    def costo_modificado(self):
+        return getattr(self, '_costo_original', None) != tuple(
+            getattr(self, campo) for campo in self.CAMPOS_COSTO
+        )
+
     @property
     def bajo_stock(self):
         """Retorna True si el stock está bajo el mínimo"""
@@ -74,6 +93,12 @@ class Plato(models.Model):
     )
     disponible = models.BooleanField(default=True)
     imagen = models.ImageField(upload_to='platos/', blank=True, null=True)
+    imagenes = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Derivados de la imagen (menuApp.imagenes)"
+    )
     tiempo_preparacion = models.PositiveIntegerField(
         default=15,
         help_text="Tiempo estimado de preparación en minutos"
@@ -84,8 +109,12 @@ class Plato(models.Model):
 
     def verificar_disponibilidad(self):
         """Verifica si todos los ingredientes tienen stock suficiente"""
-        # Optimización: usar select_related para evitar N+1 queries
-        recetas = self.recetas.select_related('ingrediente')
+        # Optimización: reutilizar recetas precargadas con prefetch_related si existen,
+        # si no, usar select_related para evitar N+1 queries
+        if 'recetas' in getattr(self, '_prefetched_objects_cache', {}):
+            recetas = self.recetas.all()
+        else:
+            recetas = self.recetas.select_related('ingrediente')
         for receta in recetas:
             if receta.ingrediente.cantidad_disponible < receta.cantidad_requerida:
                 return False
@@ -124,3 +153,59 @@ class Receta(models.Model):
         verbose_name = "Receta"
         verbose_name_plural = "Recetas"
         unique_together = ['plato', 'ingrediente']
+
+
+class VersionMenu(models.Model):
+    """
+    Contador de versión del menú público (fila única, pk=1).
+
+    Se incrementa con cada cambio de categorías, platos, recetas o
+    disponibilidad; el menú cacheado y su ETag se identifican por esta versión.
+    """
+    version = models.PositiveBigIntegerField(default=1)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def actual(cls):
+        version = cls.objects.filter(pk=1).values_list('version', flat=True).first()
+        if version is None:
+            version = cls.objects.get_or_create(pk=1)[0].version
+        return version
+
+    @classmethod
+    def incrementar(cls):
+        """Incrementa la versión de forma atómica y retorna la nueva"""
+        if not cls.objects.filter(pk=1).update(version=models.F('version') + 1):
+            cls.objects.get_or_create(pk=1)
+            return cls.incrementar()
+        return cls.objects.filter(pk=1).values_list('version', flat=True).get()
+
+    def __str__(self):
+        return f"Menú v{self.version}"
+
+    class Meta:
+        verbose_name = "Versión del menú"
+        verbose_name_plural = "Versión del menú"
+
+
+class PronosticoDemanda(models.Model):
+    """
+    Perfil de consumo por ingrediente calculado por menuApp.pronostico
+    (se conserva el último cálculo; la proyección contra el stock actual
+    se hace al leerlo).
+
+    perfiles: {ingrediente_id: [consumo promedio lunes, ..., domingo]}
+    """
+    fecha_calculo = models.DateTimeField(auto_now_add=True, db_index=True)
+    dias_historia = models.PositiveIntegerField()
+    desde = models.DateField()
+    hasta = models.DateField(help_text="Último día incluido")
+    perfiles = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"Pronóstico {self.fecha_calculo:%Y-%m-%d %H:%M} ({self.dias_historia} días)"
+
+    class Meta:
+        verbose_name = "Pronóstico de demanda"
+        verbose_name_plural = "Pronósticos de demanda"
+        ordering = ['-fecha_calculo']
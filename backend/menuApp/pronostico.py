@@ -0,0 +1,178 @@
+"""
+Pronóstico de consumo de ingredientes a partir del historial de pedidos.
+
+1. Ventas plato × día: una consulta agregada (GROUP BY plato, día) sobre
+   DetallePedido, más los pedidos archivados (PedidoArchivado) si la
+   ventana supera la retención de las tablas activas.
+2. Consumo ingrediente × día: ventas × matriz de recetas (dispersa).
+3. Perfil estacional: para cada ingrediente, promedio del consumo de cada
+   día de la semana en las últimas N semanas.
+4. Proyección: se descuenta el perfil día a día desde la cantidad
+   disponible actual hasta agotarla (días hasta el quiebre de stock).
+
+Los pedidos cancelados no cuentan como consumo. El perfil (pasos 1-3) se
+guarda en PronosticoDemanda; la proyección (paso 4) se calcula al leer,
+así refleja el stock del momento.
+
+El perfil lo recalcula el comando pronosticar_demanda (nocturno) o el POST
+pronostico/recalcular. Las lecturas solo usan el último guardado, aunque
+esté vencido (se informa con 'vencido'): no escriben ni lanzan cálculos.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Ingrediente, PronosticoDemanda, Receta
+
+DIAS_HISTORIA_DEFAULT = 56
+HORIZONTE_MAXIMO = 90
+
+
+def _ventas_por_dia(desde, hasta):
+    """{(plato_id, fecha): unidades} de los pedidos no cancelados entre desde y hasta (inclusive)"""
+    from cocinaApp.models import DetallePedido, EstadoPedido, PedidoArchivado
+
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    zona = timezone.get_current_timezone()
+
+    ventas = defaultdict(int)
+    filas = DetallePedido.objects.filter(
+        pedido__fecha_creacion__gte=inicio,
+        pedido__fecha_creacion__lt=fin
+    ).exclude(
+        pedido__estado=EstadoPedido.CANCELADO
+    ).annotate(
+        dia=TruncDate('pedido__fecha_creacion', tzinfo=zona)
+    ).values_list('plato_id', 'dia').annotate(unidades=Sum('cantidad')).order_by()
+    for plato_id, dia, unidades in filas.iterator():
+        ventas[plato_id, dia] += unidades
+
+    # Pedidos ya movidos al archivo (solo si la ventana llega hasta ahí)
+    archivados = PedidoArchivado.objects.filter(
+        estado=EstadoPedido.ENTREGADO,
+        fecha_creacion__gte=inicio,
+        fecha_creacion__lt=fin
+    ).values_list('fecha_creacion', 'datos')
+    for fecha_creacion, datos in archivados.iterator(chunk_size=500):
+        dia = timezone.localtime(fecha_creacion).date()
+        for detalle in datos.get('detalles', []):
+            ventas[detalle['plato'], dia] += detalle['cantidad']
+
+    return ventas
+
+
+def calcular_perfiles(dias=DIAS_HISTORIA_DEFAULT, hasta=None):
+    """
+    Calcula y guarda el perfil de consumo por día de la semana.
+
+    Args:
+        dias: Días de historial (se redondea a semanas completas)
+        hasta: Último día incluido (default: ayer; el día en curso está incompleto)
+
+    Returns:
+        PronosticoDemanda creado
+    """
+    semanas = max(1, dias // 7)
+    hasta = hasta or timezone.localdate() - timedelta(days=1)
+    desde = hasta - timedelta(days=semanas * 7 - 1)
+
+    recetas = defaultdict(list)
+    for plato_id, ingrediente_id, cantidad in Receta.objects.values_list(
+        'plato_id', 'ingrediente_id', 'cantidad_requerida'
+    ):
+        recetas[plato_id].append((ingrediente_id, float(cantidad)))
+
+    # Consumo total por ingrediente y día de la semana
+    totales = defaultdict(lambda: [0.0] * 7)
+    for (plato_id, dia), unidades in _ventas_por_dia(desde, hasta).items():
+        for ingrediente_id, cantidad in recetas.get(plato_id, ()):
+            totales[ingrediente_id][dia.weekday()] += cantidad * unidades
+
+    # Cada día de la semana aparece exactamente 'semanas' veces en la ventana
+    perfiles = {
+        str(ingrediente_id): [round(total / semanas, 4) for total in por_dia]
+        for ingrediente_id, por_dia in totales.items()
+    }
+
+    return PronosticoDemanda.objects.create(
+        dias_historia=semanas * 7,
+        desde=desde,
+        hasta=hasta,
+        perfiles=perfiles
+    )
+
+
+def vencido(pronostico):
+    """True si el perfil es más antiguo que PRONOSTICO_TTL_HORAS"""
+    ttl = timedelta(hours=getattr(settings, 'PRONOSTICO_TTL_HORAS', 24))
+    return pronostico.fecha_calculo < timezone.now() - ttl
+
+
+def obtener_perfiles():
+    """
+    Último perfil calculado, aunque esté vencido (sin recalcular).
+
+    Returns:
+        PronosticoDemanda, o None si nunca se calculó
+    """
+    return PronosticoDemanda.objects.first()
+
+
+def proyectar(pronostico, horizonte=30, ingredientes=None):
+    """
+    Proyecta el stock actual de cada ingrediente con su perfil de consumo.
+
+    Returns:
+        Lista de dicts por ingrediente, primero los que se agotan antes
+    """
+    horizonte = min(max(1, horizonte), HORIZONTE_MAXIMO)
+    hoy = timezone.localdate()
+    if ingredientes is None:
+        ingredientes = Ingrediente.objects.filter(activo=True).only(
+            'id', 'nombre', 'unidad_medida', 'cantidad_disponible', 'stock_minimo'
+        )
+
+    resultados = []
+    for ingrediente in ingredientes:
+        perfil = pronostico.perfiles.get(str(ingrediente.pk), [0.0] * 7)
+        stock = float(ingrediente.cantidad_disponible)
+        dias_quiebre = None
+        dias_minimo = None
+        restante = stock
+        for offset in range(horizonte):
+            consumo = perfil[(hoy + timedelta(days=offset)).weekday()]
+            if consumo <= 0:
+                continue
+            if dias_minimo is None and restante - consumo < float(ingrediente.stock_minimo):
+                dias_minimo = offset
+            if restante - consumo < 0:
+                # Fracción del día en que se agota
+                dias_quiebre = round(offset + restante / consumo, 1)
+                break
+            restante -= consumo
+
+        resultados.append({
+            'ingrediente': ingrediente.pk,
+            'nombre': ingrediente.nombre,
+            'unidad_medida': ingrediente.unidad_medida,
+            'cantidad_disponible': ingrediente.cantidad_disponible,
+            'stock_minimo': ingrediente.stock_minimo,
+            'consumo_diario_promedio': round(sum(perfil) / 7, 3),
+            'consumo_por_dia_semana': perfil,
+            'consumo_proximos_7_dias': round(
+                sum(perfil[(hoy + timedelta(days=d)).weekday()] for d in range(7)), 3
+            ),
+            'dias_hasta_minimo': dias_minimo,
+            'dias_hasta_quiebre': dias_quiebre,
+            'fecha_quiebre': (
+                hoy + timedelta(days=int(dias_quiebre))
+            ).isoformat() if dias_quiebre is not None else None,
+        })
+
+    resultados.sort(key=lambda r: (r['dias_hasta_quiebre'] is None, r['dias_hasta_quiebre']))
+    return resultados
@@ -0,0 +1,223 @@
+"""
+Sugerencias de reposición de ingredientes.
+
+Parte del perfil de consumo por día de la semana (menuApp.pronostico) y lo
+ajusta con las reservas futuras:
+
+1. Consumo por comensal reservado: lo que consumieron los pedidos ligados a
+   una reserva en la ventana del perfil, dividido por los comensales de
+   esas reservas (una consulta agregada por plato, sin recorrer pedidos).
+2. Comensales reservados: promedio histórico por día de la semana (ya
+   incluido en el perfil) y total por día de las reservas futuras.
+3. Consumo esperado del día = perfil + (comensales futuros - promedio
+   histórico) × consumo por comensal, solo si hay más reservas que lo
+   habitual.
+4. Con el stock actual se busca el día en que se cruzaría stock_minimo; el
+   pedido al proveedor se sugiere 'dias_entrega' antes, por la cantidad que
+   cubre 'dias_cobertura' días desde la llegada más el stock mínimo.
+"""
+import csv
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_CEILING
+from itertools import accumulate
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .costos import CENTAVOS, factor_conversion
+from .models import Ingrediente, Receta
+from .pronostico import HORIZONTE_MAXIMO
+
+ESTADOS_RESERVA_FUTURA = ('pendiente', 'confirmada', 'activa')
+MILESIMAS = Decimal('0.001')
+
+COLUMNAS_CSV = [
+    ('nombre', 'Ingrediente'),
+    ('unidad_medida', 'Unidad'),
+    ('cantidad_disponible', 'Stock actual'),
+    ('stock_minimo', 'Stock mínimo'),
+    ('consumo_diario_esperado', 'Consumo diario esperado'),
+    ('fecha_bajo_minimo', 'Bajo mínimo el'),
+    ('fecha_pedido', 'Pedir el'),
+    ('fecha_entrega', 'Entrega'),
+    ('cantidad_sugerida', 'Cantidad sugerida'),
+    ('costo_estimado', 'Costo estimado'),
+    ('urgente', 'Urgente'),
+]
+
+
+def _consumo_por_comensal(desde, hasta):
+    """{ingrediente_id: consumo por comensal} de los pedidos con reserva en la ventana"""
+    from cocinaApp.models import DetallePedido, EstadoPedido, Pedido
+    from mainApp.models import Reserva
+
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    pedidos = Pedido.objects.filter(
+        reserva__isnull=False,
+        fecha_creacion__gte=inicio,
+        fecha_creacion__lt=fin
+    ).exclude(estado=EstadoPedido.CANCELADO)
+
+    comensales = Reserva.objects.filter(
+        pk__in=pedidos.values('reserva_id')
+    ).aggregate(total=Sum('num_personas'))['total']
+    if not comensales:
+        return {}
+
+    ventas = DetallePedido.objects.filter(
+        pedido__in=pedidos
+    ).values_list('plato_id').annotate(unidades=Sum('cantidad')).order_by()
+    unidades_por_plato = dict(ventas)
+
+    consumo = defaultdict(float)
+    for plato_id, ingrediente_id, cantidad in Receta.objects.filter(
+        plato_id__in=unidades_por_plato
+    ).values_list('plato_id', 'ingrediente_id', 'cantidad_requerida'):
+        consumo[ingrediente_id] += float(cantidad) * unidades_por_plato[plato_id]
+
+    return {ingrediente_id: total / comensales for ingrediente_id, total in consumo.items()}
+
+
+def _comensales_reservados(pronostico, hoy, dias):
+    """
+    Returns:
+        (promedio histórico por día de la semana, comensales por día futuro)
+    """
+    from mainApp.models import Reserva
+
+    semanas = max(1, pronostico.dias_historia // 7)
+    historico = [0.0] * 7
+    for fecha, personas in Reserva.objects.filter(
+        fecha_reserva__gte=pronostico.desde,
+        fecha_reserva__lte=pronostico.hasta
+    ).exclude(estado='cancelada').values_list('fecha_reserva').annotate(
+        personas=Sum('num_personas')
+    ).order_by():
+        historico[fecha.weekday()] += personas / semanas
+
+    futuro = [0] * dias
+    for fecha, personas in Reserva.objects.filter(
+        fecha_reserva__gte=hoy,
+        fecha_reserva__lt=hoy + timedelta(days=dias),
+        estado__in=ESTADOS_RESERVA_FUTURA
+    ).values_list('fecha_reserva').annotate(
+        personas=Sum('num_personas')
+    ).order_by():
+        futuro[(fecha - hoy).days] = personas
+
+    return historico, futuro
+
+
+def _redondear_arriba(valor):
+    return Decimal(str(valor)).quantize(MILESIMAS, rounding=ROUND_CEILING)
+
+
+def sugerir_reposicion(pronostico, dias_entrega=None, dias_cobertura=None, horizonte=30):
+    """
+    Sugerencia de pedido al proveedor por ingrediente activo.
+
+    Args:
+        pronostico: PronosticoDemanda con el perfil de consumo
+        dias_entrega: Días que tarda el proveedor (default REPOSICION_DIAS_ENTREGA)
+        dias_cobertura: Días de consumo que debe cubrir cada pedido
+            (default REPOSICION_DIAS_COBERTURA)
+        horizonte: Días hacia adelante en que se busca el cruce del mínimo
+
+    Returns:
+        Lista de dicts por ingrediente, ordenada por fecha de pedido
+        (los que no necesitan pedido dentro del horizonte al final)
+    """
+    if dias_entrega is None:
+        dias_entrega = getattr(settings, 'REPOSICION_DIAS_ENTREGA', 2)
+    if dias_cobertura is None:
+        dias_cobertura = getattr(settings, 'REPOSICION_DIAS_COBERTURA', 7)
+    dias_entrega = min(max(0, dias_entrega), HORIZONTE_MAXIMO)
+    dias_cobertura = min(max(1, dias_cobertura), HORIZONTE_MAXIMO)
+    horizonte = min(max(1, horizonte), HORIZONTE_MAXIMO)
+
+    hoy = timezone.localdate()
+    # La llegada puede caer al final del horizonte y cubrir desde ahí
+    dias = horizonte + dias_entrega + dias_cobertura
+    dias_semana = [(hoy + timedelta(days=d)).weekday() for d in range(dias)]
+
+    por_comensal = _consumo_por_comensal(pronostico.desde, pronostico.hasta)
+    historico, futuro = _comensales_reservados(pronostico, hoy, dias)
+    # Comensales por sobre lo habitual de ese día de la semana
+    extra = [max(0.0, futuro[d] - historico[dias_semana[d]]) for d in range(dias)]
+
+    sugerencias = []
+    ingredientes = Ingrediente.objects.filter(activo=True).only(
+        'id', 'nombre', 'unidad_medida', 'unidad_precio', 'precio_unitario',
+        'cantidad_disponible', 'stock_minimo'
+    )
+    for ingrediente in ingredientes:
+        perfil = pronostico.perfiles.get(str(ingrediente.pk), [0.0] * 7)
+        comensal = por_comensal.get(ingrediente.pk, 0.0)
+        consumo = [perfil[dias_semana[d]] + extra[d] * comensal for d in range(dias)]
+
+        stock = float(ingrediente.cantidad_disponible)
+        minimo = float(ingrediente.stock_minimo)
+        # restante[d] = stock al inicio del día d
+        restante = [stock - acumulado for acumulado in accumulate(consumo, initial=0.0)]
+
+        dia_bajo_minimo = next(
+            (d for d in range(horizonte) if restante[d + 1] < minimo), None
+        )
+        fila = {
+            'ingrediente': ingrediente.pk,
+            'nombre': ingrediente.nombre,
+            'unidad_medida': ingrediente.unidad_medida,
+            'unidad_precio': ingrediente.unidad_precio or ingrediente.unidad_medida,
+            'cantidad_disponible': ingrediente.cantidad_disponible,
+            'stock_minimo': ingrediente.stock_minimo,
+            'consumo_diario_esperado': round(sum(consumo[:horizonte]) / horizonte, 3),
+            'comensales_reservados_extra': round(sum(extra[:horizonte]), 1),
+            'fecha_bajo_minimo': None,
+            'fecha_pedido': None,
+            'fecha_entrega': None,
+            'cantidad_sugerida': Decimal('0.000'),
+            'costo_estimado': None,
+            'urgente': False,
+        }
+
+        if dia_bajo_minimo is not None:
+            dia_pedido = max(0, dia_bajo_minimo - dias_entrega)
+            llegada = dia_pedido + dias_entrega
+            necesario = minimo + sum(consumo[llegada:llegada + dias_cobertura]) - restante[llegada]
+            cantidad = _redondear_arriba(max(0.0, necesario))
+
+            factor = factor_conversion(ingrediente.unidad_medida, ingrediente.unidad_precio)
+            fila.update({
+                'fecha_bajo_minimo': hoy + timedelta(days=dia_bajo_minimo),
+                'fecha_pedido': hoy + timedelta(days=dia_pedido),
+                'fecha_entrega': hoy + timedelta(days=llegada),
+                'cantidad_sugerida': cantidad,
+                'costo_estimado': (
+                    cantidad * factor * ingrediente.precio_unitario
+                ).quantize(CENTAVOS) if factor is not None else None,
+                # Ya no alcanza a llegar antes de cruzar el mínimo
+                'urgente': dia_bajo_minimo < dias_entrega,
+            })
+
+        sugerencias.append(fila)
+
+    sugerencias.sort(key=lambda s: (s['fecha_pedido'] is None, s['fecha_pedido'], s['nombre']))
+    return sugerencias
+
+
+def _valor_csv(campo, valor):
+    if campo == 'urgente':
+        return 'Sí' if valor else 'No'
+    return '' if valor is None else valor
+
+
+def escribir_csv(sugerencias, destino):
+    """Escribe en 'destino' las sugerencias con cantidad > 0, una fila por ingrediente"""
+    writer = csv.writer(destino)
+    writer.writerow([titulo for _, titulo in COLUMNAS_CSV])
+    for fila in sugerencias:
+        if fila['cantidad_sugerida'] > 0:
+            writer.writerow([_valor_csv(campo, fila[campo]) for campo, _ in COLUMNAS_CSV])
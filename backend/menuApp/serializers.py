@@ -1,4 +1,8 @@
+from collections import Counter
+
 from rest_framework import serializers
+from .costos import obtener_costos
+from .imagenes import urls_derivados
 from .models import CategoriaMenu, Ingrediente, Plato, Receta
 
 
@@ -14,7 +18,7 @@ class IngredienteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingrediente
         fields = [
-            'id', 'nombre', 'descripcion', 'unidad_medida',
+            'id', 'nombre', 'descripcion', 'unidad_medida', 'unidad_precio',
             'cantidad_disponible', 'stock_minimo', 'precio_unitario',
             'activo', 'bajo_stock', 'created_at', 'updated_at'
         ]
@@ -30,25 +34,126 @@ class RecetaSerializer(serializers.ModelSerializer):
         fields = ['id', 'ingrediente', 'ingrediente_nombre', 'unidad_medida', 'cantidad_requerida']
 
 
-class PlatoSerializer(serializers.ModelSerializer):
+class ImagenesPlatoMixin(serializers.Serializer):
+    """Expone los derivados de la imagen: {tamaño: {ancho, alto, webp, jpeg}}"""
+    imagenes = serializers.SerializerMethodField()
+
+    def get_imagenes(self, obj):
+        return urls_derivados(obj.imagenes, self.context.get('request'))
+
+
+class PlatoSerializer(ImagenesPlatoMixin, serializers.ModelSerializer):
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
     recetas = RecetaSerializer(many=True, read_only=True)
+    costo = serializers.SerializerMethodField()
 
     class Meta:
         model = Plato
         fields = [
             'id', 'nombre', 'descripcion', 'precio', 'categoria',
-            'categoria_nombre', 'disponible', 'imagen',
-            'tiempo_preparacion', 'activo', 'recetas',
+            'categoria_nombre', 'disponible', 'imagen', 'imagenes',
+            'tiempo_preparacion', 'activo', 'recetas', 'costo',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+    def _ver_costos(self):
+        """El costo y el margen solo se muestran a administradores"""
+        request = self.context.get('request')
+        try:
+            return request.user.perfil.rol == 'admin'
+        except AttributeError:
+            return False
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if not self._ver_costos():
+            data.pop('costo', None)
+        return data
+
+    def get_costo(self, obj):
+        """{costo, margen, margen_porcentaje, food_cost_porcentaje, completo} (menuApp.costos)"""
+        if not self._ver_costos():
+            return None
+        return obtener_costos().get(obj.pk)
 
-class PlatoListSerializer(serializers.ModelSerializer):
+
+class PlatoListSerializer(ImagenesPlatoMixin, serializers.ModelSerializer):
     """Serializer ligero para listados"""
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
 
     class Meta:
         model = Plato
-        fields = ['id', 'nombre', 'precio', 'categoria', 'categoria_nombre', 'disponible', 'activo', 'imagen', 'tiempo_preparacion', 'descripcion']
+        fields = ['id', 'nombre', 'precio', 'categoria', 'categoria_nombre', 'disponible', 'activo', 'imagen', 'imagenes', 'tiempo_preparacion', 'descripcion']
+
+
+class AjusteStockItemSerializer(serializers.Serializer):
+    # ID simple: InventarioService valida la existencia de todos en una sola consulta
+    ingrediente = serializers.IntegerField(min_value=1)
+    cantidad = serializers.DecimalField(max_digits=10, decimal_places=3)
+
+
+class AjusteStockMasivoSerializer(serializers.Serializer):
+    """
+    Recepción de proveedor (cantidades a sumar; negativas para mermas) o
+    conteo de inventario (cantidades absolutas) de varios ingredientes.
+    """
+    tipo = serializers.ChoiceField(choices=[
+        ('recepcion', 'Recepción'),
+        ('conteo', 'Conteo'),
+    ])
+    items = AjusteStockItemSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate(self, data):
+        ids = [item['ingrediente'] for item in data['items']]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError({'items': 'Un ingrediente aparece más de una vez'})
+        if data['tipo'] == 'conteo' and any(item['cantidad'] < 0 for item in data['items']):
+            raise serializers.ValidationError({'items': 'Un conteo no puede ser negativo'})
+        return data
+
+
+class RecetaImportacionSerializer(serializers.Serializer):
+    ingrediente = serializers.CharField(max_length=100)
+    cantidad_requerida = serializers.DecimalField(max_digits=10, decimal_places=3, min_value=0)
+
+
+class CategoriaImportacionSerializer(serializers.Serializer):
+    nombre = serializers.CharField(max_length=100)
+    descripcion = serializers.CharField(required=False, allow_blank=True, default='')
+    activa = serializers.BooleanField(required=False, default=True)
+    orden = serializers.IntegerField(required=False, min_value=0, default=0)
+
+
+class PlatoImportacionSerializer(serializers.Serializer):
+    # Categoría e ingredientes por nombre: el mismo archivo sirve entre instalaciones
+    nombre = serializers.CharField(max_length=200)
+    categoria = serializers.CharField(max_length=100)
+    descripcion = serializers.CharField(required=False, allow_blank=True, default='')
+    precio = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    tiempo_preparacion = serializers.IntegerField(required=False, min_value=0, default=15)
+    activo = serializers.BooleanField(required=False, default=True)
+    recetas = RecetaImportacionSerializer(many=True, required=False, default=list)
+
+    def validate_recetas(self, value):
+        nombres = [receta['ingrediente'] for receta in value]
+        if len(nombres) != len(set(nombres)):
+            raise serializers.ValidationError('Un ingrediente aparece más de una vez en la receta')
+        return value
+
+
+class MenuImportacionSerializer(serializers.Serializer):
+    """
+    Menú completo (formato de menuApp.importacion.exportar_menu).
+    Sin 'categorias', las categorías se crean según las referencias de los platos.
+    """
+    categorias = CategoriaImportacionSerializer(many=True, required=False)
+    platos = PlatoImportacionSerializer(many=True, max_length=5000)
+
+    def validate(self, data):
+        for clave in ('categorias', 'platos'):
+            conteo = Counter(item['nombre'] for item in data.get(clave, []))
+            repetidos = sorted(nombre for nombre, veces in conteo.items() if veces > 1)
+            if repetidos:
+                raise serializers.ValidationError({clave: f"Nombres repetidos: {', '.join(repetidos)}"})
+        return data
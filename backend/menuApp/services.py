@@ -0,0 +1,164 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Value, When
+
+from .alertas_stock import registrar_movimiento
+from .cache import invalidar_menu
+from .models import Ingrediente, Plato, Receta
+
+
+class InventarioService:
+    """Servicio para movimientos de stock de ingredientes"""
+
+    RECEPCION = 'recepcion'
+    CONTEO = 'conteo'
+
+    @staticmethod
+    @transaction.atomic
+    def ajustar_stock_masivo(tipo, items):
+        """
+        Aplica una recepción (cantidades a sumar o restar) o un conteo
+        (cantidades absolutas) a varios ingredientes en un solo UPDATE
+        con F()/CASE y recalcula la disponibilidad de los platos una vez.
+
+        Args:
+            tipo: InventarioService.RECEPCION o InventarioService.CONTEO
+            items: Lista de dicts {'ingrediente': Ingrediente o id, 'cantidad': Decimal}
+
+        Returns:
+            dict con el resumen: ingredientes (antes/después), platos cuya
+            disponibilidad cambió
+
+        Raises:
+            ValidationError si algún stock quedaría negativo (no se aplica nada)
+        """
+        cantidades = {}
+        for item in items:
+            ingrediente_id = getattr(item['ingrediente'], 'pk', item['ingrediente'])
+            cantidades[ingrediente_id] = Decimal(item['cantidad'])
+
+        # Bloquear en orden de pk para que dos ajustes simultáneos no se crucen
+        anteriores = dict(
+            Ingrediente.objects.select_for_update().filter(
+                pk__in=cantidades
+            ).order_by('pk').values_list('pk', 'cantidad_disponible')
+        )
+        faltantes = set(cantidades) - set(anteriores)
+        if faltantes:
+            raise ValidationError(f"Ingredientes inexistentes: {sorted(faltantes)}")
+
+        valor = Case(
+            *[When(pk=pk, then=Value(cantidad)) for pk, cantidad in cantidades.items()],
+            output_field=DecimalField(max_digits=10, decimal_places=3)
+        )
+        if tipo == InventarioService.RECEPCION:
+            valor = F('cantidad_disponible') + valor
+        Ingrediente.objects.filter(pk__in=cantidades).update(cantidad_disponible=valor)
+
+        ingredientes = list(Ingrediente.objects.filter(pk__in=cantidades).order_by('nombre'))
+        negativos = [i for i in ingredientes if i.cantidad_disponible < 0]
+        if negativos:
+            raise ValidationError(
+                "El stock no puede ser negativo: " + ", ".join(
+                    f"{i.nombre} ({i.cantidad_disponible})" for i in negativos
+                )
+            )
+
+        for ingrediente in ingredientes:
+            registrar_movimiento(ingrediente, anteriores[ingrediente.pk])
+
+        platos = InventarioService.actualizar_disponibilidad(cantidades)
+
+        return {
+            'tipo': tipo,
+            'ajustados': len(ingredientes),
+            'ingredientes': [
+                {
+                    'ingrediente': ingrediente,
+                    'cantidad_anterior': anteriores[ingrediente.pk],
+                    'cantidad_nueva': ingrediente.cantidad_disponible,
+                }
+                for ingrediente in ingredientes
+            ],
+            'platos_actualizados': platos,
+        }
+
+    @staticmethod
+    def _recalcular_disponibilidad(platos, simular=False):
+        """
+        Disponibilidad según el stock actual de 'platos' en una sola consulta
+        (platos con alguna receta cuyo ingrediente no alcanza para una
+        porción) y bulk_update solo de los que cambiaron.
+
+        Mismo criterio que Plato.verificar_disponibilidad.
+
+        Returns:
+            (platos revisados, lista de dicts {id, nombre, disponible} de los que cambiaron)
+        """
+        filas = platos.annotate(
+            faltantes=Count(
+                'recetas',
+                filter=Q(recetas__ingrediente__cantidad_disponible__lt=F('recetas__cantidad_requerida'))
+            )
+        ).values_list('id', 'nombre', 'disponible', 'faltantes').order_by()
+
+        revisados = 0
+        cambiados = []
+        for plato_id, nombre, disponible, faltantes in filas:
+            revisados += 1
+            if disponible != (faltantes == 0):
+                cambiados.append(Plato(pk=plato_id, nombre=nombre, disponible=not disponible))
+
+        if cambiados and not simular:
+            Plato.objects.bulk_update(cambiados, ['disponible'])
+            # bulk_update no emite post_save
+            invalidar_menu()
+
+        return revisados, [
+            {'id': plato.pk, 'nombre': plato.nombre, 'disponible': plato.disponible}
+            for plato in cambiados
+        ]
+
+    @staticmethod
+    def actualizar_disponibilidad(ingrediente_ids=(), plato_ids=()):
+        """
+        Recalcula Plato.disponible de los platos que usan esos ingredientes
+        (y de los platos indicados) y guarda solo los que cambiaron, en un
+        solo bulk_update.
+
+        Args:
+            ingrediente_ids: Iterable de ids o subconsulta .values('ingrediente_id')
+            plato_ids: Iterable de ids de platos
+
+        Returns:
+            Lista de dicts {id, nombre, disponible} de los platos que cambiaron
+        """
+        # Subconsulta: filtrar por el JOIN a recetas limitaría el Count a esas recetas
+        platos = Plato.objects.filter(
+            Q(pk__in=Receta.objects.filter(ingrediente_id__in=ingrediente_ids).values('plato_id'))
+            | Q(pk__in=plato_ids)
+        )
+        return InventarioService._recalcular_disponibilidad(platos)[1]
+
+    @staticmethod
+    @transaction.atomic
+    def reconciliar_disponibilidad(simular=False):
+        """
+        Recalcula Plato.disponible de todo el menú y corrige los que no
+        coinciden con el stock (p. ej. platos que comparten ingredientes con
+        un pedido, o stock editado directamente).
+
+        Returns:
+            dict {revisados, corregidos, platos: [{id, nombre, disponible}]}
+        """
+        revisados, cambiados = InventarioService._recalcular_disponibilidad(
+            Plato.objects.all(), simular
+        )
+        return {
+            'simulacion': simular,
+            'revisados': revisados,
+            'corregidos': len(cambiados),
+            'platos': cambiados,
+        }
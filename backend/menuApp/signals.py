@@ -0,0 +1,52 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidar_menu
+from .imagenes import actualizar_derivados, borrar_derivados, derivados_vigentes
+from .models import CategoriaMenu, Ingrediente, Plato, Receta
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=CategoriaMenu)
+@receiver(post_delete, sender=CategoriaMenu)
+@receiver(post_save, sender=Plato)
+@receiver(post_delete, sender=Plato)
+@receiver(post_save, sender=Receta)
+@receiver(post_delete, sender=Receta)
+def invalidar_menu_publico(sender, instance, **kwargs):
+    """Cualquier cambio del menú (incluida la disponibilidad de un plato) cambia su versión"""
+    invalidar_menu()
+
+
+@receiver(post_save, sender=Ingrediente)
+def invalidar_costos_ingrediente(sender, instance, created, **kwargs):
+    """Un cambio de precio o unidad cambia el costo de los platos (menuApp.costos)"""
+    if not created and instance.costo_modificado:
+        invalidar_menu()
+        instance._costo_original = tuple(getattr(instance, campo) for campo in instance.CAMPOS_COSTO)
+
+
+@receiver(post_save, sender=Plato)
+def generar_imagenes_plato(sender, instance, **kwargs):
+    """Genera los derivados cuando la imagen del plato cambió (al confirmar la transacción)"""
+    if derivados_vigentes(instance):
+        return
+
+    def generar():
+        try:
+            actualizar_derivados(instance)
+        except Exception:
+            # El plato queda sin derivados; generar_imagenes_platos los reintenta
+            logger.exception("Error generando imágenes del plato %s", instance.pk)
+
+    transaction.on_commit(generar)
+
+
+@receiver(post_delete, sender=Plato)
+def borrar_imagenes_plato(sender, instance, **kwargs):
+    if instance.imagenes:
+        transaction.on_commit(lambda: borrar_derivados(instance.imagenes))
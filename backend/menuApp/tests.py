@@ -0,0 +1,790 @@
+import asyncio
+import shutil
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from cocinaApp.models import DetallePedido, Pedido
+from mainApp.models import Mesa, Perfil, Reserva
+from . import busqueda
+from .alertas_stock import GRUPO_STOCK
+from .cache import invalidar_menu
+from .consumers import StockConsumer
+from .imagenes import derivados_vigentes
+from .services import InventarioService
+from .models import CategoriaMenu, Ingrediente, Plato, PronosticoDemanda, Receta, VersionMenu
+
+
+def cliente_admin():
+    user = User.objects.create_user('admin1', 'admin1@test.cl', 'clave-segura-123')
+    Perfil.objects.update_or_create(user=user, defaults={'rol': 'admin', 'nombre_completo': 'admin1'})
+    client = APIClient()
+    client.force_authenticate(User.objects.get(pk=user.pk))
+    return client
+
+
+class InvalidarMenuTests(TestCase):
+    def setUp(self):
+        self.version = VersionMenu.actual()
+
+    def revertido(self):
+        try:
+            with transaction.atomic():
+                invalidar_menu()
+                raise ValueError
+        except ValueError:
+            pass
+
+    def test_una_transaccion_incrementa_una_vez(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidar_menu()
+            with transaction.atomic():
+                invalidar_menu()
+            invalidar_menu()
+        self.assertEqual(VersionMenu.actual(), self.version + 1)
+
+    def test_savepoint_revertido_no_incrementa(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.revertido()
+        self.assertEqual(VersionMenu.actual(), self.version)
+
+    def test_cambio_exterior_sobrevive_al_savepoint_revertido(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidar_menu()
+            self.revertido()
+        self.assertEqual(VersionMenu.actual(), self.version + 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class MenuCacheadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.plato = Plato.objects.create(nombre='Lomo', precio=Decimal('9000'), categoria=categoria)
+        self.client = APIClient()
+
+    def test_etag_304_y_nueva_version_al_cambiar_el_menu(self):
+        primera = self.client.get('/api/menu/platos/')
+        self.assertEqual(primera.status_code, 200)
+        etag = primera['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/menu/platos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plato.precio = Decimal('9500')
+            self.plato.save()
+
+        response = self.client.get('/api/menu/platos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['precio'], '9500.00')
+
+
+class ImagenesPlatoTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.plato = Plato.objects.create(nombre='Lomo', precio=Decimal('9000'), categoria=categoria)
+
+    def subir(self, nombre, tamano, formato, modo='RGB'):
+        buffer = BytesIO()
+        Image.new(modo, tamano, (200, 50, 50, 128)[:len(modo)]).save(buffer, formato)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plato.imagen = SimpleUploadedFile(nombre, buffer.getvalue())
+            self.plato.save()
+        self.plato.refresh_from_db()
+        return self.plato.imagenes
+
+    def test_genera_los_derivados_al_subir_la_imagen(self):
+        imagenes = self.subir('lomo.png', (2400, 1600), 'PNG', modo='RGBA')
+
+        self.assertTrue(derivados_vigentes(self.plato))
+        self.assertEqual(imagenes['origen'], self.plato.imagen.name)
+        tamanos = {
+            nombre: (imagenes[nombre]['ancho'], imagenes[nombre]['alto']) for nombre in ('thumb', 'card', 'full')
+        }
+        self.assertEqual(tamanos, {'thumb': (120, 120), 'card': (480, 320), 'full': (1200, 800)})
+        for formato, formato_pil in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            with default_storage.open(imagenes['card'][formato]) as archivo:
+                derivado = Image.open(archivo)
+                self.assertEqual((derivado.format, derivado.size), (formato_pil, (480, 320)))
+
+    def test_nueva_imagen_reemplaza_los_derivados(self):
+        anteriores = self.subir('lomo.png', (2400, 1600), 'PNG')
+        imagenes = self.subir('otro.jpg', (300, 900), 'JPEG')
+
+        # full se ajusta al recuadro sin agrandar ni recortar
+        self.assertEqual((imagenes['full']['ancho'], imagenes['full']['alto']), (267, 800))
+        self.assertEqual((imagenes['thumb']['ancho'], imagenes['thumb']['alto']), (120, 120))
+        self.assertFalse(default_storage.exists(anteriores['thumb']['webp']))
+        self.assertTrue(default_storage.exists(imagenes['thumb']['webp']))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AjustarStockViewTests(TestCase):
+    def setUp(self):
+        self.client = cliente_admin()
+        self.ingrediente = Ingrediente.objects.create(
+            nombre='Harina', unidad_medida='kg', cantidad_disponible=Decimal('2'),
+            stock_minimo=Decimal('1'), precio_unitario=Decimal('1000')
+        )
+
+    def ajustar(self, cantidad):
+        return self.client.patch(
+            f'/api/menu/ingredientes/{self.ingrediente.pk}/ajustar_stock/',
+            {'cantidad': cantidad}, format='json'
+        )
+
+    def test_suma_la_cantidad(self):
+        response = self.ajustar('1.5')
+        self.assertEqual(response.status_code, 200)
+        self.ingrediente.refresh_from_db()
+        self.assertEqual(self.ingrediente.cantidad_disponible, Decimal('3.5'))
+
+    def test_stock_negativo_retorna_el_mensaje_del_servicio(self):
+        response = self.ajustar('-5')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'El stock no puede ser negativo: Harina (-3.000)')
+        self.ingrediente.refresh_from_db()
+        self.assertEqual(self.ingrediente.cantidad_disponible, Decimal('2'))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AjusteMasivoViewTests(TestCase):
+    def setUp(self):
+        self.client = cliente_admin()
+        self.ingredientes = [
+            Ingrediente.objects.create(
+                nombre=f'Ingrediente {i}', unidad_medida='kg', cantidad_disponible=Decimal('1'),
+                stock_minimo=Decimal('0'), precio_unitario=Decimal('1000')
+            )
+            for i in range(4)
+        ]
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.plato = Plato.objects.create(
+            nombre='Lomo', precio=Decimal('9000'), categoria=categoria, disponible=False
+        )
+        Receta.objects.create(
+            plato=self.plato, ingrediente=self.ingredientes[0], cantidad_requerida=Decimal('2')
+        )
+
+    def ajustar(self, tipo, cantidades):
+        items = [
+            {'ingrediente': ingrediente.pk, 'cantidad': cantidad}
+            for ingrediente, cantidad in zip(self.ingredientes, cantidades)
+        ]
+        return self.client.post(
+            '/api/menu/ingredientes/ajuste-masivo/', {'tipo': tipo, 'items': items}, format='json'
+        )
+
+    def cantidades(self):
+        return [
+            ingrediente.cantidad_disponible
+            for ingrediente in Ingrediente.objects.filter(pk__in=[i.pk for i in self.ingredientes]).order_by('pk')
+        ]
+
+    def test_recepcion_suma_y_actualiza_la_disponibilidad(self):
+        response = self.ajustar('recepcion', ['1.5', '0.25'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ajustados'], 2)
+        self.assertEqual(
+            [(i['cantidad_anterior'], i['cantidad_disponible']) for i in response.data['ingredientes']],
+            [('1.000', '2.500'), ('1.000', '1.250')]
+        )
+        self.assertEqual(self.cantidades(), [Decimal('2.5'), Decimal('1.25'), Decimal('1'), Decimal('1')])
+        self.assertEqual(
+            response.data['platos_actualizados'],
+            [{'id': self.plato.pk, 'nombre': 'Lomo', 'disponible': True}]
+        )
+        self.plato.refresh_from_db()
+        self.assertTrue(self.plato.disponible)
+
+    def test_conteo_fija_la_cantidad(self):
+        response = self.ajustar('conteo', ['5', '0'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cantidades()[:2], [Decimal('5'), Decimal('0')])
+
+    def test_stock_negativo_no_aplica_ningun_item(self):
+        response = self.ajustar('recepcion', ['10', '-3'])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'El stock no puede ser negativo: Ingrediente 1 (-2.000)')
+        self.assertEqual(self.cantidades(), [Decimal('1')] * 4)
+        self.plato.refresh_from_db()
+        self.assertFalse(self.plato.disponible)
+
+    def test_ingrediente_repetido_es_400(self):
+        response = self.client.post('/api/menu/ingredientes/ajuste-masivo/', {
+            'tipo': 'conteo',
+            'items': [
+                {'ingrediente': self.ingredientes[0].pk, 'cantidad': '1'},
+                {'ingrediente': self.ingredientes[0].pk, 'cantidad': '2'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cantidades()[0], Decimal('1'))
+
+    def test_bloquea_en_orden_de_pk_y_las_consultas_no_crecen_con_los_items(self):
+        # Primero el plato pasa a disponible; después ningún ajuste cambia platos
+        self.ajustar('recepcion', ['1'])
+        with CaptureQueriesContext(connection) as uno:
+            self.ajustar('recepcion', ['1'])
+        with CaptureQueriesContext(connection) as cuatro:
+            self.ajustar('recepcion', ['1', '1', '1', '1'])
+
+        self.assertEqual(len(cuatro), len(uno))
+        bloqueo = next(q['sql'] for q in cuatro.captured_queries if 'cantidad_disponible' in q['sql'])
+        self.assertRegex(bloqueo, r'ORDER BY (1|"menuApp_ingrediente"\."id") ASC')
+        actualizaciones = [q for q in cuatro.captured_queries if q['sql'].startswith('UPDATE "menuApp_ingrediente"')]
+        self.assertEqual(len(actualizaciones), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AlertasStockTests(TestCase):
+    def setUp(self):
+        self.channel_layer = get_channel_layer()
+        self.canal = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(GRUPO_STOCK, self.canal)
+        self.addCleanup(async_to_sync(self.channel_layer.group_discard), GRUPO_STOCK, self.canal)
+        self.harina, self.azucar = [
+            Ingrediente.objects.create(
+                nombre=nombre, unidad_medida='kg', cantidad_disponible=Decimal('10'),
+                stock_minimo=Decimal('5'), precio_unitario=Decimal('1000')
+            )
+            for nombre in ('Harina', 'Azúcar')
+        ]
+
+    def alertas(self):
+        """Alertas publicadas en el grupo 'stock' desde la última llamada"""
+        async def recibir():
+            mensajes = []
+            while True:
+                try:
+                    mensajes.append(await asyncio.wait_for(self.channel_layer.receive(self.canal), 0.1))
+                except asyncio.TimeoutError:
+                    return mensajes
+        return [
+            (alerta['event'], alerta['nombre'], alerta['cantidad_disponible'])
+            for mensaje in async_to_sync(recibir)() for alerta in mensaje['alertas']
+        ]
+
+    def ajustar(self, tipo, cantidades):
+        with self.captureOnCommitCallbacks(execute=True):
+            InventarioService.ajustar_stock_masivo(tipo, [
+                {'ingrediente': ingrediente, 'cantidad': Decimal(cantidad)}
+                for ingrediente, cantidad in cantidades.items()
+            ])
+
+    def test_publica_solo_los_cruces_del_minimo(self):
+        self.ajustar(InventarioService.CONTEO, {self.harina: '2', self.azucar: '6'})
+        self.assertEqual(self.alertas(), [('bajo_minimo', 'Harina', 2.0)])
+
+        self.ajustar(InventarioService.RECEPCION, {self.harina: '1', self.azucar: '1'})
+        self.assertEqual(self.alertas(), [])
+
+        self.ajustar(InventarioService.RECEPCION, {self.harina: '4'})
+        self.assertEqual(self.alertas(), [('repuesto', 'Harina', 7.0)])
+
+    def test_un_cruce_revertido_en_la_misma_transaccion_no_alerta(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            InventarioService.ajustar_stock_masivo(
+                InventarioService.CONTEO, [{'ingrediente': self.harina, 'cantidad': Decimal('1')}]
+            )
+            InventarioService.ajustar_stock_masivo(
+                InventarioService.CONTEO, [{'ingrediente': self.harina, 'cantidad': Decimal('8')}]
+            )
+        self.assertEqual(self.alertas(), [])
+
+    def test_cambio_del_minimo_alerta(self):
+        client = cliente_admin()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(
+                f'/api/menu/ingredientes/{self.harina.pk}/', {'stock_minimo': '12'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.alertas(), [('bajo_minimo', 'Harina', 10.0)])
+
+
+class StockConsumerTests(TestCase):
+    async def conectar(self, rol):
+        user = await User.objects.acreate_user(f'{rol}1', f'{rol}1@test.cl', 'clave-segura-123')
+        await Perfil.objects.aupdate_or_create(user=user, defaults={'rol': rol, 'nombre_completo': rol})
+        user = await User.objects.select_related('perfil').aget(pk=user.pk)
+        communicator = WebsocketCommunicator(StockConsumer.as_asgi(), '/ws/menu/stock/')
+        communicator.scope['user'] = user
+        conectado, codigo = await communicator.connect()
+        return communicator, conectado, codigo
+
+    async def test_solo_administradores(self):
+        _, conectado, codigo = await self.conectar('mesero')
+        self.assertFalse(conectado)
+        self.assertEqual(codigo, 4003)
+
+        communicator, conectado, _ = await self.conectar('admin')
+        self.assertTrue(conectado)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'connection_established')
+        await get_channel_layer().group_send(GRUPO_STOCK, {
+            'type': 'stock_alertas', 'alertas': [{'event': 'bajo_minimo', 'nombre': 'Harina'}],
+        })
+        mensaje = await communicator.receive_json_from()
+        self.assertEqual(mensaje['alertas'], [{'event': 'bajo_minimo', 'nombre': 'Harina'}])
+        await communicator.disconnect()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PronosticoViewTests(TestCase):
+    def setUp(self):
+        self.client = cliente_admin()
+
+    def crear_pronostico(self, horas=0):
+        pronostico = PronosticoDemanda.objects.create(
+            dias_historia=56, desde=timezone.localdate() - timedelta(days=56),
+            hasta=timezone.localdate() - timedelta(days=1), perfiles={}
+        )
+        PronosticoDemanda.objects.filter(pk=pronostico.pk).update(
+            fecha_calculo=timezone.now() - timedelta(hours=horas)
+        )
+        return pronostico
+
+    def get(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.get('/api/menu/ingredientes/pronostico/')
+        self.assertEqual(callbacks, [])
+        return response
+
+    def test_vigente(self):
+        self.crear_pronostico()
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['vencido'])
+
+    def test_vencido_responde_con_el_guardado_sin_recalcular(self):
+        pronostico = self.crear_pronostico(horas=48)
+
+        with mock.patch('menuApp.pronostico.calcular_perfiles') as calcular:
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['vencido'])
+        self.assertEqual(response.data['desde'], pronostico.desde)
+        calcular.assert_not_called()
+        self.assertEqual(PronosticoDemanda.objects.count(), 1)
+
+    def test_sin_pronostico_responde_202(self):
+        self.assertEqual(self.get().status_code, 202)
+        self.assertFalse(PronosticoDemanda.objects.exists())
+
+    def test_post_recalcular(self):
+        response = self.client.post('/api/menu/ingredientes/pronostico/recalcular/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PronosticoDemanda.objects.count(), 1)
+        self.assertEqual(response.data['dias_historia'], 56)
+        self.assertFalse(response.data['vencido'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ReposicionViewTests(TestCase):
+    def setUp(self):
+        self.client = cliente_admin()
+        self.hoy = timezone.localdate()
+        self.ingredientes = {
+            nombre: Ingrediente.objects.create(
+                nombre=nombre, unidad_medida='kg', cantidad_disponible=Decimal(cantidad),
+                stock_minimo=Decimal('20'), precio_unitario=Decimal('1000')
+            )
+            for nombre, cantidad in (('Harina', '100'), ('Aceite', '25'), ('Sal', '1000'))
+        }
+        # Consumo de 10 por día, todos los días, salvo la sal
+        self.pronostico = PronosticoDemanda.objects.create(
+            dias_historia=7, desde=self.hoy - timedelta(days=7), hasta=self.hoy - timedelta(days=1),
+            perfiles={
+                str(self.ingredientes['Harina'].pk): [10.0] * 7,
+                str(self.ingredientes['Aceite'].pk): [10.0] * 7,
+            }
+        )
+
+    def reposicion(self, parametros=''):
+        response = self.client.get(
+            f'/api/menu/ingredientes/reposicion/?dias_entrega=2&dias_cobertura=7{parametros}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return {fila['nombre']: fila for fila in response.data['ingredientes']}
+
+    def test_cuando_y_cuanto_pedir(self):
+        filas = self.reposicion()
+
+        # Harina cruza el mínimo el día 8; se pide 2 días antes lo que cubre 7 días desde la llegada
+        harina = filas['Harina']
+        self.assertEqual(harina['fecha_bajo_minimo'], self.hoy + timedelta(days=8))
+        self.assertEqual(harina['fecha_pedido'], self.hoy + timedelta(days=6))
+        self.assertEqual(harina['cantidad_sugerida'], Decimal('70.000'))
+        self.assertEqual(harina['costo_estimado'], Decimal('70000.00'))
+        self.assertFalse(harina['urgente'])
+
+        # Aceite cruza mañana: ya no alcanza a llegar a tiempo
+        aceite = filas['Aceite']
+        self.assertEqual(aceite['fecha_pedido'], self.hoy)
+        self.assertEqual(aceite['cantidad_sugerida'], Decimal('85.000'))
+        self.assertTrue(aceite['urgente'])
+
+        self.assertIsNone(filas['Sal']['fecha_pedido'])
+        self.assertEqual(filas['Sal']['cantidad_sugerida'], Decimal('0'))
+
+    def test_reservas_futuras_sobre_lo_habitual_suman_consumo(self):
+        sal = self.ingredientes['Sal']
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        plato = Plato.objects.create(nombre='Lomo', precio=Decimal('9000'), categoria=categoria)
+        Receta.objects.create(plato=plato, ingrediente=sal, cantidad_requerida=Decimal('5'))
+        mesa = Mesa.objects.create(numero=1, capacidad=8)
+        cliente = User.objects.create_user('cliente1', 'cliente1@test.cl', 'clave-segura-123')
+
+        def reservar(dia, personas, estado):
+            reserva, = Reserva.objects.bulk_create([Reserva(
+                cliente=cliente, mesa=mesa, fecha_reserva=self.hoy + timedelta(days=dia),
+                hora_inicio=time(13), hora_fin=time(15), num_personas=personas, estado=estado
+            )])
+            return reserva
+
+        # Ayer: 2 comensales reservados consumieron 2 platos (5 de sal por comensal)
+        pedido = Pedido.objects.create(mesa=mesa, reserva=reservar(-1, 2, 'completada'))
+        DetallePedido.objects.create(pedido=pedido, plato=plato, cantidad=2, precio_unitario=plato.precio)
+        Pedido.objects.filter(pk=pedido.pk).update(
+            fecha_creacion=timezone.make_aware(datetime.combine(self.hoy - timedelta(days=1), time(13)))
+        )
+        # Mañana: 6 comensales reservados, ninguno habitual ese día de la semana
+        reservar(1, 6, 'confirmada')
+
+        sal = self.reposicion('&horizonte=30')['Sal']
+        self.assertEqual(sal['comensales_reservados_extra'], 6.0)
+        self.assertEqual(sal['consumo_diario_esperado'], 1.0)
+
+    def test_csv_solo_con_lo_que_hay_que_pedir(self):
+        response = self.client.get('/api/menu/ingredientes/reposicion/?formato=csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        filas = response.content.decode('utf-8-sig').splitlines()
+        self.assertEqual(filas[0].split(',')[0], 'Ingrediente')
+        self.assertEqual(sorted(fila.split(',')[0] for fila in filas[1:]), ['Aceite', 'Harina'])
+
+    def test_parametro_no_entero_es_400(self):
+        response = self.client.get('/api/menu/ingredientes/reposicion/?horizonte=x')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'horizonte debe ser un número entero')
+
+    def test_sin_pronostico_responde_202(self):
+        self.pronostico.delete()
+        response = self.client.get('/api/menu/ingredientes/reposicion/')
+        self.assertEqual(response.status_code, 202)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class BuscarPlatosViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # El índice es por proceso: que no sobreviva a la BD de otro test
+        indice = mock.patch.object(busqueda, '_indice', None)
+        indice.start()
+        self.addCleanup(indice.stop)
+        self.client = cliente_admin()
+        self.entradas = CategoriaMenu.objects.create(nombre='Entradas')
+        fondos = CategoriaMenu.objects.create(nombre='Fondos')
+        self.pescado = Ingrediente.objects.create(
+            nombre='Pescado', unidad_medida='gr', cantidad_disponible=Decimal('1000')
+        )
+        self.ceviche = Plato.objects.create(nombre='Ceviche', precio=Decimal('7000'), categoria=self.entradas)
+        Receta.objects.create(plato=self.ceviche, ingrediente=self.pescado, cantidad_requerida=Decimal('150'))
+        self.ensalada = Plato.objects.create(
+            nombre='Ensalada de céviche', precio=Decimal('5000'), categoria=self.entradas, disponible=False
+        )
+        Plato.objects.create(
+            nombre='Pescado frito', descripcion='Con salsa de ceviche', precio=Decimal('8000'), categoria=fondos
+        )
+
+    def buscar(self, parametros):
+        response = self.client.get(f'/api/menu/platos/buscar/?{parametros}')
+        self.assertEqual(response.status_code, 200)
+        return [(plato['nombre'], plato['relevancia']) for plato in response.data]
+
+    def test_prefijo_sin_tildes_por_relevancia(self):
+        self.assertEqual(self.buscar('q=CEV'), [
+            ('Ceviche', 4), ('Ensalada de céviche', 3), ('Pescado frito', 1),
+        ])
+        # Palabra completa suma un bono
+        self.assertEqual(self.buscar('q=ceviche&limite=1'), [('Ceviche', 5)])
+
+    def test_todas_las_palabras_deben_coincidir(self):
+        self.assertEqual(self.buscar('q=ens+cev'), [('Ensalada de céviche', 7)])
+        self.assertEqual(self.buscar('q=ens+frito'), [])
+
+    def test_filtros(self):
+        self.assertEqual(
+            [nombre for nombre, _ in self.buscar(f'q=cev&categoria={self.entradas.pk}')],
+            ['Ceviche', 'Ensalada de céviche']
+        )
+        self.assertEqual(
+            [nombre for nombre, _ in self.buscar('q=cev&disponible=false')], ['Ensalada de céviche']
+        )
+
+    def test_porciones_con_el_stock_actual(self):
+        response = self.client.get('/api/menu/platos/buscar/?q=ceviche&limite=2')
+        self.assertEqual([p['porciones_restantes'] for p in response.data], [6, None])
+
+        Ingrediente.objects.filter(pk=self.pescado.pk).update(cantidad_disponible=Decimal('300'))
+        response = self.client.get('/api/menu/platos/buscar/?q=ceviche&limite=1')
+        self.assertEqual(response.data[0]['porciones_restantes'], 2)
+
+    def test_reconstruye_el_indice_al_cambiar_el_menu(self):
+        self.assertEqual(self.buscar('q=tiradito'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Plato.objects.create(nombre='Tiradito', precio=Decimal('7500'), categoria=self.entradas)
+        self.assertEqual(self.buscar('q=tiradito'), [('Tiradito', 5)])
+
+    def test_sin_consulta_es_400(self):
+        response = self.client.get('/api/menu/platos/buscar/?q=+')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Se requiere el parámetro q')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ImportarMenuViewTests(TestCase):
+    def setUp(self):
+        self.client = cliente_admin()
+        self.entradas = CategoriaMenu.objects.create(nombre='Entradas')
+        self.pescado = Ingrediente.objects.create(
+            nombre='Pescado', unidad_medida='gr', cantidad_disponible=Decimal('1000')
+        )
+        self.limon = Ingrediente.objects.create(
+            nombre='Limón', unidad_medida='un', cantidad_disponible=Decimal('0')
+        )
+        self.ceviche = Plato.objects.create(
+            nombre='Ceviche', precio=Decimal('7000'), categoria=self.entradas, disponible=False
+        )
+        Receta.objects.create(plato=self.ceviche, ingrediente=self.pescado, cantidad_requerida=Decimal('150'))
+        Receta.objects.create(plato=self.ceviche, ingrediente=self.limon, cantidad_requerida=Decimal('2'))
+        self.tiradito = Plato.objects.create(nombre='Tiradito', precio=Decimal('7500'), categoria=self.entradas)
+
+    def exportado(self):
+        return self.client.get('/api/menu/platos/exportar/').json()
+
+    def importar(self, menu, simular=False):
+        url = '/api/menu/platos/importar/' + ('?simular=true' if simular else '')
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, menu, format='json')
+
+    def modificado(self):
+        """El menú exportado con un precio nuevo, una receta sin limón, un plato nuevo y sin el tiradito"""
+        menu = self.exportado()
+        ceviche = next(plato for plato in menu['platos'] if plato['nombre'] == 'Ceviche')
+        ceviche['precio'] = '7200.00'
+        ceviche['recetas'] = [{'ingrediente': 'Pescado', 'cantidad_requerida': '180.000'}]
+        menu['platos'] = [ceviche, {
+            'nombre': 'Pescado frito', 'categoria': 'Fondos', 'precio': '8000',
+            'recetas': [{'ingrediente': 'Pescado', 'cantidad_requerida': '250'}],
+        }]
+        return menu
+
+    def test_importar_lo_exportado_no_cambia_nada(self):
+        version = VersionMenu.actual()
+        response = self.importar(self.exportado())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['platos'], {'creados': [], 'actualizados': [], 'desactivados': []})
+        self.assertEqual(response.data['recetas'], {'creadas': 0, 'actualizadas': 0, 'eliminadas': 0})
+        self.assertEqual(VersionMenu.actual(), version)
+
+    def test_aplica_la_diferencia(self):
+        version = VersionMenu.actual()
+        response = self.importar(self.modificado())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['categorias']['creadas'], ['Fondos'])
+        self.assertEqual(response.data['platos'], {
+            'creados': ['Pescado frito'], 'actualizados': ['Ceviche'], 'desactivados': ['Tiradito'],
+        })
+        self.assertEqual(response.data['recetas'], {'creadas': 1, 'actualizadas': 1, 'eliminadas': 1})
+        self.assertEqual(VersionMenu.actual(), version + 1)
+
+        self.ceviche.refresh_from_db()
+        self.assertEqual(self.ceviche.precio, Decimal('7200'))
+        self.assertEqual(
+            list(self.ceviche.recetas.values_list('ingrediente__nombre', 'cantidad_requerida')),
+            [('Pescado', Decimal('180'))]
+        )
+        # Sin el limón (sin stock) el ceviche queda disponible
+        self.assertTrue(self.ceviche.disponible)
+        self.assertEqual(
+            response.data['platos_actualizados'], [{'id': self.ceviche.pk, 'nombre': 'Ceviche', 'disponible': True}]
+        )
+        self.assertFalse(Plato.objects.get(pk=self.tiradito.pk).activo)
+        self.assertEqual(Plato.objects.get(nombre='Pescado frito').categoria.nombre, 'Fondos')
+
+    def test_simular_no_guarda(self):
+        antes = self.exportado()
+        response = self.importar(self.modificado(), simular=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['simulacion'])
+        self.assertEqual(response.data['platos']['desactivados'], ['Tiradito'])
+        self.assertEqual(self.exportado(), antes)
+
+    def test_ingrediente_inexistente_no_aplica_nada(self):
+        menu = self.modificado()
+        menu['platos'][1]['recetas'].append({'ingrediente': 'Merluza', 'cantidad_requerida': '1'})
+        antes = self.exportado()
+
+        response = self.importar(menu)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Ingredientes inexistentes: Merluza')
+        self.assertEqual(self.exportado(), antes)
+
+    def test_csv(self):
+        csv = self.client.get('/api/menu/platos/exportar/?formato=csv').content.decode('utf-8')
+        self.assertEqual(len(csv.splitlines()), 4)
+
+        archivo = SimpleUploadedFile('menu.csv', csv.replace('7000.00', '6500').encode('utf-8'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/menu/platos/importar/', {'archivo': archivo}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['platos']['actualizados'], ['Ceviche'])
+        self.assertEqual(response.data['recetas'], {'creadas': 0, 'actualizadas': 0, 'eliminadas': 0})
+        self.assertEqual(Plato.objects.get(pk=self.ceviche.pk).precio, Decimal('6500'))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ReconciliarDisponibilidadTests(TestCase):
+    def setUp(self):
+        self.client = cliente_admin()
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        carne, arroz = [
+            Ingrediente.objects.create(nombre=nombre, unidad_medida='gr', cantidad_disponible=Decimal(cantidad))
+            for nombre, cantidad in (('Carne', '100'), ('Arroz', '500'))
+        ]
+        # (nombre, disponible guardado, receta)
+        self.platos = {}
+        for nombre, disponible, recetas in (
+            ('Lomo', True, [(carne, '200')]),
+            ('Arroz chaufa', False, [(arroz, '150'), (carne, '50')]),
+            ('Pan amasado', True, []),
+            ('Carne mechada', False, [(carne, '150'), (arroz, '100')]),
+        ):
+            plato = Plato.objects.create(
+                nombre=nombre, precio=Decimal('5000'), categoria=categoria, disponible=disponible
+            )
+            for ingrediente, cantidad in recetas:
+                Receta.objects.create(plato=plato, ingrediente=ingrediente, cantidad_requerida=Decimal(cantidad))
+            self.platos[nombre] = plato
+
+    def disponibles(self):
+        return dict(Plato.objects.values_list('nombre', 'disponible'))
+
+    def test_simular_informa_sin_corregir(self):
+        antes = self.disponibles()
+        response = self.client.post('/api/menu/platos/reconciliar-disponibilidad/?simular=true')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['revisados'], response.data['corregidos']), (4, 2))
+        self.assertEqual(
+            sorted((plato['nombre'], plato['disponible']) for plato in response.data['platos']),
+            [('Arroz chaufa', True), ('Lomo', False)]
+        )
+        self.assertEqual(self.disponibles(), antes)
+
+    def test_corrige_con_el_mismo_criterio_que_verificar_disponibilidad(self):
+        version = VersionMenu.actual()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/menu/platos/reconciliar-disponibilidad/')
+
+        self.assertEqual(response.data['corregidos'], 2)
+        for plato in Plato.objects.all():
+            self.assertEqual(plato.disponible, plato.verificar_disponibilidad(), plato.nombre)
+        self.assertEqual(VersionMenu.actual(), version + 1)
+
+        response = self.client.post('/api/menu/platos/reconciliar-disponibilidad/')
+        self.assertEqual(response.data['corregidos'], 0)
+
+    def test_comando_dry_run(self):
+        salida = StringIO()
+        call_command('reconciliar_disponibilidad', dry_run=True, stdout=salida)
+
+        self.assertIn('Lomo: pasa a no disponible', salida.getvalue())
+        self.assertIn('2 de 4 platos con disponibilidad incorrecta', salida.getvalue())
+        self.assertFalse(self.disponibles()['Arroz chaufa'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CostosViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = cliente_admin()
+        categoria = CategoriaMenu.objects.create(nombre='Fondos')
+        self.carne = Ingrediente.objects.create(
+            nombre='Carne', unidad_medida='gr', unidad_precio='kg', precio_unitario=Decimal('10000')
+        )
+        self.lomo = Plato.objects.create(nombre='Lomo', precio=Decimal('8000'), categoria=categoria)
+        Receta.objects.create(plato=self.lomo, ingrediente=self.carne, cantidad_requerida=Decimal('200'))
+        self.cazuela = Plato.objects.create(nombre='Cazuela', precio=Decimal('6000'), categoria=categoria)
+        Receta.objects.create(plato=self.cazuela, ingrediente=self.carne, cantidad_requerida=Decimal('300'))
+        sin_precio = Ingrediente.objects.create(nombre='Zapallo', unidad_medida='gr')
+        Receta.objects.create(plato=self.cazuela, ingrediente=sin_precio, cantidad_requerida=Decimal('100'))
+
+    def costos(self):
+        response = self.client.get('/api/menu/platos/costos/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_costo_y_margen_con_conversion_de_unidades(self):
+        datos = self.costos()
+
+        # De menor a mayor margen %
+        cazuela, lomo = datos['platos']
+        self.assertEqual(
+            (lomo['costo'], lomo['margen'], lomo['margen_porcentaje'], lomo['food_cost_porcentaje']),
+            (Decimal('2000.00'), Decimal('6000.00'), Decimal('75.00'), Decimal('25.00'))
+        )
+        self.assertTrue(lomo['completo'])
+        self.assertEqual((cazuela['nombre'], cazuela['costo']), ('Cazuela', Decimal('3000.00')))
+        self.assertFalse(cazuela['completo'])
+        self.assertEqual(datos['incompletos'], 1)
+        self.assertEqual(datos['food_cost_promedio'], Decimal('35.71'))
+
+    def test_cambio_de_precio_recalcula(self):
+        self.costos()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.carne.precio_unitario = Decimal('20000')
+            self.carne.save()
+
+        lomo = next(plato for plato in self.costos()['platos'] if plato['id'] == self.lomo.pk)
+        self.assertEqual(lomo['costo'], Decimal('4000.00'))
+
+    def test_categoria_no_entera_es_400(self):
+        response = self.client.get('/api/menu/platos/costos/?categoria=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'categoria debe ser un número entero')
@@ -1,9 +1,16 @@
+import json
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.throttling import AnonRateThrottle
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.http import HttpResponse
+from django.utils import timezone
+from decimal import Decimal, InvalidOperation
 
 from .models import CategoriaMenu, Ingrediente, Plato, Receta
 from .serializers import (
@@ -11,12 +18,27 @@ from .serializers import (
     IngredienteSerializer,
     PlatoSerializer,
     PlatoListSerializer,
-    RecetaSerializer
+    RecetaSerializer,
+    AjusteStockMasivoSerializer,
+    MenuImportacionSerializer
 )
 from .filters import IngredienteFilter, PlatoFilter
+from .alertas_stock import registrar_movimiento
+from .busqueda import LIMITE_DEFAULT, buscar_platos
+from .cache import menu_cacheado
+from .costos import obtener_costos
+from . import importacion
+from .pronostico import calcular_perfiles, obtener_perfiles, proyectar, vencido
+from .reposicion import escribir_csv, sugerir_reposicion
+from .services import InventarioService
 from mainApp.permissions import IsAdministrador
 
 
+class MenuRateThrottle(AnonRateThrottle):
+    """Rate limiting del menú público: respuestas cacheadas, límite más alto que 'anon'"""
+    scope = 'menu'
+
+
 class CategoriaMenuViewSet(viewsets.ModelViewSet):
     """ViewSet para gestión de categorías del menú"""
     queryset = CategoriaMenu.objects.all()
@@ -29,6 +51,15 @@ class CategoriaMenuViewSet(viewsets.ModelViewSet):
             return [IsAuthenticatedOrReadOnly()]
         return [IsAuthenticated(), IsAdministrador()]
 
+    def get_throttles(self):
+        if self.action == 'list':
+            return [MenuRateThrottle()]
+        return super().get_throttles()
+
+    @menu_cacheado
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class IngredienteViewSet(viewsets.ModelViewSet):
     """ViewSet para gestión de ingredientes e inventario"""
@@ -42,6 +73,15 @@ class IngredienteViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [IsAuthenticated(), IsAdministrador()]
 
+    def perform_update(self, serializer):
+        """Guardar, alertar si la edición cruza el stock mínimo y ajustar la disponibilidad"""
+        cantidad_anterior = serializer.instance.cantidad_disponible
+        minimo_anterior = serializer.instance.stock_minimo
+        ingrediente = serializer.save()
+        registrar_movimiento(ingrediente, cantidad_anterior, minimo_anterior)
+        if ingrediente.cantidad_disponible != cantidad_anterior:
+            InventarioService.actualizar_disponibilidad([ingrediente.pk])
+
     @action(detail=False, methods=['get'])
     def bajo_minimo(self, request):
         """Retorna ingredientes con stock bajo el mínimo"""
@@ -52,6 +92,102 @@ class IngredienteViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(ingredientes, many=True)
         return Response(serializer.data)
 
+    @staticmethod
+    def _horizonte(request):
+        try:
+            return int(request.query_params.get('horizonte', 30))
+        except (TypeError, ValueError):
+            return 30
+
+    @staticmethod
+    def _pronostico_pendiente():
+        return Response(
+            {'message': 'Aún no hay pronóstico: se calcula cada noche o con POST pronostico/recalcular'},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @staticmethod
+    def _respuesta_pronostico(pronostico, horizonte):
+        return Response({
+            'calculado': pronostico.fecha_calculo,
+            'vencido': vencido(pronostico),
+            'desde': pronostico.desde,
+            'hasta': pronostico.hasta,
+            'dias_historia': pronostico.dias_historia,
+            'horizonte': horizonte,
+            'ingredientes': proyectar(pronostico, horizonte),
+        })
+
+    @action(detail=False, methods=['get'])
+    def pronostico(self, request):
+        """
+        GET /api/menu/ingredientes/pronostico/?horizonte=30
+
+        Consumo esperado por día de la semana y días hasta el quiebre de
+        stock de cada ingrediente activo, primero los más urgentes. Usa el
+        último perfil guardado, aunque esté vencido ('vencido': true); el
+        recálculo queda para el comando nocturno o pronostico/recalcular.
+        """
+        pronostico = obtener_perfiles()
+        if pronostico is None:
+            return self._pronostico_pendiente()
+        return self._respuesta_pronostico(pronostico, self._horizonte(request))
+
+    @action(detail=False, methods=['post'], url_path='pronostico/recalcular')
+    def recalcular_pronostico(self, request):
+        """
+        POST /api/menu/ingredientes/pronostico/recalcular/?horizonte=30
+
+        Rehace el perfil de consumo desde el historial y retorna el pronóstico.
+        """
+        return self._respuesta_pronostico(calcular_perfiles(), self._horizonte(request))
+
+    @action(detail=False, methods=['get'])
+    def reposicion(self, request):
+        """
+        GET /api/menu/ingredientes/reposicion/?dias_entrega=2&dias_cobertura=7&horizonte=30
+
+        Cuándo y cuánto pedir de cada ingrediente según el perfil de consumo
+        y las reservas futuras. Con ?formato=csv descarga solo los
+        ingredientes con cantidad sugerida, para enviar al proveedor.
+        """
+        parametros = {}
+        for nombre in ('dias_entrega', 'dias_cobertura', 'horizonte'):
+            valor = request.query_params.get(nombre)
+            if valor is None:
+                continue
+            try:
+                parametros[nombre] = int(valor)
+            except ValueError:
+                return Response(
+                    {'error': f'{nombre} debe ser un número entero'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        pronostico = obtener_perfiles()
+        if pronostico is None:
+            return self._pronostico_pendiente()
+        sugerencias = sugerir_reposicion(pronostico, **parametros)
+
+        if request.query_params.get('formato') == 'csv':
+            response = HttpResponse(content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = (
+                f'attachment; filename="reposicion_{timezone.localdate().isoformat()}.csv"'
+            )
+            # BOM para que Excel reconozca UTF-8 (tildes en los nombres)
+            response.write('\ufeff')
+            escribir_csv(sugerencias, response)
+            return response
+
+        return Response({
+            'calculado': pronostico.fecha_calculo,
+            'vencido': vencido(pronostico),
+            'dias_historia': pronostico.dias_historia,
+            'a_pedir': sum(1 for s in sugerencias if s['cantidad_sugerida'] > 0),
+            'urgentes': sum(1 for s in sugerencias if s['urgente']),
+            'ingredientes': sugerencias,
+        })
+
     @action(detail=True, methods=['patch'])
     def ajustar_stock(self, request, pk=None):
         """Ajusta el stock de un ingrediente (suma o resta)"""
@@ -65,26 +201,70 @@ class IngredienteViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            cantidad = float(cantidad)
-        except (ValueError, TypeError):
+            cantidad = Decimal(str(cantidad))
+        except (InvalidOperation, ValueError, TypeError):
             return Response(
                 {'error': 'La cantidad debe ser un número'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        nueva_cantidad = float(ingrediente.cantidad_disponible) + cantidad
-        if nueva_cantidad < 0:
+        # Suma con F() en la BD: dos ajustes simultáneos no se pisan
+        try:
+            InventarioService.ajustar_stock_masivo(
+                InventarioService.RECEPCION,
+                [{'ingrediente': ingrediente, 'cantidad': cantidad}]
+            )
+        except ValidationError as e:
             return Response(
-                {'error': 'El stock no puede ser negativo'},
+                {'error': ' '.join(e.messages)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ingrediente.cantidad_disponible = nueva_cantidad
-        ingrediente.save()
-
+        ingrediente.refresh_from_db()
         serializer = self.get_serializer(ingrediente)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='ajuste-masivo')
+    def ajuste_masivo(self, request):
+        """
+        POST /api/menu/ingredientes/ajuste-masivo/
+
+        Body:
+        {
+            "tipo": "recepcion" | "conteo",
+            "items": [{"ingrediente": 1, "cantidad": "2.500"}, ...]
+        }
+
+        Aplica todos los items o ninguno y recalcula la disponibilidad de
+        los platos afectados una sola vez.
+        """
+        serializer = AjusteStockMasivoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            resumen = InventarioService.ajustar_stock_masivo(
+                serializer.validated_data['tipo'],
+                serializer.validated_data['items']
+            )
+        except ValidationError as e:
+            return Response(
+                {'error': ' '.join(e.messages)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'tipo': resumen['tipo'],
+            'ajustados': resumen['ajustados'],
+            'ingredientes': [
+                {
+                    **IngredienteSerializer(item['ingrediente']).data,
+                    'cantidad_anterior': f"{item['cantidad_anterior']:.3f}",
+                }
+                for item in resumen['ingredientes']
+            ],
+            'platos_actualizados': resumen['platos_actualizados'],
+        })
+
 
 class PlatoViewSet(viewsets.ModelViewSet):
     """ViewSet para gestión de platos del menú"""
@@ -100,8 +280,19 @@ class PlatoViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'disponibilidad']:
             return [IsAuthenticatedOrReadOnly()]
+        if self.action == 'buscar':
+            return [IsAuthenticated()]
         return [IsAuthenticated(), IsAdministrador()]
 
+    def get_throttles(self):
+        if self.action == 'list':
+            return [MenuRateThrottle()]
+        return super().get_throttles()
+
+    @menu_cacheado
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=True, methods=['get', 'post'])
     def receta(self, request, pk=None):
         """Ver o añadir ingredientes a la receta del plato"""
@@ -130,6 +321,157 @@ class PlatoViewSet(viewsets.ModelViewSet):
         serializer = PlatoListSerializer(platos_disponibles, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """
+        GET /api/menu/platos/buscar/?q=cev&limite=20&categoria=1&disponible=true
+
+        Búsqueda por prefijo sin tildes en nombre, categoría y descripción
+        de los platos activos, ordenada por relevancia, con las porciones
+        que alcanzan con el stock actual.
+        """
+        consulta = request.query_params.get('q', '').strip()
+        if not consulta:
+            return Response(
+                {'error': 'Se requiere el parámetro q'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limite = int(request.query_params.get('limite', LIMITE_DEFAULT))
+            categoria = request.query_params.get('categoria')
+            categoria = int(categoria) if categoria else None
+        except ValueError:
+            return Response(
+                {'error': 'limite y categoria deben ser números enteros'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        disponible = request.query_params.get('disponible')
+        if disponible is not None:
+            disponible = disponible.lower() in ('true', '1')
+
+        return Response(buscar_platos(consulta, limite, categoria, disponible))
+
+    @action(detail=False, methods=['post'], url_path='reconciliar-disponibilidad')
+    def reconciliar_disponibilidad(self, request):
+        """
+        POST /api/menu/platos/reconciliar-disponibilidad/?simular=true
+
+        Recalcula la disponibilidad de todos los platos según el stock
+        actual y corrige (salvo con ?simular=true) los que no coinciden.
+        """
+        resumen = InventarioService.reconciliar_disponibilidad(
+            simular=request.query_params.get('simular') == 'true'
+        )
+        return Response(resumen)
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        GET /api/menu/platos/exportar/?formato=json|csv
+
+        Menú completo (categorías, platos y recetas por nombre) en el mismo
+        formato que acepta /importar/.
+        """
+        menu = importacion.exportar_menu()
+        if request.query_params.get('formato') == 'csv':
+            response = HttpResponse(content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = (
+                f'attachment; filename="menu_{timezone.localdate().isoformat()}.csv"'
+            )
+            importacion.escribir_csv(menu, response)
+            return response
+        return Response(menu)
+
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """
+        POST /api/menu/platos/importar/?simular=true
+
+        Body: el JSON de /exportar/, o un archivo 'archivo' (.json o .csv).
+        Crea, actualiza y desactiva según la diferencia con el menú actual,
+        todo en una transacción. Con ?simular=true solo informa los cambios.
+        """
+        archivo = request.FILES.get('archivo')
+        if archivo is not None:
+            try:
+                texto = archivo.read().decode('utf-8-sig')
+                if archivo.name.lower().endswith('.csv'):
+                    datos = importacion.leer_csv(texto)
+                else:
+                    datos = json.loads(texto)
+            except (UnicodeDecodeError, ValueError):
+                return Response(
+                    {'error': 'El archivo debe ser un CSV o JSON en UTF-8'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            datos = request.data
+
+        serializer = MenuImportacionSerializer(data=datos)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            resumen = importacion.importar_menu(
+                serializer.validated_data,
+                simular=request.query_params.get('simular') == 'true'
+            )
+        except ValidationError as e:
+            return Response(
+                {'error': ' '.join(e.messages)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(resumen)
+
+    @action(detail=False, methods=['get'])
+    def costos(self, request):
+        """
+        GET /api/menu/platos/costos/
+
+        Costo por porción y margen de todos los platos, de menor a mayor
+        margen %. Parámetros: categoria, activo.
+        """
+        try:
+            categoria = request.query_params.get('categoria')
+            categoria = int(categoria) if categoria else None
+        except ValueError:
+            return Response(
+                {'error': 'categoria debe ser un número entero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        costos = obtener_costos()
+        platos = Plato.objects.select_related('categoria').only(
+            'id', 'nombre', 'precio', 'activo', 'categoria__nombre'
+        )
+        if categoria is not None:
+            platos = platos.filter(categoria_id=categoria)
+        activo = request.query_params.get('activo')
+        if activo is not None:
+            platos = platos.filter(activo=activo.lower() in ('true', '1'))
+
+        resultados = [
+            {
+                'id': plato.pk,
+                'nombre': plato.nombre,
+                'categoria': plato.categoria.nombre,
+                'precio': plato.precio,
+                **costos.get(plato.pk, {}),
+            }
+            for plato in platos
+        ]
+        resultados.sort(key=lambda r: (r.get('margen_porcentaje') is None, r.get('margen_porcentaje')))
+
+        ventas = sum((r['precio'] for r in resultados), Decimal('0'))
+        costo_total = sum((r['costo'] for r in resultados if 'costo' in r), Decimal('0'))
+        return Response({
+            'total_platos': len(resultados),
+            'incompletos': sum(1 for r in resultados if not r.get('completo', True)),
+            'food_cost_promedio': round(costo_total * 100 / ventas, 2) if ventas else None,
+            'platos': resultados,
+        })
+
     @action(detail=True, methods=['post'])
     def verificar(self, request, pk=None):
         """Verifica y actualiza la disponibilidad de un plato"""
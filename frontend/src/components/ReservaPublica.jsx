@@ -1,5 +1,6 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { getMesas, registerAndReserve, getHorasDisponibles } from '../services/reservasApi';
+import { obtenerClaveIdempotencia } from '../utils/idempotencia';
 import {
   validarEmail,
   validarPassword,
@@ -38,6 +39,7 @@ export default function ReservaPublica({ onReservaExitosa }) {
   const [mostrarModalUsuarioExistente, setMostrarModalUsuarioExistente] = useState(false);
   const [datosUsuarioExistente, setDatosUsuarioExistente] = useState(null);
   const [reservasPendientes, setReservasPendientes] = useState(null); // Guardar datos para reenviar
+  const idempotenciaRef = useRef(null); // Idempotency-Key del envío en curso
 
   // Reglas de validación
   const validationRules = {
@@ -293,7 +295,9 @@ export default function ReservaPublica({ onReservaExitosa }) {
       }
 
       // Registrar y reservar
-      const result = await registerAndReserve(values);
+      // Reintentos del mismo envío reutilizan la clave: el backend no duplica la reserva
+      const result = await registerAndReserve(values, obtenerClaveIdempotencia(idempotenciaRef, values));
+      idempotenciaRef.current = null;
       console.log('✅ API Response:', result);
 
       // FIX #231: Verificar si requiere confirmación de usuario existente
@@ -375,7 +379,11 @@ export default function ReservaPublica({ onReservaExitosa }) {
         confirm_existing: true
       };
 
-      const result = await registerAndReserve(datosConConfirmacion);
+      const result = await registerAndReserve(
+        datosConConfirmacion,
+        obtenerClaveIdempotencia(idempotenciaRef, datosConConfirmacion)
+      );
+      idempotenciaRef.current = null;
       console.log('✅ Reserva creada con usuario existente:', result);
 
       // Continuar con flujo normal de confirmación
@@ -1,11 +1,13 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import {
   Container, Row, Col, Card, Table, Button, Form, Badge,
   Spinner, Alert, Modal, InputGroup, ListGroup, ButtonGroup
 } from 'react-bootstrap';
-import { crearPedido } from '../../services/cocinaApi';
-import { getCategorias, getPlatos } from '../../services/menuApi';
+import { crearPedido, cotizarPedido } from '../../services/cocinaApi';
+import { obtenerClaveIdempotencia } from '../../utils/idempotencia';
+import { getCategorias, getPlatos, buscarPlatos } from '../../services/menuApi';
 import { getMesas } from '../../services/reservasApi';
+import { ImagenPlato } from '../common/ImagenPlato';
 
 // Estilos CSS para animaciones
 const styles = `
@@ -68,11 +70,13 @@ function CrearPedido({ mesaPreseleccionada = null, reservaPreseleccionada = null
   const [carrito, setCarrito] = useState([]); // [{plato, cantidad, notas}]
   const [notasPedido, setNotasPedido] = useState('');
   const [enviando, setEnviando] = useState(false);
+  const idempotenciaRef = useRef(null); // Idempotency-Key del envío en curso
 
   // Estados de UI
   const [categoriaActiva, setCategoriaActiva] = useState(null);
   const [showConfirmacion, setShowConfirmacion] = useState(false);
   const [busqueda, setBusqueda] = useState('');
+  const [resultadosBusqueda, setResultadosBusqueda] = useState(null); // null = sin búsqueda en servidor
 
   // Cargar datos iniciales
   useEffect(() => {
@@ -179,9 +183,22 @@ function CrearPedido({ mesaPreseleccionada = null, reservaPreseleccionada = null
         }))
       };
 
+      // Verificar stock antes de crear (sin bloquear filas en el backend)
+      const cotizacion = await cotizarPedido(pedidoData);
+      if (!cotizacion.factible) {
+        const motivos = cotizacion.detalles
+          .filter(linea => !linea.factible)
+          .map(linea => linea.motivo);
+        setError(motivos.join('. '));
+        setShowConfirmacion(false);
+        return;
+      }
+
       console.log('📤 Enviando pedido:', pedidoData);
 
-      const resultado = await crearPedido(pedidoData);
+      // Reintentos del mismo pedido reutilizan la clave: el backend no lo duplica
+      const resultado = await crearPedido(pedidoData, obtenerClaveIdempotencia(idempotenciaRef, pedidoData));
+      idempotenciaRef.current = null;
 
       console.log('✅ Pedido creado exitosamente:', resultado);
 
@@ -208,13 +225,42 @@ function CrearPedido({ mesaPreseleccionada = null, reservaPreseleccionada = null
     }
   };
 
-  // Filtrar platos
-  const platosFiltrados = (platos || []).filter(p => {
-    const matchCategoria = !categoriaActiva || p.categoria === categoriaActiva;
-    const matchBusqueda = !busqueda ||
-      p.nombre.toLowerCase().includes(busqueda.toLowerCase());
-    return matchCategoria && matchBusqueda;
-  });
+  // Búsqueda en el servidor (sin tildes, por prefijo, con porciones restantes)
+  useEffect(() => {
+    const texto = busqueda.trim();
+    if (!texto) {
+      setResultadosBusqueda(null);
+      return;
+    }
+    let vigente = true;
+    const timer = setTimeout(async () => {
+      try {
+        const resultados = await buscarPlatos(texto, { disponible: true, limite: 50 });
+        if (vigente) setResultadosBusqueda(resultados || []);
+      } catch {
+        // Si falla, se usa el filtro local
+        if (vigente) setResultadosBusqueda(null);
+      }
+    }, 150);
+    return () => {
+      vigente = false;
+      clearTimeout(timer);
+    };
+  }, [busqueda]);
+
+  // Filtrar platos: con búsqueda, en el orden de relevancia y en todas las categorías
+  const platosPorId = new Map((platos || []).map(p => [p.id, p]));
+  const porcionesPorPlato = new Map(
+    (resultadosBusqueda || []).map(r => [r.id, r.porciones_restantes])
+  );
+  const platosFiltrados = resultadosBusqueda
+    ? resultadosBusqueda.map(r => platosPorId.get(r.id)).filter(Boolean)
+    : (platos || []).filter(p => {
+      const matchCategoria = !categoriaActiva || p.categoria === categoriaActiva;
+      const matchBusqueda = !busqueda ||
+        p.nombre.toLowerCase().includes(busqueda.toLowerCase());
+      return matchCategoria && matchBusqueda;
+    });
 
   // Limpiar mensajes
   useEffect(() => {
@@ -317,11 +363,10 @@ function CrearPedido({ mesaPreseleccionada = null, reservaPreseleccionada = null
                           )}
                           <div className="mb-2">
                             {plato.imagen ? (
-                              <img
-                                src={plato.imagen}
-                                alt={plato.nombre}
+                              <ImagenPlato
+                                plato={plato}
+                                tamano="thumb"
                                 className="rounded"
-                                loading="lazy"
                                 style={{ width: '60px', height: '60px', objectFit: 'cover' }}
                               />
                             ) : (
@@ -337,6 +382,11 @@ function CrearPedido({ mesaPreseleccionada = null, reservaPreseleccionada = null
                           <div className="text-primary fw-bold">
                             ${Number(plato.precio).toLocaleString('es-CL')}
                           </div>
+                          {porcionesPorPlato.get(plato.id) != null && (
+                            <div className="text-muted small">
+                              Quedan {porcionesPorPlato.get(plato.id)}
+                            </div>
+                          )}
                         </Card.Body>
                       </Card>
                     </Col>
@@ -0,0 +1,40 @@
+/**
+ * Imagen de un plato usando el derivado del tamaño que se muestra
+ * (WebP con respaldo JPEG). Si el plato aún no tiene derivados usa la
+ * imagen original.
+ *
+ * @param {Object} plato - Plato con `imagen` e `imagenes` ({thumb, card, full})
+ * @param {string} tamano - 'thumb' | 'card' | 'full'
+ */
+export function ImagenPlato({ plato, tamano = 'card', className = '', style, ...props }) {
+  const derivado = plato.imagenes?.[tamano];
+
+  if (!derivado) {
+    return (
+      <img
+        src={plato.imagen}
+        alt={plato.nombre}
+        className={className}
+        loading="lazy"
+        style={style}
+        {...props}
+      />
+    );
+  }
+
+  return (
+    <picture>
+      <source srcSet={derivado.webp} type="image/webp" />
+      <img
+        src={derivado.jpeg}
+        width={derivado.ancho}
+        height={derivado.alto}
+        alt={plato.nombre}
+        className={className}
+        loading="lazy"
+        style={style}
+        {...props}
+      />
+    </picture>
+  );
+}
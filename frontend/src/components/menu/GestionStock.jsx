@@ -1,12 +1,13 @@
-import { useState, useEffect, useMemo } from 'react';
+import { useState, useEffect, useMemo, useCallback } from 'react';
 import {
   Container, Row, Col, Card, Table, Button, Modal, Form,
   Badge, Spinner, Alert, InputGroup, ProgressBar, OverlayTrigger, Tooltip
 } from 'react-bootstrap';
 import {
   crearIngrediente, actualizarIngrediente,
-  eliminarIngrediente, getIngredientesPaginated
+  eliminarIngrediente, getIngredientesPaginated, ajustarStockMasivo
 } from '../../services/menuApi';
+import { useWebSocket } from '../../hooks/useWebSocket';
 
 // Estilos CSS para animaciones
 const styles = `
@@ -93,6 +94,31 @@ function GestionStock() {
     cargarDatos();
   }, []);
 
+  // Alertas en tiempo real: el servidor avisa solo cuando un ingrediente
+  // cruza su stock mínimo (pedidos, cancelaciones, recepciones, conteos)
+  const handleAlertaStock = useCallback((data) => {
+    if (data.type !== 'stock_alertas') return;
+
+    const alertas = new Map(data.alertas.map(a => [a.ingrediente, a]));
+    setIngredientes(prev => prev.map(i => {
+      const alerta = alertas.get(i.id);
+      if (!alerta) return i;
+      return {
+        ...i,
+        cantidad_disponible: alerta.cantidad_disponible,
+        stock_minimo: alerta.stock_minimo,
+        bajo_stock: alerta.event === 'bajo_minimo'
+      };
+    }));
+
+    const bajos = data.alertas.filter(a => a.event === 'bajo_minimo').map(a => a.nombre);
+    const repuestos = data.alertas.filter(a => a.event === 'repuesto').map(a => a.nombre);
+    if (bajos.length) setError(`Stock bajo el mínimo: ${bajos.join(', ')}`);
+    if (repuestos.length) setSuccess(`Stock repuesto: ${repuestos.join(', ')}`);
+  }, []);
+
+  useWebSocket('/ws/menu/stock/', { onMessage: handleAlertaStock });
+
   // ✅ Cargar TODOS los ingredientes para contadores consistentes
   const cargarDatos = async () => {
     try {
@@ -185,6 +211,7 @@ function GestionStock() {
       cantidad_disponible: parseFloat(formData.get('cantidad_disponible')),
       stock_minimo: parseFloat(formData.get('stock_minimo')),
       precio_unitario: parseFloat(formData.get('precio_unitario')),
+      unidad_precio: formData.get('unidad_precio'),
       activo: formData.get('activo') === 'on'
     };
 
@@ -240,22 +267,18 @@ function GestionStock() {
     const tipo = formData.get('tipo');
     const cantidad = parseFloat(formData.get('cantidad'));
 
-    let nuevaCantidad;
-    if (tipo === 'agregar') {
-      nuevaCantidad = parseFloat(ingredienteAjuste.cantidad_disponible) + cantidad;
-    } else {
-      nuevaCantidad = parseFloat(ingredienteAjuste.cantidad_disponible) - cantidad;
-    }
-
-    if (nuevaCantidad < 0) {
+    if (tipo !== 'agregar' && parseFloat(ingredienteAjuste.cantidad_disponible) - cantidad < 0) {
       setError('La cantidad no puede ser negativa');
       return;
     }
 
     try {
-      const ingredienteActualizado = await actualizarIngrediente(ingredienteAjuste.id, {
-        cantidad_disponible: nuevaCantidad
-      });
+      // Se envía la diferencia (no el total) para no pisar ajustes concurrentes
+      const resumen = await ajustarStockMasivo('recepcion', [{
+        ingrediente: ingredienteAjuste.id,
+        cantidad: tipo === 'agregar' ? cantidad : -cantidad
+      }]);
+      const ingredienteActualizado = resumen.ingredientes[0];
 
       // ✅ ÚNICO setState con prev =>
       setIngredientes(prev => prev.map(i =>
@@ -737,8 +760,18 @@ function GestionStock() {
                       defaultValue={ingredienteEditar?.precio_unitario || 0}
                       required
                     />
+                    <Form.Select
+                      name="unidad_precio"
+                      defaultValue={ingredienteEditar?.unidad_precio || ''}
+                      style={{ maxWidth: '8rem' }}
+                    >
+                      <option value="">por unidad</option>
+                      {UNIDADES_MEDIDA.map(u => (
+                        <option key={u.value} value={u.value}>por {u.value}</option>
+                      ))}
+                    </Form.Select>
                   </InputGroup>
-                  <div className="field-hint mt-1">Costo base para valorización.</div>
+                  <div className="field-hint mt-1">Costo base para valorización (p.ej. stock en gr, precio por kg).</div>
                 </div>
               </Col>
             </Row>
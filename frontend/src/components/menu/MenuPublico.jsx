@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Container, Row, Col, Card, Badge, Spinner, Alert, Nav, Button, Placeholder } from 'react-bootstrap';
 import { getCategorias, getPlatos } from '../../services/menuApi';
+import { ImagenPlato } from '../common/ImagenPlato';
 
 // Estilos CSS para animaciones y mejoras visuales
 const styles = `
@@ -195,11 +196,10 @@ function MenuPublico({ onAgregarPlato, modoSeleccion = false }) {
                     </Badge>
                   )}
                   {plato.imagen ? (
-                    <Card.Img
-                      variant="top"
-                      src={plato.imagen}
-                      alt={plato.nombre}
-                      loading="lazy"
+                    <ImagenPlato
+                      plato={plato}
+                      tamano="card"
+                      className="card-img-top"
                       style={{
                         height: '180px',
                         objectFit: 'cover',
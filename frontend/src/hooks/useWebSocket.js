@@ -2,6 +2,18 @@ import { useState, useEffect, useRef, useCallback } from 'react';
 
 /**
  * Hook para gestionar conexiones WebSocket con reconexión automática
+ *
+ * Con protocolo: 2 el servidor envía eventos delta con secuencia por grupo.
+ * El hook recuerda la última secuencia recibida de cada grupo, descarta
+ * duplicados y al reconectar pide solo los eventos perdidos (resume). Si el
+ * servidor ya no los tiene envía { type: 'resync_requerido' } y el componente
+ * debe recargar.
+ *
+ * Con url '/ws/cocina/' el socket es multiplexado: usar sendMessage con
+ * { type: 'subscribe', grupos: [...], filtros: { mesas, estados } }.
+ *
+ * Las transiciones masivas llegan en un solo mensaje 'lote' por grupo; el
+ * hook lo desarma y llama a onMessage una vez por evento.
  */
 export function useWebSocket(url, options = {}) {
   const {
@@ -14,6 +26,7 @@ export function useWebSocket(url, options = {}) {
     maxReconnectInterval = 30000,
     reconnectDecay = 1.5,
     maxReconnectAttempts = Infinity,
+    protocolo = 1,
   } = options;
 
   const [isConnected, setIsConnected] = useState(false);
@@ -25,6 +38,7 @@ export function useWebSocket(url, options = {}) {
   const currentReconnectIntervalRef = useRef(reconnectInterval);
   const shouldReconnectRef = useRef(true);
   const mountedRef = useRef(true);
+  const lastSeqRef = useRef({}); // Última secuencia recibida por grupo (protocolo 2)
 
   // Construir URL con token
   const buildWebSocketUrl = useCallback(() => {
@@ -49,9 +63,12 @@ export function useWebSocket(url, options = {}) {
 
     const wsUrl = new URL(url, baseUrl);
     wsUrl.searchParams.append('token', token);
+    if (protocolo === 2) {
+      wsUrl.searchParams.append('protocolo', '2');
+    }
 
     return wsUrl.toString();
-  }, [url]);
+  }, [url, protocolo]);
 
   // Conectar WebSocket
   const connect = useCallback(() => {
@@ -93,6 +110,42 @@ export function useWebSocket(url, options = {}) {
         try {
           const data = JSON.parse(event.data);
           console.log(`[WS] Mensaje:`, data);
+
+          // Lote de eventos (transición masiva): entregar uno por uno
+          if (data.type === 'lote') {
+            const seqs = lastSeqRef.current;
+            const nuevos = data.eventos.filter((evento) => evento.seq > (seqs[data.grupo] ?? 0));
+            seqs[data.grupo] = Math.max(seqs[data.grupo] ?? 0, data.seq);
+            if (onMessage) nuevos.forEach((evento) => onMessage(evento));
+            return;
+          }
+          if (data.event === 'lote') {
+            if (onMessage) data.eventos.forEach((evento) => onMessage(evento));
+            return;
+          }
+
+          if (protocolo === 2) {
+            const seqs = lastSeqRef.current;
+            if (data.type === 'connection_established' || data.type === 'subscribed') {
+              const conocidos = Object.keys(seqs).length > 0;
+              // Grupos nuevos: partir desde la secuencia actual
+              Object.entries(data.seq || {}).forEach(([grupo, seq]) => {
+                if (!(grupo in seqs)) seqs[grupo] = seq;
+              });
+              // Reconexión: pedir solo lo que se perdió
+              if (data.type === 'connection_established' && conocidos) {
+                ws.send(JSON.stringify({ type: 'resume', resume_from: seqs }));
+              }
+            } else if (data.type === 'evento' || data.type === 'seq') {
+              // Descartar eventos ya recibidos (reenvíos al reanudar)
+              if (data.seq <= (seqs[data.grupo] ?? 0)) return;
+              seqs[data.grupo] = data.seq;
+              if (data.type === 'seq') return;
+            } else if (data.type === 'resync_requerido') {
+              seqs[data.grupo] = data.seq;
+            }
+          }
+
           if (onMessage) onMessage(data);
         } catch (err) {
           console.error('[WS] Error parseando:', err);
@@ -138,7 +191,7 @@ export function useWebSocket(url, options = {}) {
       console.error('[WS] Error creando WebSocket:', err);
       setError(err.message);
     }
-  }, [enabled, buildWebSocketUrl, url, onConnect, onMessage, onError, onDisconnect, reconnectInterval, maxReconnectInterval, reconnectDecay, maxReconnectAttempts]);
+  }, [enabled, buildWebSocketUrl, url, protocolo, onConnect, onMessage, onError, onDisconnect, reconnectInterval, maxReconnectInterval, reconnectDecay, maxReconnectAttempts]);
 
   const sendMessage = useCallback((data) => {
     if (!wsRef.current || wsRef.current.readyState !== WebSocket.OPEN) {
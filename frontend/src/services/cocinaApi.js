@@ -159,9 +159,26 @@ export async function getPedido(id) {
 /**
  * Crear nuevo pedido
  * @param {Object} data - { mesa, reserva?, notas?, detalles: [{plato, cantidad, notas?}] }
+ * @param {string} idempotencyKey - Clave para que un reintento no duplique el pedido (opcional)
  */
-export async function crearPedido(data) {
+export async function crearPedido(data, idempotencyKey = null) {
   const response = await fetchWithTimeout(`${API_BASE_URL}/cocina/pedidos/`, {
+    method: 'POST',
+    headers: {
+      ...getAuthHeaders(),
+      ...(idempotencyKey && { 'Idempotency-Key': idempotencyKey })
+    },
+    body: JSON.stringify(data)
+  });
+  return handleResponse(response);
+}
+
+/**
+ * Cotizar pedido sin crearlo (total, factibilidad por línea e ingrediente limitante)
+ * @param {Object} data - Mismo payload que crearPedido
+ */
+export async function cotizarPedido(data) {
+  const response = await fetchWithTimeout(`${API_BASE_URL}/cocina/pedidos/cotizar/`, {
     method: 'POST',
     headers: getAuthHeaders(),
     body: JSON.stringify(data)
@@ -195,6 +212,21 @@ export async function cambiarEstadoPedido(id, nuevoEstado) {
   return handleResponse(response);
 }
 
+/**
+ * Cambiar estado de varios pedidos a la vez (no permite CANCELADO)
+ * @param {number[]} ids - IDs de los pedidos
+ * @param {string} nuevoEstado - Estado destino
+ * @returns {Promise<{estado: string, actualizados: number, resultados: Array}>}
+ */
+export async function cambiarEstadoMasivo(ids, nuevoEstado) {
+  const response = await fetch(`${API_BASE_URL}/cocina/pedidos/estado-masivo/`, {
+    method: 'POST',
+    headers: getAuthHeaders(),
+    body: JSON.stringify({ ids, estado: nuevoEstado })
+  });
+  return handleResponse(response);
+}
+
 /**
  * Cancelar pedido (atajo para cambiar a CANCELADO)
  * @param {number} id - ID del pedido
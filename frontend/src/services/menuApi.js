@@ -111,6 +111,24 @@ export async function getPlatos(filtros = {}) {
   return handleResponse(response);
 }
 
+/**
+ * Busca platos activos por nombre, categoría o descripción (prefijo, sin tildes)
+ * @param {string} q - Texto a buscar
+ * @param {Object} filtros - { limite, categoria, disponible }
+ * @returns {Promise<Array>} Platos ordenados por relevancia, con porciones_restantes
+ */
+export async function buscarPlatos(q, filtros = {}) {
+  const params = new URLSearchParams({ q });
+  if (filtros.limite) params.append('limite', filtros.limite);
+  if (filtros.categoria) params.append('categoria', filtros.categoria);
+  if (filtros.disponible !== undefined) params.append('disponible', filtros.disponible);
+
+  const response = await fetch(`${API_BASE_URL}/menu/platos/buscar/?${params.toString()}`, {
+    headers: getAuthHeaders()
+  });
+  return handleResponse(response);
+}
+
 /**
  * Obtener detalle de un plato (incluye receta)
  */
@@ -211,6 +229,21 @@ export async function getIngredientesBajoStock() {
   return handleResponse(response);
 }
 
+/**
+ * Ajustar el stock de varios ingredientes en una sola operación atómica
+ * @param {string} tipo - 'recepcion' (suma/resta cantidades) | 'conteo' (cantidades absolutas)
+ * @param {Array} items - [{ ingrediente: id, cantidad: number|string }]
+ * @returns {Object} - { tipo, ajustados, ingredientes, platos_actualizados }
+ */
+export async function ajustarStockMasivo(tipo, items) {
+  const response = await fetch(`${API_BASE_URL}/menu/ingredientes/ajuste-masivo/`, {
+    method: 'POST',
+    headers: getAuthHeaders(),
+    body: JSON.stringify({ tipo, items })
+  });
+  return handleResponse(response);
+}
+
 /**
  * Listar ingredientes con paginación completa (devuelve count y punteros)
  * @param {Object} filtros - { activo, bajo_stock, page, page_size }
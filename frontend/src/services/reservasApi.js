@@ -79,13 +79,15 @@ export async function register(userData) {
 /**
  * Registrar usuario y crear reserva en una sola operación
  * @param {Object} data - Datos de usuario y reserva combinados
+ * @param {string} idempotencyKey - Clave para que un reintento no duplique la reserva (opcional)
  * @returns {Object} - {token, user_id, username, email, rol, nombre_completo, reserva, message}
  */
-export async function registerAndReserve(data) {
+export async function registerAndReserve(data, idempotencyKey = null) {
   const response = await fetch(`${API_BASE_URL}/register-and-reserve/`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
+      ...(idempotencyKey && { 'Idempotency-Key': idempotencyKey }),
     },
     body: JSON.stringify(data),
   });
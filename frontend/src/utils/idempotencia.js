@@ -0,0 +1,19 @@
+/**
+ * Claves Idempotency-Key para POST que crean recursos (pedidos, reservas).
+ *
+ * Un reintento del mismo envío (timeout, Wi-Fi inestable) debe reutilizar
+ * la clave para que el backend devuelva la respuesta original en vez de
+ * crear un duplicado. Si el contenido cambia se genera una clave nueva.
+ * Tras un envío exitoso, limpiar con ref.current = null.
+ *
+ * @param {{current: ?{clave: string, cuerpo: string}}} ref - useRef del componente
+ * @param {Object} data - Cuerpo de la solicitud
+ * @returns {string} Clave a enviar en el header Idempotency-Key
+ */
+export function obtenerClaveIdempotencia(ref, data) {
+  const cuerpo = JSON.stringify(data);
+  if (!ref.current || ref.current.cuerpo !== cuerpo) {
+    ref.current = { clave: crypto.randomUUID(), cuerpo };
+  }
+  return ref.current.clave;
+}